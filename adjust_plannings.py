@@ -3,7 +3,6 @@
 Script pour analyser les horaires moyens par departement et ajuster les plannings
 """
 from db_manager import DBManager
-from datetime import datetime, timedelta
 from collections import defaultdict
 
 def analyze_and_adjust_plannings():
@@ -16,36 +15,25 @@ def analyze_and_adjust_plannings():
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # 1. Analyser les horaires moyens par departement et jour de la semaine
+        # 1. Horaires moyens par departement et jour de la semaine, calcules par MySQL
+        #    sur les heures stockees en minutes (check_in_min / check_out_min)
         cursor.execute("""
-            SELECT e.departement, p.date_pointage, p.check_in, p.check_out, p.minutes
+            SELECT e.departement, WEEKDAY(p.date_pointage) AS jour,
+                   AVG(p.check_in_min) AS avg_in, AVG(p.check_out_min) AS avg_out,
+                   AVG(p.minutes) AS avg_duration, COUNT(*) AS nb
             FROM employes e
             JOIN pointages p ON e.id = p.employe_id
-            WHERE p.check_in IS NOT NULL AND p.check_in != '-' AND p.check_in != ''
-                  AND p.check_out IS NOT NULL AND p.check_out != '-' AND p.check_out != ''
+            WHERE p.check_in_min IS NOT NULL AND p.check_out_min IS NOT NULL
                   AND p.minutes > 0
-            ORDER BY e.departement, p.date_pointage
+            GROUP BY e.departement, WEEKDAY(p.date_pointage)
         """)
         
         # Regrouper par departement et jour de la semaine
-        dept_stats = defaultdict(lambda: defaultdict(list))
+        dept_stats = defaultdict(dict)
         
         for row in cursor.fetchall():
-            dept = row['departement']
-            date = row['date_pointage']
-            day_name = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche'][date.weekday()]
-            
-            try:
-                check_in = datetime.strptime(row['check_in'][:5], '%H:%M')
-                check_out = datetime.strptime(row['check_out'][:5], '%H:%M')
-                
-                dept_stats[dept][day_name].append({
-                    'check_in': check_in,
-                    'check_out': check_out,
-                    'minutes': row['minutes']
-                })
-            except:
-                pass
+            day_name = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche'][int(row['jour'])]
+            dept_stats[row['departement']][day_name] = row
         
         # 2. Calculer les moyennes et creer les plannings ajustes
         print("\n[ANALYSE] Horaires moyens par departement:")
@@ -56,16 +44,16 @@ def analyze_and_adjust_plannings():
             planning = {}
             
             for day in ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']:
-                if day in dept_stats[dept] and len(dept_stats[dept][day]) > 0:
-                    # Calculer les moyennes
-                    avg_in_minutes = sum([d['check_in'].hour * 60 + d['check_in'].minute for d in dept_stats[dept][day]]) / len(dept_stats[dept][day])
-                    avg_out_minutes = sum([d['check_out'].hour * 60 + d['check_out'].minute for d in dept_stats[dept][day]]) / len(dept_stats[dept][day])
-                    avg_duration = sum([d['minutes'] for d in dept_stats[dept][day]]) / len(dept_stats[dept][day])
+                if day in dept_stats[dept]:
+                    # Moyennes deja calculees en SQL
+                    avg_in_minutes = float(dept_stats[dept][day]['avg_in'])
+                    avg_out_minutes = float(dept_stats[dept][day]['avg_out'])
+                    avg_duration = float(dept_stats[dept][day]['avg_duration'])
                     
                     avg_in = f"{int(avg_in_minutes // 60):02d}:{int(avg_in_minutes % 60):02d}"
                     avg_out = f"{int(avg_out_minutes // 60):02d}:{int(avg_out_minutes % 60):02d}"
                     
-                    print(f"  {day}: {avg_in} - {avg_out} (moy: {int(avg_duration)}min, {len(dept_stats[dept][day])} pointages)")
+                    print(f"  {day}: {avg_in} - {avg_out} (moy: {int(avg_duration)}min, {dept_stats[dept][day]['nb']} pointages)")
                     
                     planning[day] = {
                         'debut': avg_in,
@@ -1,7 +1,10 @@
 from flask import Flask, render_template, request, redirect, url_for, send_file, jsonify, session
 import pandas as pd
+import numpy as np
 import os
 import io
+import hashlib
+import pickle
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 from reportlab.lib.pagesizes import A4, letter
@@ -12,7 +15,20 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 import re
 import uuid
+import shutil
+import threading
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from db_manager import DBManager  # Import BDD
+from db_pool import pool_stats
+from attendance_reader import FORMAT_ENGINES, detect_format, engine_for_file, iter_attendance_records, iter_employee_blocks, iter_sheet_rows
+from parse_cache import ParseCache
+from attendance_store import PeriodAttendance
+from stats_engine import compute_statistics_batch
+from planning_resolver import NO_PLAN, PlanningResolver, hm_to_minutes
+from stats_cache import DATA_VERSIONS, StatsCache
 import difflib
 
 # --- INITIALISATION DE LA BASE DE DONNÉES ---
@@ -31,11 +47,78 @@ REPORT_FOLDER = 'reports'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['REPORT_FOLDER'] = REPORT_FOLDER
 app.config['SECRET_KEY'] = 'votre-cle-secrete-super-secrete-2024'
+# Taille maximale d'une requête d'upload (Flask répond 413 au-delà)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 512 * 1024 * 1024))
+# Archives .zip : nombre d'exports et taille décompressée totale acceptés (protection contre les zip bombs)
+app.config['ZIP_MAX_MEMBERS'] = int(os.environ.get('ZIP_MAX_MEMBERS', 100))
+app.config['ZIP_MAX_BYTES'] = int(os.environ.get('ZIP_MAX_BYTES', 1024 * 1024 * 1024))
+# Parser des exports pointeuse : 'vectorized' (rapide) ou 'legacy' (ancien parcours iterrows)
+app.config['PARSER_MODE'] = os.environ.get('PARSER_MODE', 'vectorized')
+# Import : 'dataframe' (tout le fichier en mémoire) ou 'streaming' (bloc par bloc, mémoire constante)
+app.config['INGEST_MODE'] = os.environ.get('INGEST_MODE', 'dataframe')
+# Nombre de processus pour parser plusieurs fichiers en parallèle
+app.config['PARSE_WORKERS'] = int(os.environ.get('PARSE_WORKERS', os.cpu_count() or 1))
+# Cache des fichiers déjà parsés (clé = SHA-256 du contenu), 0 pour le désactiver
+app.config['PARSE_CACHE_MAX_BYTES'] = int(os.environ.get('PARSE_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+app.config['PARSE_CACHE_FOLDER'] = os.path.join(UPLOAD_FOLDER, 'parse_cache')
+# Import : 'sync' (tout dans la requête) ou 'job' (tâche en arrière-plan suivie via /api/jobs/<id>)
+app.config['UPLOAD_MODE'] = os.environ.get('UPLOAD_MODE', 'sync')
+app.config['UPLOAD_JOB_WORKERS'] = int(os.environ.get('UPLOAD_JOB_WORKERS', 1))
+# Durée de conservation (secondes) du suivi d'une tâche terminée
+app.config['UPLOAD_JOB_TTL'] = int(os.environ.get('UPLOAD_JOB_TTL', 3600))
+# Statistiques : 'batch' (tous les employés en une passe NumPy) ou 'reference' (calculate_statistics un par un)
+app.config['STATS_ENGINE'] = os.environ.get('STATS_ENGINE', 'batch')
+# Ré-import : n'écrire que les pointages nouveaux ou modifiés ('0' pour tout réécrire)
+app.config['DELTA_INGEST'] = os.environ.get('DELTA_INGEST', '1') == '1'
+# Pointages chargés par LOAD DATA LOCAL INFILE (gros imports ; repli sur executemany si refusé)
+app.config['BULK_INGEST'] = os.environ.get('BULK_INGEST', '0') == '1'
+# Statistiques en parallèle sur plusieurs processus (1 = en série) au-delà d'un nombre d'employés
+app.config['STATS_WORKERS'] = int(os.environ.get('STATS_WORKERS', 1))
+app.config['STATS_PARALLEL_MIN_EMPLOYEES'] = int(os.environ.get('STATS_PARALLEL_MIN_EMPLOYEES', 2000))
+# Cache des statistiques par (employé, période, version des données) : nombre d'entrées, 0 pour le désactiver
+app.config['STATS_CACHE_SIZE'] = int(os.environ.get('STATS_CACHE_SIZE', 50000))
 
 # Stockage en mémoire pour contourner la limite de taille des cookies
 # Format: { 'uuid': { 'employees': [...], 'filepath': '...', 'engine': '...' } }
 GLOBAL_DATA_STORE = {}
 
+
+class LazyPeriodEntry(dict):
+    """Entrée de GLOBAL_DATA_STORE dont 'employees_data' n'est chargé qu'au premier accès
+
+    Le dashboard n'a besoin que des totaux SQL ; les pointages détaillés ne sont
+    lus en BDD que si une autre page (Excel, PDF, graphiques...) les demande.
+    """
+
+    def __init__(self, loader, **fields):
+        super().__init__(**fields)
+        self._loader = loader
+        self._lock = threading.Lock()
+
+    def __missing__(self, key):
+        if key != 'employees_data':
+            raise KeyError(key)
+        with self._lock:
+            if not dict.__contains__(self, key):
+                self[key] = self._loader()
+        return dict.__getitem__(self, key)
+
+# Tâches d'import en arrière-plan : { 'job_id': { 'status', 'phase', 'rows_processed', ... } }
+UPLOAD_JOBS = {}
+UPLOAD_JOBS_LOCK = threading.Lock()
+UPLOAD_EXECUTOR = None  # créé au premier import en mode tâche
+# Processus de parsing partagés par tous les imports (PARSE_WORKERS), créés au premier import multi-fichiers
+PARSE_EXECUTOR = None
+PARSE_EXECUTOR_PID = None
+PARSE_EXECUTOR_LOCK = threading.Lock()
+# Processus de calcul des statistiques (STATS_WORKERS), gardés tant que le contexte de planning ne change pas
+STATS_EXECUTOR = None
+STATS_EXECUTOR_KEY = None
+STATS_EXECUTOR_LOCK = threading.Lock()
+
+# Statistiques déjà calculées : { (person_id, période, version): stats }
+STATS_CACHE = StatsCache(app.config['STATS_CACHE_SIZE'])
+
 # Ensure folders exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(REPORT_FOLDER, exist_ok=True)
@@ -183,75 +266,119 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
+    # Plusieurs fichiers possibles (un export par site) et/ou une archive .zip
+    files = [f for f in request.files.getlist('file') if f.filename]
     if 'file' not in request.files:
         return "Aucun fichier sélectionné", 400
-
-    file = request.files['file']
-    if file.filename == '':
+    if not files:
         return "Nom de fichier vide", 400
 
     # Ajout d'un timestamp pour rendre le nom unique et éviter les erreurs "Permission denied"
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    original_filename = secure_filename(file.filename)
-    filename = f"{timestamp}_{original_filename}"
-    
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    
+    sources = []  # [(filepath, engine), ...]
+
+    for n, file in enumerate(files):
+        original_filename = secure_filename(file.filename)
+        filename = f"{timestamp}_{n}_{original_filename}" if len(files) > 1 else f"{timestamp}_{original_filename}"
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+        try:
+            file.save(filepath)
+        except Exception as e:
+            return f"Erreur lors de la sauvegarde du fichier : {e}", 500
+
+        # Determine file format and engine (d'après le contenu, pas l'extension)
+        file_format = detect_format(filepath)
+        if file_format == 'zip':
+            try:
+                extracted = _extract_zip(filepath, f"{timestamp}_{n}")
+            except zipfile.BadZipFile:
+                return f"Archive invalide : {file.filename}", 400
+            except ValueError as e:
+                os.remove(filepath)
+                return f"{e} ({file.filename})", 413
+            if not extracted:
+                return f"Aucun export exploitable dans l'archive {file.filename}", 400
+            sources.extend(extracted)
+            continue
+
+        engine = FORMAT_ENGINES.get(file_format)
+        if not engine:
+            return "Format de fichier non supporté. Utilisez .xls, .xlsx, .csv ou .zip", 400
+        sources.append((filepath, engine))
+
+    # Mode tâche : l'import tourne en arrière-plan, la page suit /api/jobs/<id>
+    if request.form.get('mode') == 'job' or app.config.get('UPLOAD_MODE') == 'job':
+        job_id = submit_upload_job(sources)
+        return jsonify({'job_id': job_id, 'status_url': url_for('api_job_status', job_id=job_id)}), 202
+
     try:
-        file.save(filepath)
+        success, result = ingest_sources(sources)
     except Exception as e:
-        return f"Erreur lors de la sauvegarde du fichier : {e}", 500
+        print(f"DEBUG: Erreur: {e}")
+        return f"Erreur lors du traitement du fichier : {str(e)}", 500
+    if not success:
+        return result, 500
 
-    # Determine file format and engine
-    file_extension = os.path.splitext(filename)[1].lower()
-    
-    # Correct engine selection
-    if file_extension == '.xlsx':
-        engine = 'openpyxl'
-    elif file_extension == '.xls':
-        engine = 'xlrd'
-    else:
-        return "Format de fichier non supporté. Utilisez .xls ou .xlsx", 400
+    # Store only the ID in the session (very small)
+    session['data_id'] = result
+    session.modified = True
+
+    print(f"DEBUG: Données stockées en mémoire (ID: {result}), redirection vers dashboard...")
+    return redirect(_dashboard_url(result))
+
+def _no_progress(phase=None, total=None, employees=0, rows=0):
+    pass
+
+def _counted(employees, progress):
+    """Fait suivre la progression pendant que save_data consomme les employés"""
+    for emp in employees:
+        yield emp
+        progress(employees=1, rows=len(emp.get('dates') or ()))
+
+def ingest_sources(sources, progress=None):
+    """Parse les exports, calcule les statistiques et sauvegarde en BDD.
+
+    progress(phase=..., total=..., employees=..., rows=...) est appelé au fil du
+    traitement (phases 'parsing', 'stats', 'saving').
+    Retourne (succès, data_id dans GLOBAL_DATA_STORE ou message d'erreur).
+    """
+    progress = progress or _no_progress
+    if app.config.get('INGEST_MODE') == 'streaming':
+        return _ingest_streaming(sources, progress)
+
+    filepath, engine = sources[0]
 
     # Process the file and parse data
-    try:
-        employees = parse_attendance_data(filepath, engine)
-        
-        # --- PRÉ-RÉCUPÉRATION DU CONTEXTE BDD POUR OPTIMISATION ---
-        db = DBManager()
-        calc_context = db.get_calculation_context()
-        # ---------------------------------------------------------
+    progress(phase='parsing')
+    employees = load_sources(sources)
+    progress(total=len(employees), employees=len(employees), rows=sum(len(e.get('dates') or ()) for e in employees))
+
+    # --- PRÉ-RÉCUPÉRATION DU CONTEXTE BDD POUR OPTIMISATION ---
+    db = DBManager()
+    calc_context = db.get_calculation_context()
+    # ---------------------------------------------------------
+
+    # Stockage compact en colonnes typées (au lieu de cinq listes de chaînes par employé)
+    store = PeriodAttendance.from_employees(employees)
+    employees_with_stats_for_db = store.records()
+    del employees
 
+    # Listes relues une fois pour les statistiques et la sauvegarde, puis libérées :
+    # les vues gardées dans GLOBAL_DATA_STORE restent en colonnes typées
+    with store.decoded():
         # Calculate statistics for each employee
-        employees_with_stats_for_db = [] # Liste propre pour la BDD
-        
-        employees_with_stats = []
-        for emp in employees:
-            stats = calculate_statistics(emp, context=calc_context)
-            
-            # Préparation de l'objet enrichi pour la BDD
-            emp_copy = emp.copy()
-            emp_copy['stats'] = stats
-            employees_with_stats_for_db.append(emp_copy)
-            
-            emp_data = {
-                'person_id': emp['person_id'],
-                'name': emp['name'],
-                'department': emp['department'],
-                'position': emp['position'],
-                'joining_date': emp['joining_date'],
-                'stats': stats,
-                'dates': emp['dates'][:10] if len(emp['dates']) > 10 else emp['dates'],
-                'check_ins': emp['check_ins'][:10] if len(emp['check_ins']) > 10 else emp['check_ins'],
-                'check_outs': emp['check_outs'][:10] if len(emp['check_outs']) > 10 else emp['check_outs'],
-                'statuses': emp['statuses'][:10] if len(emp['statuses']) > 10 else emp['statuses'],
-            }
-            employees_with_stats.append(emp_data)
-        
+        progress(phase='stats')
+        for emp, stats in zip(employees_with_stats_for_db, calculate_statistics_batch(employees_with_stats_for_db, calc_context)):
+            emp['stats'] = stats
+        progress(employees=len(employees_with_stats_for_db), rows=sum(len(emp.get('dates') or ()) for emp in employees_with_stats_for_db))
+
         # --- SAUVEGARDE EN BASE DE DONNEES ---
+        progress(phase='saving')
         db_msg = ""
         try:
-            success, message = db.save_data(employees_with_stats_for_db)
+            success, message = db.save_data(_counted(employees_with_stats_for_db, progress), delta=app.config['DELTA_INGEST'],
+                                            bulk=app.config['BULK_INGEST'])
             db_msg = message
             if success:
                 print(f"DEBUG BDD: {message}")
@@ -262,30 +389,318 @@ def upload_file():
             print(f"DEBUG BDD EXCEPTION: {e}")
         # -------------------------------------
 
-        # Store in GLOBAL_DATA_STORE instead of session cookie
-        data_id = str(uuid.uuid4())
-        GLOBAL_DATA_STORE[data_id] = {
-            'employees_data': employees_with_stats_for_db,
-            'filepath': filepath,
-            'engine': engine,
-            'db_message': db_msg
+    # Store in GLOBAL_DATA_STORE instead of session cookie
+    data_id = str(uuid.uuid4())
+    GLOBAL_DATA_STORE[data_id] = {
+        'employees_data': employees_with_stats_for_db,
+        'filepath': filepath,
+        'engine': engine,
+        'sources': sources,
+        'db_message': db_msg,
+        'db_counts': getattr(db, 'last_save_counts', None)
+    }
+    return True, data_id
+
+def _ingest_streaming(sources, progress):
+    """Import en flux : chaque employé est lu, calculé puis sauvegardé avant de lire le suivant.
+
+    Rien n'est conservé en mémoire : la BDD fait foi et le dashboard relit depuis MySQL
+    la plage de dates des fichiers importés (voir _dashboard_url).
+    Lecture, calcul et sauvegarde étant entrelacés, la progression est suivie dans la phase 'saving'.
+    """
+    db = DBManager()
+    calc_context = db.get_calculation_context()
+    dates = set()  # valeurs distinctes de 'dates' des fichiers importés
+
+    def employees_with_stats():
+        # Les fichiers sont lus l'un après l'autre ; la BDD fusionne par (employé, date)
+        for filepath, engine in sources:
+            for emp in iter_attendance_records(filepath, engine):
+                emp['stats'] = calculate_statistics(emp, context=calc_context)
+                dates.update(emp.get('dates') or ())
+                yield emp
+
+    progress(phase='saving')
+    success, db_msg = db.save_data(_counted(employees_with_stats(), progress), delta=app.config['DELTA_INGEST'],
+                                   bulk=app.config['BULK_INGEST'])
+
+    print(f"DEBUG BDD: {db_msg}")
+    if not success:
+        # Sans BDD, le mode flux n'a aucune donnée à afficher
+        return False, f"Erreur lors de la sauvegarde en base : {db_msg}"
+
+    days = sorted(d for d in dates if _is_iso_date(d))
+    data_id = str(uuid.uuid4())
+    GLOBAL_DATA_STORE[data_id] = {
+        'employees_data': [],
+        'filepath': sources[0][0],
+        'engine': sources[0][1],
+        'sources': sources,
+        'db_message': db_msg,
+        'db_counts': getattr(db, 'last_save_counts', None),
+        'streamed': True,
+        'start_date': days[0] if days else None,
+        'end_date': days[-1] if days else None
+    }
+    return True, data_id
+
+def _is_iso_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d') == value
+    except (TypeError, ValueError):
+        return False
+
+def _dashboard_url(data_id):
+    """Dashboard après un import ; import en flux : la plage de dates des fichiers importés
+
+    Sans données en mémoire, le dashboard afficherait sinon la période la plus récente de la BDD.
+    """
+    stored = GLOBAL_DATA_STORE.get(data_id) or {}
+    if stored.get('streamed') and stored.get('start_date'):
+        return url_for('dashboard', start_date=stored['start_date'], end_date=stored['end_date'])
+    return url_for('dashboard')
+
+# --- TÂCHES D'IMPORT EN ARRIÈRE-PLAN ---
+def _job_progress(job_id):
+    """Callback de progression qui met à jour UPLOAD_JOBS[job_id]"""
+    def progress(phase=None, total=None, employees=0, rows=0):
+        now = time.time()
+        with UPLOAD_JOBS_LOCK:
+            job = UPLOAD_JOBS[job_id]
+            if phase and phase != job['phase']:
+                job['timings'][job['phase']] = round(now - job['phase_started'], 3)
+                job['phase'] = phase
+                job['phase_started'] = now
+                if phase != 'done':
+                    # Compteurs propres à chaque phase (la dernière reste affichée à la fin)
+                    job['employees_processed'] = 0
+                    job['rows_processed'] = 0
+            if total is not None:
+                job['employees_total'] = total
+            job['employees_processed'] += employees
+            job['rows_processed'] += rows
+    return progress
+
+def _run_upload_job(job_id, sources):
+    progress = _job_progress(job_id)
+    with UPLOAD_JOBS_LOCK:
+        job = UPLOAD_JOBS[job_id]
+        job['status'] = 'running'
+        job['started'] = time.time()
+    try:
+        success, result = ingest_sources(sources, progress)
+    except Exception as e:
+        print(f"DEBUG: Erreur tâche {job_id}: {e}")
+        success, result = False, f"Erreur lors du traitement du fichier : {str(e)}"
+
+    progress(phase='done')
+    with UPLOAD_JOBS_LOCK:
+        job = UPLOAD_JOBS[job_id]
+        job['finished'] = time.time()
+        if success:
+            job['status'] = 'done'
+            job['data_id'] = result
+            job['db_message'] = GLOBAL_DATA_STORE[result].get('db_message', '')
+            job['db_counts'] = GLOBAL_DATA_STORE[result].get('db_counts')
+        else:
+            job['status'] = 'error'
+            job['error'] = result
+
+def _purge_upload_jobs():
+    """Oublie les tâches terminées depuis plus de UPLOAD_JOB_TTL secondes"""
+    limit = time.time() - app.config['UPLOAD_JOB_TTL']
+    with UPLOAD_JOBS_LOCK:
+        for job_id in [k for k, j in UPLOAD_JOBS.items() if j['finished'] and j['finished'] < limit]:
+            del UPLOAD_JOBS[job_id]
+
+def submit_upload_job(sources):
+    """Enregistre une tâche d'import et la lance en arrière-plan ; retourne son id"""
+    global UPLOAD_EXECUTOR
+    _purge_upload_jobs()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with UPLOAD_JOBS_LOCK:
+        UPLOAD_JOBS[job_id] = {
+            'id': job_id,
+            'status': 'queued',
+            'phase': 'queued',
+            'files': [os.path.basename(path) for path, _ in sources],
+            'employees_total': None,
+            'employees_processed': 0,
+            'rows_processed': 0,
+            'timings': {},
+            'created': now,
+            'started': None,
+            'finished': None,
+            'phase_started': now,
+            'data_id': None,
+            'db_message': None,
+            'db_counts': None,
+            'error': None,
         }
-        
-        # Store only the ID in the session (very small)
-        session['data_id'] = data_id
+        if UPLOAD_EXECUTOR is None:
+            UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=app.config['UPLOAD_JOB_WORKERS'],
+                                                 thread_name_prefix='upload-job')
+    UPLOAD_EXECUTOR.submit(_run_upload_job, job_id, sources)
+    return job_id
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Avancement d'une tâche d'import (phase, lignes traitées, durées)"""
+    with UPLOAD_JOBS_LOCK:
+        job = UPLOAD_JOBS.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Tâche inconnue'}), 404
+        job = dict(job, timings=dict(job['timings']))
+
+    now = time.time()
+    end = job['finished'] or now
+    payload = {
+        'id': job['id'],
+        'status': job['status'],
+        'phase': job['phase'],
+        'files': job['files'],
+        'employees_total': job['employees_total'],
+        'employees_processed': job['employees_processed'],
+        'rows_processed': job['rows_processed'],
+        'timings': job['timings'],
+        'queued_seconds': round((job['started'] or now) - job['created'], 3),
+        'elapsed_seconds': round(end - (job['started'] or end), 3),
+        'error': job['error'],
+        'db_message': job['db_message'],
+        'db_counts': job['db_counts'],
+    }
+    if job['status'] not in ('done', 'error'):
+        payload['phase_seconds'] = round(now - job['phase_started'], 3)
+
+    if job['status'] == 'done':
+        # La session est celle du navigateur qui suit la tâche
+        session['data_id'] = job['data_id']
         session.modified = True
-        
-        print(f"DEBUG: Données stockées en mémoire (ID: {data_id}), redirection vers dashboard...")
-        return redirect(url_for('dashboard'))
-    except Exception as e:
-        print(f"DEBUG: Erreur: {e}")
-        return f"Erreur lors du traitement du fichier : {str(e)}", 500
+        payload['redirect'] = _dashboard_url(job['data_id'])
+    return jsonify(payload)
+
+def _extract_zip(zip_path, prefix):
+    """Extrait les exports (.xls, .xlsx, HTML, CSV) d'une archive dans UPLOAD_FOLDER
+
+    Les tailles décompressées annoncées sont comptées avant chaque copie : au-delà de
+    ZIP_MAX_MEMBERS exports ou de ZIP_MAX_BYTES au total, l'archive est refusée
+    (ValueError) et les fichiers déjà extraits sont supprimés.
+    """
+    sources = []
+    extracted = []
+    members = 0
+    total = 0
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            for k, member in enumerate(zf.infolist()):
+                if member.is_dir():
+                    continue
+                name = secure_filename(os.path.basename(member.filename))
+                if os.path.splitext(name)[1].lower() not in ('.xls', '.xlsx', '.csv', '.htm', '.html'):
+                    continue
+                members += 1
+                total += member.file_size
+                if members > app.config['ZIP_MAX_MEMBERS']:
+                    raise ValueError(f"Archive refusée : plus de {app.config['ZIP_MAX_MEMBERS']} exports")
+                if total > app.config['ZIP_MAX_BYTES']:
+                    raise ValueError(f"Archive refusée : plus de {app.config['ZIP_MAX_BYTES'] // (1024 * 1024)} Mo une fois décompressée")
+                target = os.path.join(app.config['UPLOAD_FOLDER'], f"{prefix}_{k}_{name}")
+                extracted.append(target)
+                # La lecture d'un membre s'arrête à sa taille annoncée (file_size)
+                with zf.open(member) as src, open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                engine = engine_for_file(target)
+                if not engine:
+                    os.remove(target)
+                    extracted.pop()
+                    continue
+                sources.append((target, engine))
+    except (ValueError, zipfile.BadZipFile):
+        for target in extracted:
+            os.remove(target)
+        raise
+    return sources
+
+def merge_employees(employee_lists):
+    """Fusionne les employés de plusieurs exports par person_id
+
+    Les jours d'un même employé sont concaténés ; si une date apparaît dans
+    plusieurs fichiers, le dernier fichier l'emporte (comme l'upsert en BDD).
+    """
+    merged = {}
+    day_keys = ('dates', 'check_ins', 'check_outs', 'attended_minutes', 'statuses')
+    for employees in employee_lists:
+        for emp in employees:
+            key = str(emp['person_id'])
+            if key not in merged:
+                merged[key] = emp
+                continue
+
+            target = merged[key]
+            for field in ('name', 'department', 'joining_date', 'position'):
+                if target.get(field) in (None, 'N/A') and emp.get(field) not in (None, 'N/A'):
+                    target[field] = emp[field]
+
+            # Alignement des listes sur les dates avant concaténation
+            n = len(target['dates'])
+            for k in day_keys[1:]:
+                pad = 0 if k == 'attended_minutes' else '-'
+                target[k] = list(target[k][:n]) + [pad] * (n - len(target[k]))
+            positions = {d: i for i, d in enumerate(target['dates']) if d != '-'}
+            for i, d in enumerate(emp['dates']):
+                if d == '-':
+                    continue
+                day = [emp[k][i] if i < len(emp[k]) else (0 if k == 'attended_minutes' else '-') for k in day_keys]
+                if d in positions:
+                    for k, v in zip(day_keys, day):
+                        target[k][positions[d]] = v
+                else:
+                    positions[d] = len(target['dates'])
+                    for k, v in zip(day_keys, day):
+                        target[k].append(v)
+    return list(merged.values())
+
+def get_parse_executor():
+    """Pool de processus de parsing du processus web, créé au premier appel
+
+    Un seul pool de PARSE_WORKERS processus pour tous les imports, même simultanés
+    (les fichiers attendent leur tour au lieu de démarrer un pool par requête).
+    Recréé après un fork ou si un processus de parsing est mort.
+    """
+    global PARSE_EXECUTOR, PARSE_EXECUTOR_PID
+    with PARSE_EXECUTOR_LOCK:
+        broken = PARSE_EXECUTOR is not None and getattr(PARSE_EXECUTOR, '_broken', False)
+        if PARSE_EXECUTOR is None or PARSE_EXECUTOR_PID != os.getpid() or broken:
+            if broken:
+                PARSE_EXECUTOR.shutdown(wait=False)
+            PARSE_EXECUTOR = ProcessPoolExecutor(max_workers=max(1, app.config.get('PARSE_WORKERS') or 1))
+            PARSE_EXECUTOR_PID = os.getpid()
+        return PARSE_EXECUTOR
+
+def load_sources(sources):
+    """Parse un ou plusieurs exports (en parallèle sur le pool de parsing) et fusionne les employés"""
+    if len(sources) == 1:
+        return parse_attendance_data(*sources[0])
+
+    paths = [s[0] for s in sources]
+    engines = [s[1] for s in sources]
+    if (app.config.get('PARSE_WORKERS') or 1) <= 1:
+        results = list(map(parse_attendance_data, paths, engines))
+    else:
+        results = list(get_parse_executor().map(parse_attendance_data, paths, engines))
+    return merge_employees(results)
 
 @app.route('/test-db')
 def test_db_page():
     """Page de diagnostic de la base de données"""
     return render_template('test_db.html')
 
+@app.route('/api/db-pool')
+def api_db_pool():
+    """Statistiques du pool de connexions BDD du processus (surveillance)"""
+    return jsonify({'success': True, 'pid': os.getpid(), 'pools': pool_stats()})
+
 @app.route('/api/test-db')
 def api_test_db():
     """API de diagnostic détaillée pour la BDD"""
@@ -377,6 +792,7 @@ def api_test_db():
 def dashboard():
     """Rendu du dashboard avec persistance BDD TOTALE et filtrage par période"""
     db = DBManager()
+    DATA_VERSIONS.sync(db.get_data_generation())  # écritures d'autres processus : cache obsolète
     
     # 1. Récupérer les périodes disponibles
     periods = db.get_available_periods()
@@ -394,60 +810,71 @@ def dashboard():
     
     data_id = session.get('data_id')
     employees = []
+    employees_with_stats = None  # déjà calculés en SQL pour les données de la BDD
+    all_dates = []
+    filters = dict(year=target_year, month=target_month, start_date=start_date, end_date=end_date)
     
     # On force la récupération depuis la BDD si une période ou plage est spécifiée
     if (target_year and target_month) or (start_date and end_date):
-        employees = db.get_all_employees_with_detailed_data_filtered(
-            year=target_year, month=target_month, 
-            start_date=start_date, end_date=end_date
-        )
-        # On met à jour la session/mémoire avec ces données filtrées pour le PDF/Excel
+        # Totaux calculés en SQL (une ligne par employé) ; les pointages détaillés
+        # ne sont chargés que si le PDF/Excel/les graphiques en ont besoin
+        employees_with_stats = db.get_period_statistics(**filters)
         new_id = str(uuid.uuid4())
         session['data_id'] = new_id
-        GLOBAL_DATA_STORE[new_id] = {
-            'employees_data': employees,
-            'filepath': None, 'engine': 'xlrd',
-            'year': target_year, 'month': target_month,
-            'start_date': start_date, 'end_date': end_date
-        }
+        GLOBAL_DATA_STORE[new_id] = LazyPeriodEntry(
+            lambda: PeriodAttendance.from_employees(db.iter_employees_with_detailed_data_filtered(**filters)).records(),
+            filepath=None, engine='xlrd',
+            year=target_year, month=target_month,
+            start_date=start_date, end_date=end_date,
+            period_key=f"db:{target_year}-{target_month}:{start_date}:{end_date}"
+        )
     elif data_id in GLOBAL_DATA_STORE:
         employees = GLOBAL_DATA_STORE[data_id]['employees_data']
     else:
         # Fallback : toutes les données
-        employees = db.get_all_employees_with_detailed_data_filtered()
-        if employees:
+        employees_with_stats = db.get_period_statistics()
+        if employees_with_stats:
             new_id = str(uuid.uuid4())
             session['data_id'] = new_id
-            GLOBAL_DATA_STORE[new_id] = {
-                'employees_data': employees,
-                'filepath': None, 'engine': 'xlrd'
-            }
-
-    if not employees:
-        return redirect(url_for('index'))
-    
-    # Calcul des stats et recherche de la plage de dates
-    employees_with_stats = []
-    all_dates = []
-    
-    db = DBManager()
-    calc_context = db.get_calculation_context()
+            GLOBAL_DATA_STORE[new_id] = LazyPeriodEntry(
+                lambda: PeriodAttendance.from_employees(db.iter_employees_with_detailed_data_filtered()).records(),
+                filepath=None, engine='xlrd',
+                period_key='db:all'
+            )
+
+    if employees_with_stats is not None:
+        if not employees_with_stats:
+            return redirect(url_for('index'))
+        employees = employees_with_stats
+        period = _period_key(session.get('data_id'))
+        for emp in employees_with_stats:
+            all_dates.extend([emp.pop('first_date'), emp.pop('last_date')])
+            # Export Excel / PDF de la même période : statistiques servies depuis le cache
+            p_id = str(emp['person_id'])
+            STATS_CACHE.put((p_id, period, DATA_VERSIONS.version(p_id, emp['department'])), emp['stats'])
+    else:
+        if not employees:
+            return redirect(url_for('index'))
+        employees_with_stats = []
+        db = DBManager()
+        calc_context = db.get_calculation_context()
 
-    for emp in employees:
-        stats = calculate_statistics(emp, context=calc_context)
-        # Collecte de toutes les dates pour trouver la plage
-        if 'dates' in emp:
-            all_dates.extend([d for d in emp['dates'] if d and d != '-'])
-        
-        emp_data = {
-            'person_id': emp['person_id'],
-            'name': emp['name'],
-            'department': emp.get('department', 'N/A'),
-            'position': emp.get('position', 'N/A'),
-            'joining_date': emp.get('joining_date', 'N/A'),
-            'stats': stats
-        }
-        employees_with_stats.append(emp_data)
+        # Calcul des stats et recherche de la plage de dates
+        period = _period_key(session.get('data_id'))
+        for emp, stats in zip(employees, calculate_statistics_batch(employees, calc_context, period=period)):
+            # Collecte de toutes les dates pour trouver la plage
+            if 'dates' in emp:
+                all_dates.extend([d for d in emp['dates'] if d and d != '-'])
+            
+            emp_data = {
+                'person_id': emp['person_id'],
+                'name': emp['name'],
+                'department': emp.get('department', 'N/A'),
+                'position': emp.get('position', 'N/A'),
+                'joining_date': emp.get('joining_date', 'N/A'),
+                'stats': stats
+            }
+            employees_with_stats.append(emp_data)
     
     # Détermination de la période couverte
     date_range = "Période non définie"
@@ -605,7 +1032,8 @@ def save_planning():
         db = DBManager()
         success = db.save_employee_planning(person_id, week_date, planning)
         
-        return jsonify({'success': success})
+        # Seules les semaines concernées sont recalculées (stats_semaine_employe)
+        return jsonify({'success': success, 'recomputed_weeks': getattr(db, 'last_refreshed_weeks', 0)})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -682,7 +1110,7 @@ def api_save_function_planning():
         # Les tables sont déjà initialisées au démarrage de l'appli
         
         success = db.save_function_planning(dept_name, planning_data)
-        return jsonify({'success': success})
+        return jsonify({'success': success, 'recomputed_weeks': getattr(db, 'last_refreshed_weeks', 0)})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -716,6 +1144,8 @@ def api_work_hours_details(person_id):
         
         # Récupération du contexte de planning pour cet employé
         calc_context = db.get_calculation_context()
+        resolver = PlanningResolver.for_context(calc_context)
+        monday_str = monday.strftime('%Y-%m-%d')
 
         for i in range(7):
             current_day = monday + timedelta(days=i)
@@ -737,27 +1167,13 @@ def api_work_hours_details(person_id):
             
             c_in = emp['check_ins'][idx] if idx != -1 else None
             c_out = emp['check_outs'][idx] if idx != -1 else None
+            in_min = emp['check_in_minutes'][idx] if idx != -1 else None
+            out_min = emp['check_out_minutes'][idx] if idx != -1 else None
             
             # --- RÉCUPÉRATION DU PLANNING ---
-            # On utilise le contexte pré-chargé pour la performance
-            planned = None
-            p_id = str(person_id)
-            monday_str = monday.strftime('%Y-%m-%d')
-            
-            # Tentative Individuelle
-            indiv_plans = calc_context['individual'].get(p_id, {})
-            if monday_str in indiv_plans:
-                plan_data = indiv_plans[monday_str]
-                if day_name_en in plan_data:
-                    planned = plan_data[day_name_en]
-            
-            # Tentative Fonction (fallback)
-            if not planned:
-                dept = calc_context['emp_depts'].get(p_id) or emp.get('department')
-                if dept and dept in calc_context['functions']:
-                    planned = calc_context['functions'][dept].get(day_name_en)
-
-            is_repos = planned.get('repos', False) if planned else False
+            # Résolveur compilé une fois pour la semaine (heures prévues déjà en minutes)
+            planned = resolver.shifts[resolver.code(str(person_id), monday_str, day_num, emp.get('department'))]
+            is_repos = planned.is_repos if planned else False
             
             # --- CALCUL DE L'ÉCART (DIFFÉRENCE) ---
             actual_minutes = 0
@@ -765,25 +1181,14 @@ def api_work_hours_details(person_id):
             diff_display = ""
             late_display = ""
             
-            # 1. Minutes Réelles
-            if c_in and c_out and c_in not in ('--', '-', '') and c_out not in ('--', '-', ''):
-                try:
-                    t1 = datetime.strptime(c_in.strip()[:5], '%H:%M')
-                    t2 = datetime.strptime(c_out.strip()[:5], '%H:%M')
-                    d_diff = t2 - t1
-                    actual_minutes = int(d_diff.total_seconds() / 60)
-                    if actual_minutes < 0: actual_minutes += 1440 # Nuit
-                except: pass
+            # 1. Minutes Réelles (heures stockées en minutes depuis minuit)
+            if in_min is not None and out_min is not None:
+                actual_minutes = out_min - in_min
+                if actual_minutes < 0: actual_minutes += 1440 # Nuit
             
             # 2. Minutes Prévues
-            if planned and not is_repos:
-                try:
-                    p1 = datetime.strptime(planned['debut'], '%H:%M')
-                    p2 = datetime.strptime(planned['fin'], '%H:%M')
-                    p_diff = p2 - p1
-                    planned_minutes = int(p_diff.total_seconds() / 60)
-                    if planned_minutes < 0: planned_minutes += 1440
-                except: pass
+            if planned and not is_repos and planned.planned_minutes > 0:
+                planned_minutes = planned.planned_minutes
                 
             # 3. Comparaison et Retard
             if actual_minutes > 0 and planned_minutes > 0:
@@ -795,26 +1200,18 @@ def api_work_hours_details(person_id):
                     diff_display = f"-{abs_diff // 60}h {abs_diff % 60:02d}min" if abs_diff >= 60 else f"-{abs_diff} min"
                 
                 # Retard spécifique (Clock-in > Planned Start)
-                try:
-                    actual_start = datetime.strptime(c_in.strip()[:5], '%H:%M')
-                    planned_start_dt = datetime.strptime(planned['debut'], '%H:%M')
-                    if actual_start > planned_start_dt:
-                        late = int((actual_start - planned_start_dt).total_seconds() / 60)
-                        if late > 0:
-                            late_str = f"{late // 60}h {late % 60:02d}min" if late >= 60 else f"{late} min"
-                            late_display = (late_display + " | " if late_display else "") + f"Retard: -{late_str}"
-                except: pass
+                if in_min is not None and planned.start >= 0:
+                    late = in_min - planned.start
+                    if late > 0:
+                        late_str = f"{late // 60}h {late % 60:02d}min" if late >= 60 else f"{late} min"
+                        late_display = (late_display + " | " if late_display else "") + f"Retard: -{late_str}"
 
                 # Départ anticipé (Clock-out < Planned End)
-                try:
-                    actual_end = datetime.strptime(c_out.strip()[:5], '%H:%M')
-                    planned_end_dt = datetime.strptime(planned['fin'], '%H:%M')
-                    if actual_end < planned_end_dt:
-                        early = int((planned_end_dt - actual_end).total_seconds() / 60)
-                        if early > 0:
-                            early_str = f"{early // 60}h {early % 60:02d}min" if early >= 60 else f"{early} min"
-                            late_display = (late_display + " | " if late_display else "") + f"Départ: -{early_str}"
-                except: pass
+                if out_min is not None and planned.end >= 0:
+                    early = planned.end - out_min
+                    if early > 0:
+                        early_str = f"{early // 60}h {early % 60:02d}min" if early >= 60 else f"{early} min"
+                        late_display = (late_display + " | " if late_display else "") + f"Départ: -{early_str}"
 
             # Détection stricte de la présence
             has_clocked_in = (c_in and c_in not in ('--', '-', 'nan', 'None', ''))
@@ -840,8 +1237,8 @@ def api_work_hours_details(person_id):
                 'check_in': c_in or '--',
                 'check_out': c_out or '--',
                 'duration': duration,
-                'planned_start': planned.get('debut') if planned and not is_repos else '--',
-                'planned_end': planned.get('fin') if planned and not is_repos else '--',
+                'planned_start': planned.debut if planned and not is_repos else '--',
+                'planned_end': planned.fin if planned and not is_repos else '--',
                 'is_repos': is_repos,
                 'status_text': status_text,
                 'diff_display': diff_display,
@@ -854,13 +1251,40 @@ def api_work_hours_details(person_id):
         traceback.print_exc()
         return jsonify({'success': False, 'message': str(e)})
 
+def _data_etag(data_id):
+    """ETag de /api/data : change dès qu'une écriture BDD peut modifier les statistiques
+
+    Basé sur la génération stockée en base (incrémentée par les écritures de tous les
+    processus). Base injoignable : compteurs DATA_VERSIONS du processus, avec le pid
+    pour qu'un autre worker ne réponde pas 304 avec un compteur identique par hasard.
+    """
+    db_generation = DBManager().get_data_generation()
+    if db_generation is not None:
+        DATA_VERSIONS.sync(db_generation)
+        key = f"{_period_key(data_id)}:db:{db_generation}"
+    else:
+        key = f"{_period_key(data_id)}:{os.getpid()}:{DATA_VERSIONS.generation}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
 @app.route('/api/data')
 def get_data():
-    """Return employee data as JSON for charts"""
+    """Données des graphiques en colonnes (une liste par champ, alignées sur 'employees')
+
+    Statistiques calculées avec un seul contexte de plannings pour toute la période
+    (ou servies par STATS_CACHE). ETag / If-None-Match : un rechargement sans
+    changement de données répond 304 sans rien recalculer.
+    """
     data_id = session.get('data_id')
     
     if not data_id or data_id not in GLOBAL_DATA_STORE:
         return jsonify({'error': 'No data available'}), 404
+
+    etag = _data_etag(data_id)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     
     # Retrieve data from memory
     stored_data = GLOBAL_DATA_STORE[data_id]
@@ -869,36 +1293,111 @@ def get_data():
     # Prepare data for charts
     chart_data = {
         'employees': [],
+        'person_ids': [],
+        'employee_departments': [],  # index dans departments['names']
         'hours': [],
-        'departments': {},
+        'days_worked': [],
+        'days_absent': [],
+        'departments': {
+            'names': [],
+            'total_hours': [],
+            'employee_count': []
+        },
         'status_summary': {
             'worked': 0,
             'absent': 0,
             'weekend': 0
         }
     }
+    departments = chart_data['departments']
+    dept_index = {}
     
-    for emp in employees:
-        stats = calculate_statistics(emp)
-        chart_data['employees'].append(emp['name'])
-        chart_data['hours'].append(stats['total_hours'])
-        
+    for emp, stats in zip(employees, calculate_statistics_batch(employees, period=_period_key(data_id))):
         # Group by department
         dept = emp['department']
-        if dept not in chart_data['departments']:
-            chart_data['departments'][dept] = {
-                'total_hours': 0,
-                'employee_count': 0
-            }
-        chart_data['departments'][dept]['total_hours'] += stats['total_hours']
-        chart_data['departments'][dept]['employee_count'] += 1
+        i = dept_index.get(dept)
+        if i is None:
+            i = dept_index[dept] = len(departments['names'])
+            departments['names'].append(dept)
+            departments['total_hours'].append(0)
+            departments['employee_count'].append(0)
+        departments['total_hours'][i] += stats['total_hours']
+        departments['employee_count'][i] += 1
+
+        chart_data['employees'].append(emp['name'])
+        chart_data['person_ids'].append(str(emp['person_id']))
+        chart_data['employee_departments'].append(i)
+        chart_data['hours'].append(stats['total_hours'])
+        chart_data['days_worked'].append(stats['total_days_worked'])
+        chart_data['days_absent'].append(stats['total_days_absent'])
         
         # Status summary
         chart_data['status_summary']['worked'] += stats['total_days_worked']
         chart_data['status_summary']['absent'] += stats['total_days_absent']
         chart_data['status_summary']['weekend'] += stats['total_weekends']
-    
-    return jsonify(chart_data)
+    departments['total_hours'] = [round(h, 2) for h in departments['total_hours']]
+
+    response = jsonify(chart_data)  # JSON compact (sans indentation) hors mode debug
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Séries renvoyées par /api/trends (clé JSON -> clé de calculate_statistics)
+TREND_SERIES = {
+    'hours': 'total_hours',
+    'days_worked': 'total_days_worked',
+    'days_absent': 'total_days_absent',
+    'late_minutes': 'total_late_minutes',
+    'count_lates': 'count_lates',
+    'overtime_minutes': 'total_overtime_minutes',
+    'undertime_minutes': 'total_undertime_minutes',
+}
+
+@app.route('/api/trends')
+def api_trends():
+    """Tendances par semaine ou par mois, lues dans les tables d'agrégats (pas de pointages relus)
+
+    Paramètres : grain=week|month (défaut month), person_id=... ou department=...
+    (répétables ; par défaut tous les départements), start / end en YYYY-MM-DD
+    (défaut : les 12 derniers mois). Réponse en colonnes : 'periods' puis, par clé,
+    une liste de valeurs alignée sur 'periods' pour chaque série.
+    """
+    grain = request.args.get('grain', 'month')
+    if grain not in ('week', 'month'):
+        return jsonify({'success': False, 'message': "grain doit valoir 'week' ou 'month'"}), 400
+    try:
+        end_date = datetime.strptime(request.args.get('end') or datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d')
+        start_arg = request.args.get('start')
+        start_date = datetime.strptime(start_arg, '%Y-%m-%d') if start_arg else end_date - timedelta(days=365)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates attendues au format YYYY-MM-DD'}), 400
+
+    person_ids = request.args.getlist('person_id')
+    departments = request.args.getlist('department')
+    scope = 'employee' if person_ids else 'department'
+    try:
+        db = DBManager()
+        rollups = db.get_rollups(scope, grain, person_ids or departments or None,
+                                 start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    key_name = 'person_id' if scope == 'employee' else 'department'
+    periods = sorted({r['period'] for r in rollups})
+    index = {period: i for i, period in enumerate(periods)}
+    names = list(TREND_SERIES) + (['employees'] if scope == 'department' else [])
+    series = {}
+    for r in rollups:
+        values = series.get(r[key_name])
+        if values is None:
+            values = series[r[key_name]] = {name: [0] * len(periods) for name in names}
+        i = index[r['period']]
+        for name, stat in TREND_SERIES.items():
+            values[name][i] = r['stats'][stat]
+        if scope == 'department':
+            values['employees'][i] = r['employees']
+
+    return jsonify({'success': True, 'grain': grain, 'scope': scope, 'periods': periods, 'series': series})
 
 @app.route('/generate-excel')
 def generate_excel():
@@ -915,9 +1414,8 @@ def generate_excel():
     
     # Préparation des données pour Excel
     rows = []
-    for emp in employees:
-        # Utiliser le contexte pour des calculs précis basés sur le planning
-        stats = calculate_statistics(emp, context=calc_context)
+    # Utiliser le contexte pour des calculs précis basés sur le planning
+    for emp, stats in zip(employees, calculate_statistics_batch(employees, calc_context, period=_period_key(data_id))):
         
         # Format minutes to HhMM
         ovt = f"{int(stats['total_overtime_minutes'] // 60)}h{int(stats['total_overtime_minutes'] % 60):02d}" if stats.get('total_overtime_minutes') else "0h00"
@@ -981,33 +1479,72 @@ def generate_pdf():
         db = DBManager()
         calc_context = db.get_calculation_context()
         
-        pdf_path = process_and_generate_pdf(filepath, engine, context=calc_context)
+        # Import multi-fichiers : on régénère le rapport sur l'ensemble fusionné
+        employees = None
+        if len(stored_data.get('sources') or []) > 1:
+            employees = load_sources(stored_data['sources'])
+        
+        pdf_path = process_and_generate_pdf(filepath, engine, context=calc_context, employees=employees,
+                                            period=_period_key(data_id))
         return send_file(pdf_path, as_attachment=True, download_name=f"rapport_assiduité_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
     except Exception as e:
         return f"Erreur lors de la génération du PDF : {str(e)}", 500
 
 
-def parse_attendance_data(filepath, engine):
-    """Parse the attendance Excel file and extract employee data"""
-    
+def parse_attendance_data(filepath, engine, mode=None):
+    """Parse the attendance Excel file and extract employee data
+
+    mode : 'vectorized' (défaut) ou 'legacy' pour revenir à l'ancien parcours
+    ligne par ligne. Par défaut on suit app.config['PARSER_MODE'].
+
+    Le résultat est mis en cache sur disque (SHA-256 du fichier) : un fichier
+    déjà vu n'est pas décodé une seconde fois.
+    """
+    if mode is None:
+        mode = app.config.get('PARSER_MODE', 'vectorized')
+
+    max_bytes = app.config.get('PARSE_CACHE_MAX_BYTES', 0)
+    if not max_bytes:
+        return _parse_attendance_file(filepath, engine, mode)
+
+    cache = ParseCache(app.config['PARSE_CACHE_FOLDER'], max_bytes)
+    key = cache.key_for(filepath, engine, mode)
+    employees = cache.get(key)
+    if employees is None:
+        employees = _parse_attendance_file(filepath, engine, mode)
+        try:
+            cache.put(key, employees)
+        except OSError as e:
+            print(f"[CACHE] Ecriture impossible: {e}")
+    return employees
+
+def _parse_attendance_file(filepath, engine, mode):
+    """Décodage effectif du fichier (sans cache)
+
+    Le format est identifié sur les premiers octets (OLE2, ZIP/xlsx, HTML, CSV) :
+    chaque fichier part directement vers le bon lecteur, sans échec préalable.
+    """
+    engine = engine_for_file(filepath) or engine
+
+    if engine in ('html', 'csv'):
+        if mode == 'legacy' and engine == 'html':
+            # Ancien chemin complet : arbre HTML entier puis parcours iterrows
+            return _extract_employees_legacy(pd.read_html(filepath, header=None)[0])
+        # Lecteur en flux lxml / csv : pas d'arbre complet ni de DataFrame intermédiaire
+        return list(iter_employee_blocks(iter_sheet_rows(filepath, engine)))
+
+    if engine not in ('openpyxl', 'xlrd'):
+        raise ValueError("Format de fichier non reconnu (attendu : .xls, .xlsx, HTML ou CSV)")
+
     # Read the entire file without headers
-    try:
-        df = pd.read_excel(filepath, engine=engine, header=None)
-    except Exception as e:
-        # Fallback pour les faux fichiers .xls qui sont en fait du HTML
-        if 'Expected BOF record' in str(e) or 'html' in str(e).lower():
-            try:
-                # On lit comme du HTML (retourne une liste de DataFrames)
-                dfs = pd.read_html(filepath, header=None)
-                if dfs:
-                    df = dfs[0]  # On prend le premier tableau trouvé
-                else:
-                    raise e
-            except:
-                raise e # Si échec HTML aussi, on remonte l'erreur initiale
-        else:
-            raise e
-    
+    df = pd.read_excel(filepath, engine=engine, header=None)
+
+    if mode == 'legacy':
+        return _extract_employees_legacy(df)
+    return _extract_employees_vectorized(df)
+
+def _extract_employees_legacy(df):
+    """Ancien parcours ligne par ligne (df.iterrows), conservé comme référence"""
     employees = []
     current_employee = None
     
@@ -1104,8 +1641,257 @@ def parse_attendance_data(filepath, engine):
     
     return employees
 
+
+# Libellés de la colonne 0 reconnus dans un bloc employé (même priorité que l'ancien parser)
+_ROW_DATES, _ROW_CHECK_INS, _ROW_CHECK_OUTS, _ROW_ATTENDED, _ROW_STATUSES, _ROW_SUMMARY = range(1, 7)
+_INFO_LABELS = {
+    'Employee Name': 'name',
+    'Department': 'department',
+    'Joining Date': 'joining_date',
+    'Position': 'position',
+}
+
+def _extract_employees_vectorized(df):
+    """Découpage des blocs employés en une seule passe vectorisée sur la colonne 0
+
+    Produit exactement les mêmes structures que _extract_employees_legacy :
+    les bornes de blocs (lignes "Person ID") et le type de chaque ligne sont
+    trouvés sur la colonne 0 entière, puis chaque type de ligne est converti
+    en une seule opération sur le tableau NumPy.
+    """
+    if df.empty:
+        return []
+
+    values = df.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    n_cols = values.shape[1]
+
+    # 1. Classification de toutes les lignes à partir de la colonne 0
+    col0 = pd.Series(values[:, 0], dtype=object)
+    labels = col0.astype(str).str.strip().where(~missing[:, 0], '')
+    lower = labels.str.lower()
+
+    # Recherche de la date de début du rapport ("From: ... To: ...")
+    base_date = None
+    header_rows = np.flatnonzero((labels.str.contains('From:', regex=False) & labels.str.contains('To:', regex=False)).to_numpy())
+    for r in header_rows:
+        m = re.search(r"From:\s*(\d{4}-\d{2}-\d{2})", str(values[r, 0]))
+        if m:
+            try:
+                base_date = datetime.strptime(m.group(1), "%Y-%m-%d")
+                break
+            except: pass
+
+    starts = np.flatnonzero((labels == 'Person ID').to_numpy())
+    if len(starts) == 0:
+        return []
+
+    is_date = lower.str.contains('date', regex=False) & (lower.str.len() < 10)
+    kinds = np.select(
+        [is_date.to_numpy(),
+         lower.str.contains('check-in1', regex=False).to_numpy(),
+         lower.str.contains('check-out1', regex=False).to_numpy(),
+         lower.str.contains('attended', regex=False).to_numpy(),
+         lower.str.contains('status', regex=False).to_numpy(),
+         (labels == 'Summary').to_numpy()],
+        [_ROW_DATES, _ROW_CHECK_INS, _ROW_CHECK_OUTS, _ROW_ATTENDED, _ROW_STATUSES, _ROW_SUMMARY],
+        0
+    )
+    # Les lignes avant le premier "Person ID" n'appartiennent à aucun employé
+    kinds[:starts[0]] = 0
+
+    # 2. Squelette des employés (ligne "Person ID")
+    employees = []
+    info_cells = values[starts]
+    info_missing = missing[starts]
+    info_text = np.char.strip(info_cells.astype(str))
+    for k, r in enumerate(starts):
+        employees.append({
+            'person_id': values[r, 1] if n_cols > 1 and not missing[r, 1] else 'N/A',
+            'name': 'N/A',
+            'department': 'N/A',
+            'joining_date': 'N/A',
+            'position': 'N/A',
+            'dates': [],
+            'check_ins': [],
+            'check_outs': [],
+            'attended_minutes': [],
+            'statuses': [],
+            'summary': ''
+        })
+    for label, key in _INFO_LABELS.items():
+        hits = (info_text == label) & ~info_missing
+        hits[:, max(n_cols - 3, 0):] = False
+        # Parcours dans l'ordre des colonnes : la dernière occurrence l'emporte
+        for k, i in np.argwhere(hits):
+            employees[k][key] = str(info_cells[k, i + 3]) if not info_missing[k, i + 3] else 'N/A'
+
+    # 3. Conversion de chaque type de ligne en bloc (toutes les lignes d'un type à la fois)
+    def as_text(rows):
+        cells = values[rows, 1:]
+        return cells.astype(str), missing[rows, 1:]
+
+    converted = {}
+    rows_by_kind = {kind: np.flatnonzero(kinds == kind) for kind in range(1, 7)}
+
+    rows = rows_by_kind[_ROW_DATES]
+    if len(rows):
+        text, miss = as_text(rows)
+        text = np.where(miss, '-', text)
+        if base_date:
+            day_labels = np.array([(base_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(n_cols - 1)])
+            text = np.where(text == '-', '-', day_labels)
+        converted.update(zip(rows, text.tolist()))
+
+    for kind in (_ROW_CHECK_INS, _ROW_CHECK_OUTS, _ROW_STATUSES):
+        rows = rows_by_kind[kind]
+        if len(rows):
+            text, miss = as_text(rows)
+            converted.update(zip(rows, np.where(miss, '-', text).tolist()))
+
+    rows = rows_by_kind[_ROW_ATTENDED]
+    if len(rows):
+        text, miss = as_text(rows)
+        converted.update(zip(rows, np.where(miss | (text == '-'), 0, values[rows, 1:]).tolist()))
+
+    rows = rows_by_kind[_ROW_SUMMARY]
+    for r in rows:
+        converted[r] = str(values[r, 1]) if n_cols > 1 and not missing[r, 1] else ''
+
+    # 4. Affectation aux employés dans l'ordre des lignes (la dernière ligne d'un type l'emporte)
+    keys = {
+        _ROW_DATES: 'dates', _ROW_CHECK_INS: 'check_ins', _ROW_CHECK_OUTS: 'check_outs',
+        _ROW_ATTENDED: 'attended_minutes', _ROW_STATUSES: 'statuses', _ROW_SUMMARY: 'summary'
+    }
+    kind_rows = np.flatnonzero(kinds)
+    owners = np.searchsorted(starts, kind_rows, side='right') - 1
+    for r, owner in zip(kind_rows, owners):
+        employees[owner][keys[kinds[r]]] = converted[r]
+
+    return employees
+
+def _period_key(data_id):
+    """Identifiant de période d'une entrée de GLOBAL_DATA_STORE pour le cache de statistiques
+
+    Données filtrées depuis la BDD : le filtre (un nouvel data_id est créé à chaque
+    affichage) ; fichier importé : son data_id (ses données ne changent plus).
+    """
+    stored = GLOBAL_DATA_STORE.get(data_id) or {}
+    return stored.get('period_key') or data_id
+
+def calculate_statistics_batch(employees, context=None, period=None):
+    """Statistiques de tous les employés d'une période (liste dans le même ordre)
+
+    Moteur 'batch' (stats_engine, une passe NumPy) par défaut ; calculate_statistics
+    reste la référence et le moteur 'reference' l'appelle employé par employé.
+
+    period (voir _period_key) : les employés dont les données et le planning n'ont
+    pas changé depuis le dernier calcul sont servis depuis STATS_CACHE.
+    """
+    # Contexte pour les plannings, chargé une seule fois
+    if context is None:
+        db = DBManager()
+        context = db.get_calculation_context()
+
+    if period is None or STATS_CACHE.max_entries <= 0:
+        return _compute_statistics(employees, context)
+    DATA_VERSIONS.sync(DBManager().get_data_generation())  # écritures d'autres processus
+
+    employees = list(employees)
+    ids = [str(emp['person_id']) for emp in employees]
+    seen = Counter(ids)
+    emp_depts = context.get('emp_depts') or {}
+    results = [None] * len(employees)
+    keys = [None] * len(employees)
+    missing = []
+    for i, (emp, p_id) in enumerate(zip(employees, ids)):
+        if seen[p_id] > 1:
+            missing.append(i)  # identifiant en double dans la période : pas de cache
+            continue
+        try:
+            dept = emp_depts.get(p_id) or emp.get('department')
+        except Exception:
+            dept = None
+        keys[i] = (p_id, period, DATA_VERSIONS.version(p_id, dept))
+        results[i] = STATS_CACHE.get(keys[i])
+        if results[i] is None:
+            missing.append(i)
+
+    if missing:
+        computed = _compute_statistics([employees[i] for i in missing], context)
+        for i, stats in zip(missing, computed):
+            results[i] = stats
+            if keys[i] is not None:
+                STATS_CACHE.put(keys[i], stats)
+    return results
+
+def _compute_statistics(employees, context):
+    employees = list(employees)
+    workers = min(app.config.get('STATS_WORKERS') or 1, len(employees))
+    if workers > 1 and len(employees) >= app.config.get('STATS_PARALLEL_MIN_EMPLOYEES', 0):
+        try:
+            return _compute_statistics_parallel(employees, context, workers)
+        except Exception as e:
+            print(f"[ERREUR] Calcul parallele des statistiques impossible, calcul en serie : {e}")
+    return _compute_statistics_serial(employees, context, app.config.get('STATS_ENGINE'))
+
+def _compute_statistics_serial(employees, context, engine):
+    if engine == 'reference':
+        return [calculate_statistics(emp, context=context) for emp in employees]
+    return compute_statistics_batch(employees, context, fallback=calculate_statistics)
+
+# Contexte de planning d'un processus de calcul (reçu une seule fois à son démarrage)
+_STATS_WORKER_CONTEXT = None
+_STATS_WORKER_ENGINE = None
+
+def _init_stats_worker(context, engine):
+    global _STATS_WORKER_CONTEXT, _STATS_WORKER_ENGINE
+    _STATS_WORKER_CONTEXT = context
+    _STATS_WORKER_ENGINE = engine
+    PlanningResolver.for_context(context)  # plannings compilés une fois par processus
+
+def _stats_worker_chunk(employees):
+    return _compute_statistics_serial(employees, _STATS_WORKER_CONTEXT, _STATS_WORKER_ENGINE)
+
+def get_stats_executor(context):
+    """Pool de calcul des statistiques du processus web, partagé par toutes les requêtes
+
+    Le contexte de planning est transmis une fois aux processus (initializer), sans
+    le résolveur compilé, recompilé sur place. Le pool est gardé tant que ce contexte
+    (empreinte du contenu) et le moteur sont les mêmes : un planning modifié le
+    recrée. Recréé aussi après un fork ou si un processus de calcul est mort.
+    """
+    global STATS_EXECUTOR, STATS_EXECUTOR_KEY
+    shipped_context = {k: v for k, v in context.items() if k != '_resolver'}
+    engine = app.config.get('STATS_ENGINE')
+    workers = max(1, app.config.get('STATS_WORKERS') or 1)
+    key = (os.getpid(), workers, engine, hashlib.sha1(pickle.dumps(shipped_context)).hexdigest())
+    with STATS_EXECUTOR_LOCK:
+        broken = STATS_EXECUTOR is not None and getattr(STATS_EXECUTOR, '_broken', False)
+        if STATS_EXECUTOR is None or STATS_EXECUTOR_KEY != key or broken:
+            if STATS_EXECUTOR is not None and STATS_EXECUTOR_KEY[0] == os.getpid():
+                STATS_EXECUTOR.shutdown(wait=False)  # les calculs en cours se terminent
+            STATS_EXECUTOR = ProcessPoolExecutor(max_workers=workers, initializer=_init_stats_worker,
+                                                 initargs=(shipped_context, engine))
+            STATS_EXECUTOR_KEY = key
+        return STATS_EXECUTOR
+
+def _compute_statistics_parallel(employees, context, workers):
+    """Statistiques réparties par paquets d'employés sur le pool partagé (get_stats_executor)
+
+    Les vues compactes partent en simples dicts.
+    """
+    pool = get_stats_executor(context)
+    # Quelques paquets par processus pour équilibrer la charge
+    chunk_size = -(-len(employees) // (workers * 4))
+    chunks = [employees[i:i + chunk_size] for i in range(0, len(employees), chunk_size)]
+    results = []
+    for chunk_stats in pool.map(_stats_worker_chunk, chunks):
+        results.extend(chunk_stats)
+    return results
+
 def calculate_statistics(employee, context=None):
-    """Calcule les statistiques d'un employé"""
+    """Calcule les statistiques d'un employé (implémentation de référence)"""
     total_minutes = 0
     total_days_worked = 0
     total_days_absent = 0
@@ -1119,58 +1905,36 @@ def calculate_statistics(employee, context=None):
     if context is None:
         db = DBManager()
         context = db.get_calculation_context()
+    resolver = PlanningResolver.for_context(context)
 
     p_id = str(employee['person_id'])
+    statuses = employee['statuses']
+    check_ins = employee['check_ins']
+    check_outs = employee['check_outs']
+    attended_minutes = employee['attended_minutes']
 
     for i, date_val in enumerate(employee['dates']):
         # 1. Infos de base
-        status = str(employee['statuses'][i]).upper() if i < len(employee['statuses']) else ''
-        check_in = str(employee['check_ins'][i]) if i < len(employee['check_ins']) else '-'
-        check_out = str(employee['check_outs'][i]) if i < len(employee['check_outs']) else ''
+        status = str(statuses[i]).upper() if i < len(statuses) else ''
+        check_in = str(check_ins[i]) if i < len(check_ins) else '-'
+        check_out = str(check_outs[i]) if i < len(check_outs) else ''
         
-        # 2. Récupérer le planning depuis le CONTEXTE (beaucoup plus rapide)
-        planned = None
+        # 2. Planning du jour via le résolveur du contexte (heures déjà en minutes)
+        plan_code = NO_PLAN
         try:
             date_obj = datetime.strptime(str(date_val)[:10], '%Y-%m-%d')
             monday_str = (date_obj - timedelta(days=date_obj.weekday())).strftime('%Y-%m-%d')
-            
-            # Mapping robuste indépendant de la locale
-            days_fr = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
-            day_name = days_fr[date_obj.weekday()]
-            
-            # Tentative Individuelle
-            indiv_plans = context['individual'].get(p_id, {})
-            if monday_str in indiv_plans:
-                plan_data = indiv_plans[monday_str]
-                if day_name in plan_data:
-                    planned = {
-                        'heure_debut': plan_data[day_name]['debut'],
-                        'heure_fin': plan_data[day_name]['fin'],
-                        'est_repos': plan_data[day_name]['repos']
-                    }
-            
-            # Tentative Fonction (fallback)
-            if not planned:
-                dept = context['emp_depts'].get(p_id) or employee.get('department')
-                if dept and dept in context['functions']:
-                    dept_plan = context['functions'][dept]
-                    if day_name in dept_plan:
-                        planned = {
-                            'heure_debut': dept_plan[day_name]['debut'],
-                            'heure_fin': dept_plan[day_name]['fin'],
-                            'est_repos': dept_plan[day_name]['repos']
-                        }
+            plan_code = resolver.code(p_id, monday_str, date_obj.weekday(), employee.get('department'))
         except Exception as e: 
             pass
 
-        is_repos_planned = planned['est_repos'] if planned else False
-        planned_start = planned['heure_debut'] if (planned and not is_repos_planned) else None
-        planned_end = planned['heure_fin'] if (planned and not is_repos_planned) else None
+        planned = resolver.shifts[plan_code]
+        is_repos_planned = planned.is_repos if planned else False
 
         minutes = 0
-        if i < len(employee['attended_minutes']):
+        if i < len(attended_minutes):
             try:
-                val = employee['attended_minutes'][i]
+                val = attended_minutes[i]
                 if val != '-' and val != 'nan':
                     minutes = int(float(val))
             except: minutes = 0
@@ -1184,38 +1948,22 @@ def calculate_statistics(employee, context=None):
             total_minutes += minutes
             
             # --- CALCUL DU RETARD ---
-            if planned_start and has_clocked_in:
-                try:
-                    fmt = "%H:%M"
-                    clean_check_in = check_in.strip()[:5] 
-                    
-                    time_planned = datetime.strptime(planned_start, fmt)
-                    time_actual = datetime.strptime(clean_check_in, fmt)
-                    
-                    if time_actual > time_planned:
-                        diff_late = (time_actual - time_planned).total_seconds() / 60
-                        if diff_late > 0:
-                            total_late_minutes += int(diff_late)
-                            count_lates += 1  # Incrémenter le nombre de retards
-                except: pass
+            if planned and planned.start >= 0 and has_clocked_in:
+                # Même règle que strptime(check_in.strip()[:5], "%H:%M")
+                actual_start = hm_to_minutes(check_in.strip()[:5])
+                if actual_start > planned.start:
+                    total_late_minutes += actual_start - planned.start
+                    count_lates += 1  # Incrémenter le nombre de retards
 
             # --- CALCUL HEURES SUPP / MANQUANTES ---
-            if planned_start and planned_end:
-                try:
-                    p1 = datetime.strptime(planned_start, "%H:%M")
-                    p2 = datetime.strptime(planned_end, "%H:%M")
-                    p_diff = (p2 - p1).total_seconds() / 60
-                    if p_diff < 0: p_diff += 1440
-                    planned_min = int(p_diff)
+            if planned and planned.planned_minutes >= 0:
+                if minutes > 0:
+                    diff_work = minutes - planned.planned_minutes
                     
-                    if minutes > 0:
-                        diff_work = minutes - planned_min
-                        
-                        if diff_work > 0:
-                            total_overtime_minutes += diff_work
-                        elif diff_work < 0:
-                            total_undertime_minutes += abs(diff_work)
-                except: pass
+                    if diff_work > 0:
+                        total_overtime_minutes += diff_work
+                    elif diff_work < 0:
+                        total_undertime_minutes += abs(diff_work)
         
         elif not is_repos_planned and date_obj.weekday() < 6: 
              # Si pas travaillé, pas repos, et pas Dimanche (simplifié) -> Absent
@@ -1244,11 +1992,12 @@ def calculate_statistics(employee, context=None):
         'average_hours_per_day': round(total_hours / total_days_worked, 2) if total_days_worked > 0 else 0
     }
 
-def process_and_generate_pdf(filepath, engine, context=None):
+def process_and_generate_pdf(filepath, engine, context=None, employees=None, period=None):
     """Process Excel file and generate PDF report"""
     
-    # Parse the attendance data
-    employees = parse_attendance_data(filepath, engine)
+    # Parse the attendance data (sauf si les employés sont déjà fournis)
+    if employees is None:
+        employees = parse_attendance_data(filepath, engine)
     
     # Préparation du contexte s'il n'est pas fourni
     if context is None:
@@ -1300,7 +2049,8 @@ def process_and_generate_pdf(filepath, engine, context=None):
     
     # Global statistics
     total_employees = len(employees)
-    total_hours_all = sum([calculate_statistics(emp, context=context)['total_hours'] for emp in employees])
+    all_stats = calculate_statistics_batch(employees, context, period=period)
+    total_hours_all = sum([stats['total_hours'] for stats in all_stats])
     
     summary_data = [
         ['STATISTIQUES GLOBALES', ''],
@@ -1329,8 +2079,7 @@ def process_and_generate_pdf(filepath, engine, context=None):
     elements.append(Paragraph("DÉTAILS PAR EMPLOYÉ", heading_style))
     elements.append(Spacer(1, 12))
     
-    for emp in employees:
-        stats = calculate_statistics(emp, context=context)
+    for emp, stats in zip(employees, all_stats):
         
         # Employee header
         emp_header = Paragraph(f"<b>{emp['name']}</b> (ID: {emp['person_id']})", heading_style)
@@ -1461,6 +2210,7 @@ def api_import_planning():
         employees = db.get_all_employees()
         
         updated_count = 0
+        updated_ids = []
         errors = []
         logs = []
         
@@ -1587,13 +2337,19 @@ def api_import_planning():
             
             if has_valid_data:
                 # Sauvegarde en BDD
-                res = db.save_weekly_planning(emp_found['person_id'], week_start_str, planning_data)
+                res = db.save_weekly_planning(emp_found['person_id'], week_start_str, planning_data, refresh_facts=False)
                 if res:
                     updated_count += 1
+                    updated_ids.append(emp_found['person_id'])
                     logs.append(f"✅ {emp_found['name']} : Planning mis à jour.")
                 else:
                     errors.append(f"Erreur DB pour {emp_found['name']}")
 
+        # Faits journaliers de la semaine recalculés une seule fois pour tous les employés importés
+        if updated_ids:
+            start_date, end_date = db.week_bounds(week_start_str)
+            db.refresh_pointage_facts(updated_ids, start_date=start_date, end_date=end_date)
+
         return jsonify({
             'success': True,
             'message': 'Importation terminée.',
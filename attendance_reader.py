@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture en flux (mémoire constante) des exports de la pointeuse.
+
+Au lieu de charger tout le classeur dans un DataFrame, on lit les lignes une par
+une (openpyxl en lecture seule, xlrd à la demande, ou iterparse lxml pour les
+faux .xls en HTML) et on produit les employés bloc par bloc via un générateur.
+Les structures produites sont les mêmes que celles de parse_attendance_data.
+
+Pour retrouver exactement la largeur de ligne de pandas (qui influe sur les
+listes produites), les lecteurs xlsx et HTML font une première passe légère.
+
+Limite connue : la date "From: ... To: ..." doit précéder les blocs employés
+(c'est le cas des exports de la pointeuse).
+"""
+import csv
+import re
+import zipfile
+from datetime import datetime, time, timedelta
+
+# Valeurs considérées comme vides par pandas (na_values par défaut)
+_NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+_RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+
+_INFO_LABELS = {
+    'Employee Name': 'name',
+    'Department': 'department',
+    'Joining Date': 'joining_date',
+    'Position': 'position',
+}
+
+
+def _clean(value):
+    """Normalise une cellule comme pandas : None pour les valeurs manquantes"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return None if value in _NA_STRINGS else value
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+# --- DÉTECTION DU FORMAT (sur les premiers octets, pas sur l'extension) ---
+
+_OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # Vrai .xls (BIFF dans un conteneur OLE2)
+_ZIP_MAGIC = b'PK\x03\x04'  # .xlsx ou archive .zip
+_HTML_MARKERS = ('<html', '<table', '<!doctype html', '<head', '<body', '<meta', '<tr')
+# Export CSV : une ligne "Person ID" ou d'en-tête "From: ... To: ..." suivie d'un séparateur
+_CSV_SIGNATURE = re.compile(r'^\s*"?(?:person id|from:[^\n]*\bto:[^\n]*?)"?\s*[,;\t]', re.M)
+
+# Format détecté -> moteur de lecture
+FORMAT_ENGINES = {
+    'xls': 'xlrd',
+    'xlsx': 'openpyxl',
+    'html': 'html',
+    'csv': 'csv',
+}
+
+
+def detect_format(filepath):
+    """Identifie le format réel d'un export : 'xls', 'xlsx', 'zip', 'html', 'csv' ou None
+
+    Beaucoup de ".xls" de la pointeuse sont en réalité du HTML : on regarde les
+    premiers octets du fichier au lieu de faire confiance à l'extension. Un texte
+    n'est reconnu comme CSV que s'il a la signature d'un export (_CSV_SIGNATURE).
+    """
+    with open(filepath, 'rb') as f:
+        head = f.read(4096)
+
+    if head.startswith(_OLE2_MAGIC):
+        return 'xls'
+    if head.startswith(_ZIP_MAGIC):
+        try:
+            with zipfile.ZipFile(filepath) as zf:
+                names = set(zf.namelist())
+        except zipfile.BadZipFile:
+            return None
+        return 'xlsx' if 'xl/workbook.xml' in names else 'zip'
+
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        text = head.decode('utf-16', errors='ignore')
+    else:
+        if head.startswith(b'\xef\xbb\xbf'):
+            head = head[3:]
+        if b'\x00' in head:
+            return None
+        text = head.decode('latin-1')
+    text = text.lstrip().lower()
+    if text.startswith('<') and any(marker in text for marker in _HTML_MARKERS):
+        return 'html'
+    return 'csv' if _CSV_SIGNATURE.search(text) else None
+
+
+def engine_for_file(filepath):
+    """Moteur de lecture adapté au contenu du fichier (None si non supporté)"""
+    return FORMAT_ENGINES.get(detect_format(filepath))
+
+
+# --- LECTEURS DE LIGNES ---
+
+def iter_rows_openpyxl(filepath):
+    """Lignes de la première feuille d'un .xlsx (openpyxl read_only)"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        # La dimension déclarée dans le fichier n'est pas fiable (colonnes vides
+        # en fin de ligne) : une première passe calcule la largeur utile, comme pandas
+        ws.reset_dimensions()
+        width = 0
+        for row in ws.iter_rows(values_only=True):
+            cells = [_clean(v) for v in row]
+            while cells and cells[-1] is None:
+                cells.pop()
+            width = max(width, len(cells))
+        for row in ws.iter_rows(values_only=True):
+            yield [_clean(v) for v in row[:width]], width
+    finally:
+        wb.close()
+
+
+def iter_rows_xlrd(filepath):
+    """Lignes de la première feuille d'un vrai .xls (xlrd on_demand)"""
+    import xlrd
+    from xlrd import XL_CELL_BOOLEAN, XL_CELL_DATE, XL_CELL_ERROR, xldate
+
+    book = xlrd.open_workbook(filepath, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        epoch1904 = book.datemode
+        width = sheet.ncols
+
+        def parse_cell(value, typ):
+            if typ == XL_CELL_DATE:
+                try:
+                    value = xldate.xldate_as_datetime(value, epoch1904)
+                except OverflowError:
+                    return value
+                # Les dates sur l'époque Excel sont en fait des heures
+                if (not epoch1904 and value.timetuple()[0:3] == (1899, 12, 31)) or \
+                        (epoch1904 and value.timetuple()[0:3] == (1904, 1, 1)):
+                    value = time(value.hour, value.minute, value.second, value.microsecond)
+                return value
+            if typ == XL_CELL_ERROR:
+                return None
+            if typ == XL_CELL_BOOLEAN:
+                return bool(value)
+            return _clean(value)
+
+        for i in range(sheet.nrows):
+            yield [parse_cell(v, t) for v, t in zip(sheet.row_values(i), sheet.row_types(i))], width
+    finally:
+        book.release_resources()
+
+
+def _iter_html_tr(filepath):
+    """Parcours itératif des <tr> du premier tableau (lxml iterparse)"""
+    from lxml import etree
+
+    depth = 0
+    done = False
+    for event, elem in etree.iterparse(filepath, events=('start', 'end'), tag=('table', 'tr'), html=True, recover=True):
+        if done:
+            break
+        if elem.tag == 'table':
+            if event == 'start':
+                depth += 1
+            else:
+                depth -= 1
+                done = depth == 0
+                elem.clear()
+            continue
+        if event == 'end' and depth == 1:
+            cells = []
+            for cell in elem:
+                if cell.tag not in ('td', 'th'):
+                    continue
+                text = _RE_WHITESPACE.sub(" ", "".join(cell.itertext()).strip())
+                try:
+                    span = max(int(cell.get('colspan', 1)), 1)
+                except ValueError:
+                    span = 1
+                cells.extend([text] * span)
+            yield cells
+            # Libération mémoire de la ligne déjà traitée
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+def iter_rows_html(filepath):
+    """Lignes d'un faux .xls en HTML, sans construire l'arbre complet"""
+    # Première passe légère pour connaître la largeur (comme pd.read_html)
+    width = 0
+    for cells in _iter_html_tr(filepath):
+        width = max(width, len(cells))
+    for cells in _iter_html_tr(filepath):
+        yield [_clean(v) for v in cells], width
+
+
+def iter_rows_csv(filepath):
+    """Lignes d'un export CSV (séparateur détecté automatiquement)"""
+    with open(filepath, newline='', encoding='utf-8-sig', errors='replace') as f:
+        sample = f.read(64 * 1024)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    def read():
+        with open(filepath, newline='', encoding='utf-8-sig', errors='replace') as f:
+            yield from csv.reader(f, dialect)
+
+    width = 0
+    for cells in read():
+        width = max(width, len(cells))
+    for cells in read():
+        yield [_clean(v) for v in cells], width
+
+
+_ROW_READERS = {
+    'xlrd': iter_rows_xlrd,
+    'openpyxl': iter_rows_openpyxl,
+    'html': iter_rows_html,
+    'csv': iter_rows_csv,
+}
+
+
+def iter_sheet_rows(filepath, engine=None):
+    """Choisit le lecteur de lignes d'après le contenu du fichier (engine sert de repli)"""
+    engine = engine_for_file(filepath) or engine
+    if engine not in _ROW_READERS:
+        raise ValueError(f"Format de fichier non reconnu : {filepath}")
+    return _ROW_READERS[engine](filepath)
+
+
+# --- ASSEMBLAGE DES BLOCS EMPLOYÉS ---
+
+def iter_employee_blocks(rows):
+    """Transforme un flux de lignes (cellules, largeur) en employés, un bloc à la fois
+
+    Même logique que l'ancien parser : une ligne "Person ID" ouvre un bloc, les
+    lignes Date / Check-in1 / Check-out1 / Attended / Status / Summary le complètent.
+    """
+    base_date = None
+    current = None
+
+    def text_cells(cells, width):
+        out = ['-' if v is None else str(v) for v in cells[1:]]
+        out.extend(['-'] * (width - 1 - len(out)))
+        return out
+
+    for cells, width in rows:
+        if not cells:
+            continue
+        first = cells[0]
+        label = str(first).strip() if first is not None else ''
+
+        if base_date is None and current is None and "From:" in label and "To:" in label:
+            m = re.search(r"From:\s*(\d{4}-\d{2}-\d{2})", str(first))
+            if m:
+                try:
+                    base_date = datetime.strptime(m.group(1), "%Y-%m-%d")
+                except: pass
+
+        if label == "Person ID":
+            if current is not None:
+                yield current
+            current = {
+                'person_id': cells[1] if len(cells) > 1 and cells[1] is not None else 'N/A',
+                'name': 'N/A',
+                'department': 'N/A',
+                'joining_date': 'N/A',
+                'position': 'N/A',
+                'dates': [],
+                'check_ins': [],
+                'check_outs': [],
+                'attended_minutes': [],
+                'statuses': [],
+                'summary': ''
+            }
+            for i, v in enumerate(cells):
+                key = _INFO_LABELS.get(str(v).strip()) if v is not None else None
+                if key and i + 3 < width:
+                    val = cells[i + 3] if i + 3 < len(cells) else None
+                    current[key] = str(val) if val is not None else 'N/A'
+
+        if current is None:
+            continue
+
+        first_col = label.lower()
+        if "date" in first_col and len(first_col) < 10:
+            raw_dates = text_cells(cells, width)
+            if base_date:
+                current['dates'] = ['-' if d == '-' else (base_date + timedelta(days=i)).strftime('%Y-%m-%d')
+                                    for i, d in enumerate(raw_dates)]
+            else:
+                current['dates'] = raw_dates
+        elif "check-in1" in first_col:
+            current['check_ins'] = text_cells(cells, width)
+        elif "check-out1" in first_col:
+            current['check_outs'] = text_cells(cells, width)
+        elif "attended" in first_col:
+            values = [v if v is not None and str(v) != '-' else 0 for v in cells[1:]]
+            values.extend([0] * (width - 1 - len(values)))
+            current['attended_minutes'] = values
+        elif "status" in first_col:
+            current['statuses'] = text_cells(cells, width)
+        elif label == "Summary":
+            current['summary'] = str(cells[1]) if len(cells) > 1 and cells[1] is not None else ''
+
+    if current is not None:
+        yield current
+
+
+def iter_attendance_records(filepath, engine=None):
+    """Générateur d'employés pour un export pointeuse, en mémoire constante"""
+    return iter_employee_blocks(iter_sheet_rows(filepath, engine))
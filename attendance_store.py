@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Stockage compact (en colonnes typées) des pointages d'une période.
+
+Chaque employé parsé transportait cinq listes Python de chaînes ('dates',
+'check_ins', 'check_outs', 'statuses', 'attended_minutes'). Ici tous les jours
+de tous les employés d'une période sont rangés dans quelques tableaux NumPy :
+
+- dates       : ordinal du jour (int32), -1 pour '-'
+- check_ins   : minutes depuis minuit (int16), -1 pour '-'
+- check_outs  : minutes depuis minuit (int16), -1 pour '-'
+- minutes     : minutes travaillées (int32)
+- statuses    : code du statut (uint8/uint16) dans un vocabulaire propre à la période
+
+Les valeurs qui ne sont pas sous forme canonique ('YYYY-MM-DD', 'HH:MM') sont
+gardées telles quelles dans un petit dictionnaire d'exceptions : la relecture
+redonne exactement les chaînes d'origine. Les minutes travaillées sont
+normalisées en entiers (même conversion que calculate_statistics et save_data).
+
+AttendanceRecord est une vue légère (__slots__) sur un employé, qui se comporte
+comme le dict d'origine pour les templates, les statistiques et la sauvegarde BDD.
+"""
+import re
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+DAY_FIELDS = ('dates', 'check_ins', 'check_outs', 'attended_minutes', 'statuses')
+
+_MISSING = -1    # '-'
+_EXCEPTION = -2  # valeur non canonique, voir PeriodAttendance.exceptions
+_INT32_MAX = 2 ** 31 - 1
+_OUT_OF_RANGE = 2 ** 40  # minutes non représentables en int32
+
+_RE_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_RE_TIME = re.compile(r"([01]\d|2[0-3]):([0-5]\d)")
+_TIME_LABELS = [f"{m // 60:02d}:{m % 60:02d}" for m in range(1440)]
+
+
+def _encode_date(value):
+    if value == '-':
+        return _MISSING
+    if isinstance(value, str) and _RE_DATE.fullmatch(value):
+        try:
+            d = date.fromisoformat(value)
+        except ValueError:
+            return _EXCEPTION
+        if d.isoformat() == value:
+            return d.toordinal()
+    return _EXCEPTION
+
+
+def _encode_time(value):
+    if value == '-':
+        return _MISSING
+    if isinstance(value, str):
+        m = _RE_TIME.fullmatch(value)
+        if m:
+            return int(m.group(1)) * 60 + int(m.group(2))
+    return _EXCEPTION
+
+
+def _encode_minutes(value):
+    """Même règle que calculate_statistics : '-', 'nan' ou illisible -> 0"""
+    if value == '-' or value == 'nan':
+        return 0
+    try:
+        minutes = int(float(value or 0))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+    # Hors int32 : valeur d'origine gardée dans les exceptions
+    return minutes if -_INT32_MAX <= minutes <= _INT32_MAX else _OUT_OF_RANGE
+
+
+def _encode_column(values, encoder):
+    """Encode une colonne aplatie en ne convertissant que les valeurs distinctes"""
+    if not values:
+        return np.empty(0, dtype=np.int64)
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    table = np.array([encoder(v) for v in uniques], dtype=np.int64)
+    return table[codes]
+
+
+class PeriodAttendance:
+    """Tous les pointages d'une période (un upload ou une période filtrée) en colonnes typées"""
+
+    def __init__(self, meta, offsets, columns, status_labels, exceptions):
+        self.meta = meta                    # un dict par employé (person_id, name, department...)
+        self.offsets = offsets              # {champ: tableau int64 de taille n+1}
+        self.columns = columns              # {champ: tableau typé}
+        self.status_labels = status_labels  # code -> statut d'origine
+        self.exceptions = exceptions        # {(champ, position): valeur d'origine}
+        self._decoded = None                # listes relues, uniquement pendant decoded()
+        self._decoding = 0
+
+    @classmethod
+    def from_employees(cls, employees):
+        """Construit le stockage à partir des dicts produits par le parser ou la BDD
+
+        `employees` peut être un générateur : il est parcouru une seule fois.
+        """
+        meta = []
+        offsets = {}
+        flat = {field: [] for field in DAY_FIELDS}
+        lengths = {field: [] for field in DAY_FIELDS}
+        for emp in employees:
+            meta.append({k: v for k, v in emp.items() if k not in DAY_FIELDS})
+            for field in DAY_FIELDS:
+                values = emp.get(field)
+                if values is None:
+                    lengths[field].append(-1)  # champ absent (différent d'une liste vide)
+                    continue
+                flat[field].extend(values)
+                lengths[field].append(len(values))
+
+        for field in DAY_FIELDS:
+            offsets[field] = np.concatenate(([0], np.cumsum(np.maximum(lengths[field], 0)))).astype(np.int64)
+            offsets[field + '_present'] = np.array(lengths[field], dtype=np.int64) >= 0
+
+        exceptions = {}
+        columns = {}
+        for field, encoder, dtype in (('dates', _encode_date, np.int32),
+                                      ('check_ins', _encode_time, np.int16),
+                                      ('check_outs', _encode_time, np.int16)):
+            encoded = _encode_column(flat[field], encoder)
+            for pos in np.flatnonzero(encoded == _EXCEPTION):
+                exceptions[(field, int(pos))] = flat[field][pos]
+            columns[field] = encoded.astype(dtype)
+
+        minutes = _encode_column(flat['attended_minutes'], _encode_minutes)
+        for pos in np.flatnonzero(minutes == _OUT_OF_RANGE):
+            exceptions[('attended_minutes', int(pos))] = flat['attended_minutes'][pos]
+        columns['attended_minutes'] = np.where(minutes == _OUT_OF_RANGE, 0, minutes).astype(np.int32)
+
+        # Vocabulaire des statuts construit à la main : factorize transformerait None en NaN
+        vocab = {}
+        codes = np.fromiter((vocab.setdefault(s, len(vocab)) for s in flat['statuses']),
+                            dtype=np.int64, count=len(flat['statuses']))
+        status_labels = list(vocab)
+        columns['statuses'] = codes.astype(np.uint8 if len(status_labels) <= 256 else np.uint16)
+
+        return cls(meta, offsets, columns, status_labels, exceptions)
+
+    def __len__(self):
+        return len(self.meta)
+
+    def records(self):
+        """Vues employé (même interface que les dicts d'origine)"""
+        return [AttendanceRecord(self, i, self.meta[i]) for i in range(len(self.meta))]
+
+    @contextmanager
+    def decoded(self):
+        """Garde les listes relues le temps d'un traitement (statistiques, sauvegarde)
+
+        Hors de ce bloc chaque accès redécode la colonne : les vues conservées dans
+        GLOBAL_DATA_STORE ne gardent jamais de listes Python.
+        """
+        if self._decoding == 0:
+            self._decoded = {}
+        self._decoding += 1
+        try:
+            yield self
+        finally:
+            self._decoding -= 1
+            if self._decoding == 0:
+                self._decoded = None
+
+    def cached_day_values(self, field, index):
+        """day_values, mémorisé pendant decoded()"""
+        cache = self._decoded
+        if cache is None:
+            return self.day_values(field, index)
+        values = cache.get((field, index))
+        if values is None:
+            values = cache[(field, index)] = self.day_values(field, index)
+        return values
+
+    def has_field(self, field, index):
+        return bool(self.offsets[field + '_present'][index])
+
+    def day_slice(self, field, index):
+        """Bornes [début, fin) des jours d'un employé dans la colonne"""
+        off = self.offsets[field]
+        return int(off[index]), int(off[index + 1])
+
+    def day_values(self, field, index):
+        """Relecture d'une liste employé sous sa forme d'origine"""
+        start, end = self.day_slice(field, index)
+        raw = self.columns[field][start:end].tolist()
+        if field == 'attended_minutes':
+            if self.exceptions:
+                for pos in range(start, end):
+                    if (field, pos) in self.exceptions:
+                        raw[pos - start] = self.exceptions[(field, pos)]
+            return raw
+        if field == 'statuses':
+            labels = self.status_labels
+            return [labels[c] for c in raw]
+
+        if field == 'dates':
+            labels = {}
+            out = []
+            for pos, v in enumerate(raw, start):
+                if v >= 0:
+                    if v not in labels:
+                        labels[v] = date.fromordinal(v).isoformat()
+                    out.append(labels[v])
+                elif v == _MISSING:
+                    out.append('-')
+                else:
+                    out.append(self.exceptions[(field, pos)])
+            return out
+
+        return [_TIME_LABELS[v] if v >= 0 else ('-' if v == _MISSING else self.exceptions[(field, pos)])
+                for pos, v in enumerate(raw, start)]
+
+    def nbytes(self):
+        """Taille des tableaux de jours (hors métadonnées), pour le suivi mémoire"""
+        return sum(a.nbytes for a in self.columns.values()) + sum(a.nbytes for a in self.offsets.values())
+
+
+class AttendanceRecord:
+    """Vue sur un employé d'un PeriodAttendance, utilisable comme le dict d'origine
+
+    Chaque accès à une liste de jours la redécode, sauf dans un bloc
+    PeriodAttendance.decoded() : lire la liste une fois avant une boucle indexée.
+    """
+    __slots__ = ('_store', '_index', '_meta')
+
+    # Vue mutable : pas de hash (comme dict)
+    __hash__ = None
+
+    def __init__(self, store, index, meta):
+        self._store = store
+        self._index = index
+        self._meta = meta
+
+    def __getitem__(self, key):
+        if key in self._meta:
+            return self._meta[key]
+        if key in DAY_FIELDS and self._store.has_field(key, self._index):
+            return self._store.cached_day_values(key, self._index)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self._meta[key] = value
+
+    def __contains__(self, key):
+        return key in self._meta or (key in DAY_FIELDS and self._store.has_field(key, self._index))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self._meta.keys()) + [f for f in DAY_FIELDS if f not in self._meta and f in self]
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def copy(self):
+        """Nouvelle vue (les jours restent partagés, les métadonnées sont copiées)"""
+        return AttendanceRecord(self._store, self._index, dict(self._meta))
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, AttendanceRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __reduce__(self):
+        # Envoyé à un autre processus : on transmet un dict simple, pas tout le stockage
+        return (dict, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"AttendanceRecord({self._meta.get('person_id')!r}, {self._meta.get('name')!r})"
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Import d'historique : charge une série d'exports pointeuse en base (LOAD DATA LOCAL INFILE)
+
+Chaque fichier est lu en flux (iter_attendance_records) puis sauvegardé par
+DBManager.save_data(bulk=True) : pointages chargés par LOAD DATA LOCAL INFILE,
+avec repli automatique sur executemany si le serveur le refuse ; faits
+journaliers et agrégats mis à jour comme pour un import par l'application.
+
+Exemples :
+  python backfill_exports.py exports/2025-*.xls
+  python backfill_exports.py --delta exports/janvier.xlsx exports/fevrier.xlsx
+"""
+import argparse
+import sys
+import time
+
+from attendance_reader import engine_for_file, iter_attendance_records
+from db_manager import DBManager
+
+
+def backfill(paths, db=None, delta=False, bulk=True):
+    """Importe les fichiers dans l'ordre donné ; retourne [(fichier, succès, message)]"""
+    db = db or DBManager()
+    results = []
+    for path in paths:
+        try:
+            engine = engine_for_file(path)
+        except OSError as e:
+            print(f"[ERREUR] {path} : {e}")
+            results.append((path, False, str(e)))
+            continue
+        if engine is None:
+            print(f"[ERREUR] {path} : format de fichier non reconnu")
+            results.append((path, False, "format de fichier non reconnu"))
+            continue
+        start = time.perf_counter()
+        success, message = db.save_data(iter_attendance_records(path, engine), delta=delta, bulk=bulk)
+        if success:
+            method = (db.last_save_counts or {}).get('load_method') or '-'
+            print(f"[OK] {path} : {message} ({method}, {time.perf_counter() - start:.1f} s)")
+        else:
+            print(f"[ERREUR] {path} : {message}")
+        results.append((path, success, message))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import d'historique d'exports pointeuse en base")
+    parser.add_argument('files', nargs='+', help="exports pointeuse (xls, xlsx, html...)")
+    parser.add_argument('--delta', action='store_true', help="n'écrire que les pointages nouveaux ou modifiés")
+    parser.add_argument('--no-bulk', action='store_true', help="executemany au lieu de LOAD DATA LOCAL INFILE")
+    args = parser.parse_args(argv)
+
+    db = DBManager()
+    db.init_planning_table()
+    results = backfill(args.files, db, delta=args.delta, bulk=not args.no_bulk)
+    failed = [path for path, success, _ in results if not success]
+    print(f"[OK] {len(results) - len(failed)} fichier(s) importe(s), {len(failed)} en erreur.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
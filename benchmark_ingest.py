@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de l'import : parsing, statistiques et sauvegarde BDD
+
+Chaque étape est mesurée sur des exports synthétiques de taille croissante
+(generate_attendance_export.py, graine fixe) :
+  - parse       : parse_attendance_data sans le cache disque
+  - stats       : calculate_statistics_batch (moteur STATS_ENGINE, contexte BDD chargé une fois)
+  - save        : DBManager.save_data dans une base vide (insertions)
+  - save_again  : second save_data du même fichier (ré-import, mode delta)
+
+Pour chaque étape : durée, débit (employés/s et lignes/s) et pic mémoire
+(tracemalloc, mesuré dans une seconde passe pour ne pas fausser les durées).
+
+Exemples :
+  python benchmark_ingest.py run --sizes 100,1000,10000 -o bench_baseline.json
+  python benchmark_ingest.py run --db mysql -o bench_mysql.json   (DB_NAME = base de test !)
+  python benchmark_ingest.py compare bench_baseline.json bench_results.json --threshold 0.15
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from generate_attendance_export import generate_export
+
+STAGES = ('parse', 'stats', 'save', 'save_again')
+EXTENSIONS = {'xlsx': 'xlsx', 'xls': 'xls', 'html': 'xls'}
+
+
+def _input_file(data_dir, size, days, fmt, seed):
+    """Export synthétique (généré une seule fois puis réutilisé)"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench_{size}x{days}_{fmt}_s{seed}.{EXTENSIONS[fmt]}")
+    if not os.path.exists(path):
+        print(f"  generation de {path} ...")
+        generate_export(path, fmt, employees=size, days=days, seed=seed)
+    return path
+
+
+def _make_db(target):
+    if target == 'mysql':
+        from db_manager import DBManager
+        db = DBManager()
+    else:
+        from sqlite_db_manager import SQLiteDBManager
+        SQLiteDBManager.reset()  # Base vide pour chaque mesure
+        db = SQLiteDBManager()
+    db.init_planning_table()
+    return db
+
+
+def _measure(func, with_memory):
+    """Exécute func() ; retourne (résultat, secondes, pic mémoire en Mo ou None)"""
+    gc.collect()
+    if with_memory:
+        tracemalloc.start()
+        try:
+            result = func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result, None, round(peak / (1024 * 1024), 2)
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start, None
+
+
+def run_size(path, engine, size, db_target, with_memory):
+    """Mesure toutes les étapes pour un fichier ; retourne une ligne de résultat par étape"""
+    from app import _parse_attendance_file, calculate_statistics_batch, app
+
+    mode = app.config.get('PARSER_MODE', 'vectorized')
+    delta = app.config.get('DELTA_INGEST', True)
+    passes = [False, True] if with_memory else [False]
+    measures = {stage: {} for stage in STAGES}
+    counts = {}
+
+    for memory_pass in passes:
+        employees, secs, peak = _measure(lambda: _parse_attendance_file(path, engine, mode), memory_pass)
+        measures['parse']['peak_mb' if memory_pass else 'seconds'] = peak if memory_pass else secs
+        counts['employees'] = len(employees)
+        counts['rows'] = sum(len(e['dates']) for e in employees)
+
+        db = _make_db(db_target) if db_target != 'none' else None
+        context = db.get_calculation_context() if db else {'functions': {}, 'individual': {}, 'emp_depts': {}}
+
+        def stats():
+            for emp, emp_stats in zip(employees, calculate_statistics_batch(employees, context)):
+                emp['stats'] = emp_stats
+        _, secs, peak = _measure(stats, memory_pass)
+        measures['stats']['peak_mb' if memory_pass else 'seconds'] = peak if memory_pass else secs
+
+        if db is None:
+            continue
+        for stage in ('save', 'save_again'):
+            (ok, msg), secs, peak = _measure(lambda: db.save_data(employees, delta=delta), memory_pass)
+            if not ok:
+                raise RuntimeError(f"save_data a échoué : {msg}")
+            measures[stage]['peak_mb' if memory_pass else 'seconds'] = peak if memory_pass else secs
+
+    results = []
+    for stage in STAGES:
+        m = measures[stage]
+        if 'seconds' not in m:
+            continue
+        secs = m['seconds']
+        results.append({
+            'size': size,
+            'stage': stage,
+            'employees': counts['employees'],
+            'rows': counts['rows'],
+            'seconds': round(secs, 4),
+            'employees_per_s': round(counts['employees'] / secs, 1) if secs else None,
+            'rows_per_s': round(counts['rows'] / secs, 1) if secs else None,
+            'ms_per_employee': round(secs * 1000 / counts['employees'], 4) if counts['employees'] else None,
+            'peak_mb': m.get('peak_mb'),
+        })
+    return results
+
+
+def cmd_run(args):
+    from attendance_reader import engine_for_file
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'days': args.days,
+            'format': args.format,
+            'seed': args.seed,
+            'db': args.db,
+            'memory': not args.no_memory,
+        },
+        'results': [],
+    }
+    for size in sizes:
+        path = _input_file(args.data_dir, size, args.days, args.format, args.seed)
+        print(f"[BENCH] {size} employes ({os.path.basename(path)})")
+        for row in run_size(path, engine_for_file(path), size, args.db, not args.no_memory):
+            report['results'].append(row)
+            print(f"  {row['stage']:<11} {row['seconds']:>9.3f} s  {row['employees_per_s'] or 0:>10.1f} emp/s"
+                  f"  {row['rows_per_s'] or 0:>11.1f} lignes/s  pic {row['peak_mb'] if row['peak_mb'] is not None else '-'} Mo")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[OK] Resultats enregistres dans {args.output}")
+    return 0
+
+
+def compare_reports(baseline, current, threshold=0.15, memory_threshold=0.25):
+    """Compare deux rapports ; retourne [(size, stage, métrique, avant, après, écart)] des régressions"""
+    base = {(r['size'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    for row in current['results']:
+        ref = base.get((row['size'], row['stage']))
+        if ref is None:
+            continue
+        for metric, limit in (('seconds', threshold), ('peak_mb', memory_threshold)):
+            before, after = ref.get(metric), row.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if change > limit:
+                regressions.append((row['size'], row['stage'], metric, before, after, change))
+    return regressions
+
+
+def cmd_compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+
+    base = {(r['size'], r['stage']): r for r in baseline['results']}
+    for row in current['results']:
+        ref = base.get((row['size'], row['stage']))
+        if ref and ref.get('seconds'):
+            change = (row['seconds'] - ref['seconds']) / ref['seconds'] * 100
+            print(f"  {row['size']:>6} {row['stage']:<11} {ref['seconds']:>9.3f} s -> {row['seconds']:>9.3f} s ({change:+.1f}%)")
+
+    regressions = compare_reports(baseline, current, args.threshold, args.memory_threshold)
+    if not regressions:
+        print("[OK] Aucune regression")
+        return 0
+    for size, stage, metric, before, after, change in regressions:
+        print(f"[REGRESSION] {size} employes / {stage} / {metric} : {before} -> {after} ({change * 100:+.1f}%)")
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de l'import (parsing, statistiques, sauvegarde)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="mesure les étapes et enregistre les résultats en JSON")
+    run.add_argument('--sizes', default='100,1000,10000', help="nombres d'employés (séparés par des virgules)")
+    run.add_argument('--days', type=int, default=31)
+    run.add_argument('--format', choices=sorted(EXTENSIONS), default='xlsx')
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--db', choices=('sqlite', 'mysql', 'none'), default='sqlite',
+                     help="sqlite : base embarquée en mémoire ; mysql : serveur configuré par DB_* (base de test)")
+    run.add_argument('--no-memory', action='store_true', help="ne pas mesurer le pic mémoire (plus rapide)")
+    run.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'pointage_bench'))
+    run.add_argument('-o', '--output', default='bench_results.json')
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser('compare', help="signale les régressions par rapport à une référence")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.15, help="hausse de durée tolérée (0.15 = +15%%)")
+    compare.add_argument('--memory-threshold', type=float, default=0.25, help="hausse de pic mémoire tolérée")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
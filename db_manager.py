@@ -1,7 +1,14 @@
 import mysql.connector
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import json
 import os
+import tempfile
+from itertools import islice
+
+from db_pool import get_pool
+from stats_cache import DATA_VERSIONS
+from stats_engine import day_facts
+from planning_resolver import hm_to_minutes
 
 class DBManager:
     def __init__(self):
@@ -22,9 +29,22 @@ class DBManager:
              self.config['ssl_verify_cert'] = False  # Permet de se connecter sans le certificat CA local
              self.config['ssl_verify_identity'] = False
 
+        # LOAD DATA LOCAL INFILE (save_data(bulk=True)) autorisé pour les seuls fichiers de BULK_DIR
+        # (dossier créé au premier chargement en masse, voir _bulk_load_pointages)
+        self.config['allow_local_infile_in_path'] = self.BULK_DIR
+
+        # Pool de connexions du processus (voir db_pool.py) ; DB_POOL_SIZE=0 : une connexion par appel
+        self.pool_size = int(os.environ.get('DB_POOL_SIZE', 5))
+        self.pool_timeout = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
     def get_connection(self):
         # On laisse l'exception remonter pour voir l'erreur réelle sur la page de test
-        return mysql.connector.connect(**self.config)
+        if self.pool_size <= 0:
+            return mysql.connector.connect(**self.config)
+        config = dict(self.config)
+        pool = get_pool((config['host'], config['port'], config['user'], config['database']),
+                        lambda: mysql.connector.connect(**config), self.pool_size, self.pool_timeout)
+        return pool.get_connection()
 
     def init_planning_table(self):
         """Initialisation robuste des tables avec migration automatique"""
@@ -92,12 +112,133 @@ class DBManager:
             date_pointage DATE NOT NULL,
             check_in VARCHAR(10),
             check_out VARCHAR(10),
+            check_in_min SMALLINT NULL,
+            check_out_min SMALLINT NULL,
+            night_shift TINYINT(1) DEFAULT 0,
             minutes INT DEFAULT 0,
             statut VARCHAR(50),
             FOREIGN KEY (employe_id) REFERENCES employes(id) ON DELETE CASCADE,
-            UNIQUE KEY unique_pointage (employe_id, date_pointage)
+            UNIQUE KEY unique_pointage (employe_id, date_pointage),
+            INDEX idx_pointages_check_in_min (check_in_min),
+            INDEX idx_pointages_check_out_min (check_out_min),
+            INDEX idx_pointages_date_employe (date_pointage, employe_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+
+        # Catalogue des mois présents dans pointages (liste des périodes du dashboard), tenu à jour par save_data
+        cursor.execute("""CREATE TABLE IF NOT EXISTS periodes (
+            annee SMALLINT NOT NULL,
+            mois TINYINT NOT NULL,
+            PRIMARY KEY (annee, mois)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+
+        # Génération des données, incrémentée par toute écriture (tous processus confondus, voir stats_cache)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS versions_donnees (
+            id TINYINT PRIMARY KEY,
+            generation BIGINT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+        cursor.execute("INSERT IGNORE INTO versions_donnees (id, generation) VALUES (1, 0)")
+
+        # Migrations de données longues, reprises là où elles se sont arrêtées (dernier id traité)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS migrations (
+            nom VARCHAR(50) PRIMARY KEY,
+            dernier_id BIGINT NOT NULL DEFAULT 0,
+            termine TINYINT(1) NOT NULL DEFAULT 0
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
         
+        # 5. FAITS JOURNALIERS (retard, heures supp... calculés à l'import, voir refresh_pointage_facts)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS pointage_facts (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            employe_id INT NOT NULL,
+            date_pointage DATE NOT NULL,
+            worked_minutes INT DEFAULT 0,
+            planned_start SMALLINT NULL,
+            planned_end SMALLINT NULL,
+            late_minutes INT DEFAULT 0,
+            overtime_minutes INT DEFAULT 0,
+            undertime_minutes INT DEFAULT 0,
+            day_class VARCHAR(10) NOT NULL,
+            FOREIGN KEY (employe_id) REFERENCES employes(id) ON DELETE CASCADE,
+            UNIQUE KEY unique_fact (employe_id, date_pointage),
+            INDEX idx_facts_date_class (date_pointage, day_class)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+
+        # 6. AGRÉGATS SEMAINE / MOIS PAR EMPLOYÉ ET PAR DÉPARTEMENT (sommes de pointage_facts, voir _write_rollups)
+        cursor.execute("""CREATE TABLE IF NOT EXISTS stats_semaine_employe (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            employe_id INT NOT NULL,
+            semaine_lundi DATE NOT NULL,
+            jours INT DEFAULT 0,
+            worked_minutes INT DEFAULT 0,
+            days_worked INT DEFAULT 0,
+            days_absent INT DEFAULT 0,
+            weekends INT DEFAULT 0,
+            late_minutes INT DEFAULT 0,
+            count_lates INT DEFAULT 0,
+            overtime_minutes INT DEFAULT 0,
+            undertime_minutes INT DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (employe_id) REFERENCES employes(id) ON DELETE CASCADE,
+            UNIQUE KEY unique_stats_semaine (employe_id, semaine_lundi),
+            INDEX idx_stats_semaine (semaine_lundi)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS stats_mois_employe (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            employe_id INT NOT NULL,
+            mois DATE NOT NULL,
+            jours INT DEFAULT 0,
+            worked_minutes INT DEFAULT 0,
+            days_worked INT DEFAULT 0,
+            days_absent INT DEFAULT 0,
+            weekends INT DEFAULT 0,
+            late_minutes INT DEFAULT 0,
+            count_lates INT DEFAULT 0,
+            overtime_minutes INT DEFAULT 0,
+            undertime_minutes INT DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (employe_id) REFERENCES employes(id) ON DELETE CASCADE,
+            UNIQUE KEY unique_stats_mois (employe_id, mois),
+            INDEX idx_stats_mois (mois)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS stats_semaine_departement (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            departement VARCHAR(100) NOT NULL,
+            semaine_lundi DATE NOT NULL,
+            employes INT DEFAULT 0,
+            jours INT DEFAULT 0,
+            worked_minutes INT DEFAULT 0,
+            days_worked INT DEFAULT 0,
+            days_absent INT DEFAULT 0,
+            weekends INT DEFAULT 0,
+            late_minutes INT DEFAULT 0,
+            count_lates INT DEFAULT 0,
+            overtime_minutes INT DEFAULT 0,
+            undertime_minutes INT DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            UNIQUE KEY unique_stats_semaine_dept (departement, semaine_lundi),
+            INDEX idx_stats_semaine_dept (semaine_lundi)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS stats_mois_departement (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            departement VARCHAR(100) NOT NULL,
+            mois DATE NOT NULL,
+            employes INT DEFAULT 0,
+            jours INT DEFAULT 0,
+            worked_minutes INT DEFAULT 0,
+            days_worked INT DEFAULT 0,
+            days_absent INT DEFAULT 0,
+            weekends INT DEFAULT 0,
+            late_minutes INT DEFAULT 0,
+            count_lates INT DEFAULT 0,
+            overtime_minutes INT DEFAULT 0,
+            undertime_minutes INT DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            UNIQUE KEY unique_stats_mois_dept (departement, mois),
+            INDEX idx_stats_mois_dept (mois)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+
         # --- MISE À JOUR SÉCURISÉE DES COLONNES (ALTER) ---
         try:
             cursor.execute("SHOW COLUMNS FROM pointages LIKE 'minutes'")
@@ -107,78 +248,708 @@ class DBManager:
                 print("[OK] Colonnes minutes et statut ajoutees.")
         except: pass
 
+        # Heures de pointage en minutes depuis minuit (requêtes horaires sans analyse de texte)
+        try:
+            if not self._has_column(cursor, 'pointages', 'check_in_min'):
+                cursor.execute("ALTER TABLE pointages ADD COLUMN check_in_min SMALLINT NULL")
+                cursor.execute("ALTER TABLE pointages ADD COLUMN check_out_min SMALLINT NULL")
+                cursor.execute("ALTER TABLE pointages ADD COLUMN night_shift TINYINT(1) DEFAULT 0")
+                cursor.execute("CREATE INDEX idx_pointages_check_in_min ON pointages (check_in_min)")
+                cursor.execute("CREATE INDEX idx_pointages_check_out_min ON pointages (check_out_min)")
+                print("[OK] Colonnes check_in_min, check_out_min et night_shift ajoutees.")
+        except mysql.connector.Error as err:
+            print("[ERREUR] Ajout des colonnes check_in_min / check_out_min : " + str(err))
+        # Conversion des pointages existants : une fois par base, reprise après une interruption
+        cursor.execute("INSERT IGNORE INTO migrations (nom) VALUES ('punch_minutes')")
+        conn.commit()
+        try:
+            updated = self._backfill_punch_minutes(conn, cursor)
+            if updated:
+                print("[OK] " + str(updated) + " pointages convertis en minutes (check_in_min / check_out_min).")
+        except mysql.connector.Error as err:
+            conn.rollback()
+            print("[ERREUR] Conversion des heures de pointage interrompue (reprise au prochain demarrage) : " + str(err))
+
+        # Index (date, employé) pour les filtres par période sur une table existante
+        try:
+            cursor.execute("SHOW INDEX FROM pointages WHERE Key_name = 'idx_pointages_date_employe'")
+            if not cursor.fetchall():
+                cursor.execute("CREATE INDEX idx_pointages_date_employe ON pointages (date_pointage, employe_id)")
+                print("[OK] Index idx_pointages_date_employe ajoute.")
+        except: pass
+
+        # Remplissage initial du catalogue des périodes (un seul parcours de pointages)
+        cursor.execute("SELECT 1 FROM periodes LIMIT 1")
+        if cursor.fetchone() is None:
+            cursor.execute("""
+                INSERT IGNORE INTO periodes (annee, mois)
+                SELECT DISTINCT YEAR(date_pointage), MONTH(date_pointage) FROM pointages
+            """)
+
+        # Remplissage initial des faits pour les pointages importés avant leur création
+        cursor.execute("SELECT 1 FROM pointage_facts LIMIT 1")
+        backfill = cursor.fetchone() is None
+        cursor.execute("SELECT 1 FROM pointages LIMIT 1")
+        backfill = backfill and cursor.fetchone() is not None
+
+        # Idem pour les agrégats (faits déjà présents, une des tables d'agrégats encore vide),
+        # mois par mois avec reprise (migration 'rollups')
+        weekly_backfill = 0
+        if not backfill:
+            empty = False
+            for table, _, _ in self.ROLLUP_TABLES.values():
+                cursor.execute("SELECT 1 FROM " + table + " LIMIT 1")
+                empty = empty or cursor.fetchone() is None
+            if empty:
+                cursor.execute("""INSERT INTO migrations (nom) VALUES ('rollups')
+                                  ON DUPLICATE KEY UPDATE dernier_id = 0, termine = 0""")
+            conn.commit()
+            try:
+                weekly_backfill = self._backfill_rollups(conn, cursor)
+            except mysql.connector.Error as err:
+                conn.rollback()
+                print("[ERREUR] Calcul des agregats interrompu (reprise au prochain demarrage) : " + str(err))
+
         conn.commit()
         cursor.close()
         conn.close()
 
-    def save_data(self, employees_data):
-        """Sauvegarde persistante des employés et de TOUS leurs pointages détaillés"""
+        if backfill:
+            written = self.refresh_pointage_facts()
+            print("[OK] Faits journaliers calcules pour " + str(written) + " pointages existants.")
+        elif weekly_backfill:
+            print("[OK] Agregats semaine/mois calcules pour " + str(weekly_backfill) + " semaines existantes.")
+
+    UPSERT_POINTAGES = """
+        INSERT INTO pointages (employe_id, date_pointage, check_in, check_out, minutes, statut,
+                               check_in_min, check_out_min, night_shift)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE 
+            check_in = VALUES(check_in), 
+            check_out = VALUES(check_out),
+            minutes = VALUES(minutes),
+            statut = VALUES(statut),
+            check_in_min = VALUES(check_in_min),
+            check_out_min = VALUES(check_out_min),
+            night_shift = VALUES(night_shift)
+    """
+
+    @staticmethod
+    def punch_minutes(check_in, check_out):
+        """(arrivée, départ, nuit) : minutes depuis minuit ou None, même lecture que
+        calculate_statistics (strip()[:5] en 'HH:MM') ; nuit = 1 si le départ est le lendemain"""
+        def minutes(value):
+            if value is None:
+                return None
+            m = hm_to_minutes(str(value).strip()[:5])
+            return m if m >= 0 else None
+        in_min, out_min = minutes(check_in), minutes(check_out)
+        night = 1 if in_min is not None and out_min is not None and out_min < in_min else 0
+        return in_min, out_min, night
+
+    @staticmethod
+    def _has_column(cursor, table, column):
+        """La colonne existe-t-elle ? (requête vide, valable sur MySQL comme sur SQLite)"""
+        try:
+            cursor.execute("SELECT " + column + " FROM " + table + " LIMIT 0")
+            cursor.fetchall()
+            return True
+        except mysql.connector.Error:
+            return False
+
+    PUNCH_BACKFILL_BATCH = 5000  # pointages convertis (et validés) par paquet
+
+    def _backfill_punch_minutes(self, conn, cursor):
+        """Remplit check_in_min / check_out_min / night_shift des pointages existants
+
+        Parcours par id croissant en paquets de PUNCH_BACKFILL_BATCH, chaque paquet
+        validé avec sa progression dans la table migrations : une conversion
+        interrompue reprend au paquet suivant. Retourne le nombre de pointages convertis.
+        """
+        cursor.execute("SELECT dernier_id, termine FROM migrations WHERE nom = 'punch_minutes'")
+        row = cursor.fetchone()
+        if not row or row[1]:
+            return 0
+        last_id = int(row[0] or 0)
+        converted = 0
+        while True:
+            cursor.execute("SELECT id, check_in, check_out FROM pointages WHERE id > %s ORDER BY id LIMIT %s",
+                           (last_id, self.PUNCH_BACKFILL_BATCH))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            updates = [self.punch_minutes(c_in, c_out) + (pid,) for pid, c_in, c_out in rows]
+            cursor.executemany("UPDATE pointages SET check_in_min = %s, check_out_min = %s, night_shift = %s WHERE id = %s",
+                               updates)
+            last_id = rows[-1][0]
+            cursor.execute("UPDATE migrations SET dernier_id = %s WHERE nom = 'punch_minutes'", (last_id,))
+            conn.commit()
+            converted += len(rows)
+        cursor.execute("UPDATE migrations SET termine = 1 WHERE nom = 'punch_minutes'")
+        conn.commit()
+        return converted
+
+    def _backfill_rollups(self, conn, cursor):
+        """Remplit les tables d'agrégats à partir de pointage_facts, un mois à la fois
+
+        Chaque mois (faits lus, agrégats écrits) est validé avec sa progression
+        (mois AAAAMM dans migrations.dernier_id) : un calcul interrompu reprend au
+        mois suivant. Retourne le nombre de semaines-employé écrites.
+        """
+        cursor.execute("SELECT dernier_id, termine FROM migrations WHERE nom = 'rollups'")
+        row = cursor.fetchone()
+        if not row or row[1]:
+            return 0
+        last_month = int(row[0] or 0)
+        cursor.execute("SELECT MIN(date_pointage), MAX(date_pointage) FROM pointage_facts")
+        first, last = cursor.fetchone()
+        weeks = 0
+        for start, end in self._month_ranges(first, last):
+            month = int(start[:4] + start[5:7])
+            if month <= last_month:
+                continue
+            cursor.execute("SELECT employe_id, date_pointage FROM pointage_facts WHERE date_pointage BETWEEN %s AND %s",
+                           (start, end))
+            weeks += self._write_rollups(cursor, set(cursor.fetchall()))
+            cursor.execute("UPDATE migrations SET dernier_id = %s WHERE nom = 'rollups'", (month,))
+            conn.commit()
+        cursor.execute("UPDATE migrations SET termine = 1 WHERE nom = 'rollups'")
+        conn.commit()
+        return weeks
+
+    UPSERT_FACTS = """
+        INSERT INTO pointage_facts (employe_id, date_pointage, worked_minutes, planned_start, planned_end,
+                                    late_minutes, overtime_minutes, undertime_minutes, day_class)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE 
+            worked_minutes = VALUES(worked_minutes),
+            planned_start = VALUES(planned_start),
+            planned_end = VALUES(planned_end),
+            late_minutes = VALUES(late_minutes),
+            overtime_minutes = VALUES(overtime_minutes),
+            undertime_minutes = VALUES(undertime_minutes),
+            day_class = VALUES(day_class)
+    """
+
+    # Tables d'agrégats : (portée, grain) -> (table, colonne de la clé, colonne de la période)
+    ROLLUP_TABLES = {
+        ('employee', 'week'): ('stats_semaine_employe', 'employe_id', 'semaine_lundi'),
+        ('employee', 'month'): ('stats_mois_employe', 'employe_id', 'mois'),
+        ('department', 'week'): ('stats_semaine_departement', 'departement', 'semaine_lundi'),
+        ('department', 'month'): ('stats_mois_departement', 'departement', 'mois'),
+    }
+    # Sommes stockées dans chaque table d'agrégats (jours = nombre de faits journaliers)
+    ROLLUP_SUMS = ('jours', 'worked_minutes', 'days_worked', 'days_absent', 'weekends',
+                   'late_minutes', 'count_lates', 'overtime_minutes', 'undertime_minutes')
+
+    @classmethod
+    def _upsert_rollup(cls, scope, grain):
+        table, key_col, period_col = cls.ROLLUP_TABLES[(scope, grain)]
+        columns = (key_col, period_col) + (('employes',) if scope == 'department' else ()) + cls.ROLLUP_SUMS
+        return ("INSERT INTO " + table + " (" + ", ".join(columns) + ") VALUES (" + ", ".join(["%s"] * len(columns)) + ")"
+                " ON DUPLICATE KEY UPDATE " + ", ".join(c + " = VALUES(" + c + ")" for c in columns[2:]))
+
+    @staticmethod
+    def _prepare_pointages(emp, emp_db_id):
+        """Lignes (employe_id, date, check_in, check_out, minutes, statut, check_in_min, check_out_min, night_shift)"""
+        pointages_to_insert = []
+        if 'dates' not in emp or 'check_ins' not in emp:
+            return pointages_to_insert
+        # Lecture unique des listes (les vues compactes les reconstruisent à chaque accès)
+        dates = emp['dates']
+        check_ins = emp['check_ins']
+        check_outs = emp['check_outs']
+        attended = emp['attended_minutes'] if 'attended_minutes' in emp else []
+        statuses = emp['statuses'] if 'statuses' in emp else []
+        for i in range(len(dates)):
+            date_val_raw = dates[i]
+            if not date_val_raw or date_val_raw in ('-', 'nan', 'None'):
+                continue
+                
+            try:
+                processed_date = None
+                date_str = str(date_val_raw).strip()
+                for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y', '%Y-%m-%d %H:%M:%S'):
+                    try:
+                        processed_date = datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+                        break
+                    except: continue
+                if not processed_date: processed_date = date_str.split(' ')[0]
+                date_val = processed_date
+            except: continue
+
+            c_in = check_ins[i] if i < len(check_ins) else None
+            c_out = check_outs[i] if i < len(check_outs) else None
+            mins = attended[i] if i < len(attended) else 0
+            stat = statuses[i] if i < len(statuses) else None
+            
+            pointages_to_insert.append((emp_db_id, date_val, c_in, c_out, int(float(mins or 0)), stat)
+                                       + DBManager.punch_minutes(c_in, c_out))
+        return pointages_to_insert
+
+    def _write_pointages_delta(self, cursor, rows, bulk=False):
+        """Écrit uniquement les pointages nouveaux ou modifiés.
+
+        Les pointages existants des employés de rows, sur leur plage de dates, sont lus
+        en une requête par paquet d'employés puis comparés en mémoire (save_data
+        l'appelle lot par lot). Retourne (insérés, mis à jour, inchangés, lignes écrites).
+        """
+        # Une même (employé, date) présente plusieurs fois : la dernière l'emporte, comme l'upsert
+        latest = {}
+        for row in rows:
+            latest[(row[0], row[1])] = row
+
+        valid_dates = []
+        for _, d in latest:
+            try:
+                datetime.strptime(d, '%Y-%m-%d')
+                valid_dates.append(d)
+            except ValueError:
+                pass
+
+        existing = {}
+        if valid_dates:
+            emp_ids = sorted({emp_id for emp_id, _ in latest})
+            for chunk in self._batches(emp_ids, self.EMPLOYEE_BATCH):
+                cursor.execute("""
+                    SELECT employe_id, date_pointage, check_in, check_out, minutes, statut
+                    FROM pointages
+                    WHERE employe_id IN (""" + ", ".join(["%s"] * len(chunk)) + """) AND date_pointage BETWEEN %s AND %s
+                """, chunk + [min(valid_dates), max(valid_dates)])
+                for emp_id, d, c_in, c_out, mins, stat in cursor.fetchall():
+                    existing[(emp_id, str(d))] = (c_in, c_out, mins, stat)
+
+        def as_db(v):
+            return None if v is None else str(v)
+
+        to_write = []
+        inserted = updated = skipped = 0
+        for key, row in latest.items():
+            current = existing.get(key)
+            if current is None:
+                inserted += 1
+            elif (as_db(current[0]), as_db(current[1]), int(current[2] or 0), as_db(current[3])) == \
+                    (as_db(row[2]), as_db(row[3]), row[4], as_db(row[5])):
+                skipped += 1
+                continue
+            else:
+                updated += 1
+            to_write.append(row)
+
+        if to_write:
+            self._write_pointages(cursor, to_write, bulk)
+        return inserted, updated, skipped, to_write
+
+    def _write_facts(self, cursor, rows, context, touched=None):
+        """Calcule et écrit les faits journaliers de rows : (employe_id, person_id, département, date, check_in, minutes)
+
+        Les semaines et mois touchés sont réagrégés tout de suite ou, si touched est un
+        ensemble, les (employe_id, date) écrits y sont ajoutés pour un seul _write_rollups final.
+        """
+        facts = day_facts([row[1:] for row in rows], context)
+        to_write = [(row[0], row[3]) + fact for row, fact in zip(rows, facts) if fact is not None]
+        if to_write:
+            self._executemany_batched(cursor, self.UPSERT_FACTS, to_write)
+            days = {(row[0], str(row[1])[:10]) for row in to_write}
+            if touched is None:
+                self._write_rollups(cursor, days)
+            else:
+                touched.update(days)
+        return len(to_write)
+
+    def _write_rollups(self, cursor, touched, departments=(), chunk_size=500):
+        """Réagrège les tables d'agrégats pour les (employe_id, date) de touched
+
+        Par employé : seules les semaines et les mois qui contiennent un jour de touched
+        sont relus dans pointage_facts et réécrits. Par département : ces mêmes périodes,
+        pour les départements actuels des employés concernés et pour departments (anciens
+        départements des employés qui en ont changé). Retourne le nombre de semaines-employé écrites.
+        """
+        if not touched:
+            return 0
+        periods = {}  # date -> (lundi, premier du mois)
+
+        def periods_of(day):
+            day = str(day)[:10]
+            found = periods.get(day)
+            if found is None:
+                found = periods[day] = (self.monday_of(day), self.month_of(day))
+            return found
+
+        totals = {'week': {}, 'month': {}}  # (employe_id, période) -> sommes de ROLLUP_SUMS
+        for emp_id, day in touched:
+            week, month = periods_of(day)
+            totals['week'].setdefault((emp_id, week), [0] * len(self.ROLLUP_SUMS))
+            totals['month'].setdefault((emp_id, month), [0] * len(self.ROLLUP_SUMS))
+
+        start_date = min(min(p for _, p in totals['week']), min(p for _, p in totals['month']))
+        end_date = max(self.week_bounds(max(p for _, p in totals['week']))[1],
+                       self.month_bounds(max(p for _, p in totals['month']))[1])
+        emp_ids = sorted({emp_id for emp_id, _ in touched})
+        departments = set(departments)
+        for i in range(0, len(emp_ids), chunk_size):
+            chunk = emp_ids[i:i + chunk_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute("""
+                SELECT employe_id, date_pointage, worked_minutes, late_minutes, overtime_minutes, undertime_minutes, day_class
+                FROM pointage_facts
+                WHERE employe_id IN (""" + placeholders + """) AND date_pointage BETWEEN %s AND %s
+            """, chunk + [start_date, end_date])
+            for emp_id, day, worked, late, overtime, undertime, day_class in cursor.fetchall():
+                late = late or 0
+                values = (1, worked or 0, day_class == 'worked', day_class == 'absent', day_class == 'weekend',
+                          late, late > 0, overtime or 0, undertime or 0)
+                week, month = periods_of(day)
+                for total in (totals['week'].get((emp_id, week)), totals['month'].get((emp_id, month))):
+                    if total is not None:  # sinon période non concernée
+                        for k, value in enumerate(values):
+                            total[k] += value
+            cursor.execute("SELECT DISTINCT departement FROM employes WHERE id IN (" + placeholders + ")", chunk)
+            departments.update(dept for (dept,) in cursor.fetchall())
+
+        departments.discard(None)
+        for grain, grain_totals in totals.items():
+            cursor.executemany(self._upsert_rollup('employee', grain),
+                               [key + tuple(int(v) for v in total) for key, total in grain_totals.items()])
+            if departments:
+                self._write_department_rollups(cursor, grain, departments, {p for _, p in grain_totals})
+        return len(totals['week'])
+
+    def _write_department_rollups(self, cursor, grain, departments, periods):
+        """Recalcule les agrégats (département, période) à partir des agrégats par employé"""
+        table, _, period_col = self.ROLLUP_TABLES[('employee', grain)]
+        dept_table = self.ROLLUP_TABLES[('department', grain)][0]
+        departments = sorted(departments)
+        cursor.execute(
+            "SELECT e.departement, s." + period_col + ", COUNT(*), "
+            + ", ".join("SUM(s." + c + ")" for c in self.ROLLUP_SUMS)
+            + " FROM " + table + " s JOIN employes e ON e.id = s.employe_id"
+            + " WHERE s.jours > 0 AND e.departement IN (" + ", ".join(["%s"] * len(departments)) + ")"
+            + " AND s." + period_col + " BETWEEN %s AND %s"
+            + " GROUP BY e.departement, s." + period_col,
+            departments + [min(periods), max(periods)])
+        rows = [(dept, str(period)) + tuple(int(v or 0) for v in sums)
+                for dept, period, *sums in cursor.fetchall() if str(period) in periods]
+        if rows:
+            cursor.executemany(self._upsert_rollup('department', grain), rows)
+        # (département, période) sans plus aucun employé : ligne supprimée
+        stale = {(dept, period) for dept in departments for period in periods} - {row[:2] for row in rows}
+        if stale:
+            cursor.executemany("DELETE FROM " + dept_table + " WHERE departement = %s AND " + period_col + " = %s",
+                               sorted(stale))
+
+    @staticmethod
+    def _fact_filter(person_ids=None, department=None, start_date=None, end_date=None):
+        """Clause (et paramètres) des pointages à recalculer ; None si aucun employé n'est demandé"""
+        query = " FROM pointages p JOIN employes e ON e.id = p.employe_id WHERE 1 = 1"
+        params = []
+        if person_ids is not None:
+            person_ids = [str(pid) for pid in person_ids]
+            if not person_ids:
+                return None, []
+            query += " AND e.person_id IN (" + ", ".join(["%s"] * len(person_ids)) + ")"
+            params.extend(person_ids)
+        if department is not None:
+            query += " AND e.departement = %s"
+            params.append(department)
+        if start_date and end_date:
+            query += " AND p.date_pointage BETWEEN %s AND %s"
+            params.extend([start_date, end_date])
+        return query, params
+
+    @classmethod
+    def _select_fact_rows(cls, cursor, person_ids=None, department=None, start_date=None, end_date=None):
+        """Pointages à recalculer, au format attendu par _write_facts"""
+        query, params = cls._fact_filter(person_ids, department, start_date, end_date)
+        if query is None:
+            return []
+        cursor.execute("SELECT p.employe_id, e.person_id, e.departement, p.date_pointage, p.check_in, p.minutes"
+                       + query, params)
+        return [(emp_id, str(pid), dept, str(d), c_in, mins) for emp_id, pid, dept, d, c_in, mins in cursor.fetchall()]
+
+    @classmethod
+    def _fact_months(cls, cursor, person_ids=None, department=None, start_date=None, end_date=None):
+        """Plages (premier, dernier jour) mois par mois couvrant les pointages à recalculer"""
+        query, params = cls._fact_filter(person_ids, department, start_date, end_date)
+        if query is None:
+            return []
+        cursor.execute("SELECT MIN(p.date_pointage), MAX(p.date_pointage)" + query, params)
+        return cls._month_ranges(*cursor.fetchone())
+
+    @classmethod
+    def _month_ranges(cls, first, last):
+        """Plages (premier, dernier jour) mois par mois de first à last (None : aucune)"""
+        if first is None:
+            return []
+        first, last = str(first)[:10], str(last)[:10]
+        months = []
+        month = cls.month_of(first)
+        while month <= last:
+            month_start, month_end = cls.month_bounds(month)
+            months.append((max(month_start, first), min(month_end, last)))
+            month = (datetime.strptime(month_end, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        return months
+
+    def refresh_pointage_facts(self, person_ids=None, department=None, start_date=None, end_date=None):
+        """Recalcule pointage_facts à partir des pointages et des plannings actuels
+
+        Filtres optionnels : employés (person_id), département, plage de dates.
+        Sans filtre, tous les pointages sont recalculés (remplissage initial).
+        Le recalcul se fait mois par mois (lecture, faits, agrégats puis commit), pour
+        qu'un planning de fonction ne charge pas tout l'historique du département d'un coup.
+        Les semaines et mois concernés des tables d'agrégats sont réagrégés (nombre de
+        semaines-employé dans self.last_refreshed_weeks). Retourne le nombre de jours recalculés.
+        """
+        self.last_refreshed_weeks = 0
+        context = self.get_calculation_context()
+        conn = self.get_connection()
+        if not conn: return 0
+        cursor = conn.cursor()
+        written = 0
+        weeks = set()
+        try:
+            for first, last in self._fact_months(cursor, person_ids, department, start_date, end_date):
+                rows = self._select_fact_rows(cursor, person_ids, department, first, last)
+                touched = set()
+                written += self._write_facts(cursor, rows, context, touched)
+                self._write_rollups(cursor, touched)
+                conn.commit()
+                weeks.update((emp_id, self.monday_of(day)) for emp_id, day in touched)
+                self.last_refreshed_weeks = len(weeks)
+            return written
+        except mysql.connector.Error as err:
+            conn.rollback()
+            print("[ERREUR] Erreur SQL lors du calcul des faits journaliers : " + str(err))
+            return 0
+        finally:
+            cursor.close()
+            conn.close()
+
+    # --- CHARGEMENT EN MASSE (LOAD DATA LOCAL INFILE) ---
+    BULK_DIR = os.path.join(tempfile.gettempdir(), 'pointage_bulk')
+    BULK_COLUMNS = ('employe_id', 'date_pointage', 'check_in', 'check_out', 'minutes', 'statut',
+                    'check_in_min', 'check_out_min', 'night_shift')
+    # Refus de LOAD DATA LOCAL (serveur local_infile=OFF, client...) : plus de tentative pour ce serveur
+    LOCAL_INFILE_REFUSED_ERRNOS = (1148, 2068, 3948)
+    _local_infile_refused = set()
+
+    MERGE_STAGED_POINTAGES = """
+        INSERT INTO pointages (employe_id, date_pointage, check_in, check_out, minutes, statut,
+                               check_in_min, check_out_min, night_shift)
+        SELECT employe_id, date_pointage, check_in, check_out, minutes, statut,
+               check_in_min, check_out_min, night_shift
+        FROM pointages_staging
+        ORDER BY seq
+        ON DUPLICATE KEY UPDATE 
+            check_in = VALUES(check_in), 
+            check_out = VALUES(check_out),
+            minutes = VALUES(minutes),
+            statut = VALUES(statut),
+            check_in_min = VALUES(check_in_min),
+            check_out_min = VALUES(check_out_min),
+            night_shift = VALUES(night_shift)
+    """
+
+    @staticmethod
+    def _tsv_field(value):
+        """Valeur au format LOAD DATA par défaut (tabulations, échappement par antislash, NULL = \\N)"""
+        if value is None:
+            return '\\N'
+        return (str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+                .replace('\r', '\\r').replace('\0', '\\0'))
+
+    def _bulk_load_pointages(self, cursor, rows):
+        """Upsert de rows via un fichier TSV, LOAD DATA LOCAL INFILE dans une table temporaire
+        puis un seul INSERT ... SELECT ... ON DUPLICATE KEY UPDATE dans pointages.
+
+        Retourne False, sans rien écrire, si le serveur ou le client refuse LOAD DATA LOCAL
+        (l'appelant passe alors par executemany) ; le refus est mémorisé pour ce serveur.
+        """
+        server = (self.config['host'], self.config['port'], self.config['database'])
+        if server in self._local_infile_refused:
+            return False
+        cursor.execute("""CREATE TEMPORARY TABLE IF NOT EXISTS pointages_staging (
+            seq INT AUTO_INCREMENT PRIMARY KEY,
+            employe_id INT NOT NULL,
+            date_pointage DATE NOT NULL,
+            check_in VARCHAR(10),
+            check_out VARCHAR(10),
+            minutes INT DEFAULT 0,
+            statut VARCHAR(50),
+            check_in_min SMALLINT NULL,
+            check_out_min SMALLINT NULL,
+            night_shift TINYINT(1) DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;""")
+        cursor.execute("DELETE FROM pointages_staging")
+
+        os.makedirs(self.BULK_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', dir=self.BULK_DIR, encoding='utf-8',
+                                         newline='\n', delete=False) as tsv:
+            for row in rows:
+                tsv.write('\t'.join(map(self._tsv_field, row)) + '\n')
+        try:
+            cursor.execute("""
+                LOAD DATA LOCAL INFILE %s INTO TABLE pointages_staging
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                LINES TERMINATED BY '\\n'
+                (""" + ", ".join(self.BULK_COLUMNS) + ")", (tsv.name,))
+        except mysql.connector.Error as err:
+            if err.errno not in self.LOCAL_INFILE_REFUSED_ERRNOS:
+                raise
+            self._local_infile_refused.add(server)
+            print("[INFO] LOAD DATA LOCAL INFILE refuse (" + str(err) + "), import par executemany.")
+            return False
+        finally:
+            os.remove(tsv.name)
+        cursor.execute(self.MERGE_STAGED_POINTAGES)
+        cursor.execute("DELETE FROM pointages_staging")
+        return True
+
+    def _write_pointages(self, cursor, rows, bulk=False):
+        """Upsert de pointages : LOAD DATA si bulk et si le serveur l'accepte, sinon executemany par paquets"""
+        if bulk and self._bulk_load_pointages(cursor, rows):
+            self.last_load_method = 'load_data'
+            return
+        self._executemany_batched(cursor, self.UPSERT_POINTAGES, rows)
+        self.last_load_method = 'executemany'
+
+    EMPLOYEE_BATCH = 1000    # employés par upsert multi-lignes dans save_data
+    POINTAGE_BATCH = 5000    # lignes par executemany (pointages, faits)
+
+    @staticmethod
+    def _batches(items, size):
+        """Découpe un itérable (liste ou générateur) en listes de size éléments au plus"""
+        items = iter(items)
+        while True:
+            batch = list(islice(items, size))
+            if not batch:
+                return
+            yield batch
+
+    def _executemany_batched(self, cursor, sql, rows):
+        for i in range(0, len(rows), self.POINTAGE_BATCH):
+            cursor.executemany(sql, rows[i:i + self.POINTAGE_BATCH])
+
+    @staticmethod
+    def _upsert_employees(cursor, employees, moved_ids, moved_from):
+        """Insère ou met à jour un lot d'employés ; retourne {person_id: id}
+
+        Trois requêtes pour tout le lot : départements actuels, upsert multi-lignes
+        (nom, département, poste ; date d'embauche à la création seulement), id.
+        Les employés qui changent de département sont ajoutés à moved_ids et leur
+        ancien département à moved_from. Un person_id présent deux fois : le dernier l'emporte.
+        """
+        person_ids = list(dict.fromkeys(str(emp['person_id']) for emp in employees))
+        placeholders = ", ".join(["%s"] * len(person_ids))
+        cursor.execute("SELECT person_id, departement FROM employes WHERE person_id IN (" + placeholders + ")", person_ids)
+        current = {str(p_id): dept for p_id, dept in cursor.fetchall()}
+
+        values = []
+        for emp in employees:
+            p_id = str(emp['person_id'])
+            if p_id in current and current[p_id] != emp['department']:
+                moved_ids.append(p_id)  # planning de fonction différent
+                moved_from.add(current[p_id])
+            current[p_id] = emp['department']
+            values.extend((p_id, emp['name'], emp['department'], emp['position'], emp.get('joining_date', 'N/A')))
+        cursor.execute("""
+            INSERT INTO employes (person_id, nom, departement, poste, date_embauche)
+            VALUES """ + ", ".join(["(%s, %s, %s, %s, %s)"] * len(employees)) + """
+            ON DUPLICATE KEY UPDATE 
+                nom = VALUES(nom),
+                departement = VALUES(departement),
+                poste = VALUES(poste)
+        """, values)
+
+        cursor.execute("SELECT id, person_id FROM employes WHERE person_id IN (" + placeholders + ")", person_ids)
+        return {str(p_id): emp_id for emp_id, p_id in cursor.fetchall()}
+
+    def save_data(self, employees_data, delta=False, bulk=False):
+        """Sauvegarde persistante des employés et de TOUS leurs pointages détaillés
+
+        employees_data peut être une liste ou un générateur : les employés sont
+        consommés par lots de EMPLOYEE_BATCH (import en flux à mémoire bornée), avec
+        un upsert multi-lignes des employés et leurs pointages en gros paquets.
+
+        delta=True : seuls les pointages nouveaux ou modifiés sont écrits (ré-import
+        d'une période qui se chevauche), chaque lot étant comparé aux pointages
+        existants de ses seuls employés avant la lecture du suivant. Les compteurs
+        sont disponibles dans self.last_save_counts.
+
+        bulk=True : pointages chargés par LOAD DATA LOCAL INFILE (imports d'historique
+        volumineux), avec repli automatique sur executemany si le serveur le refuse.
+        """
+        self.last_save_counts = None
+        self.last_load_method = None
+        # Plannings pour les faits journaliers (départements mis à jour au fil de la sauvegarde)
+        context = self.get_calculation_context()
         conn = self.get_connection()
         if not conn:
             return False, "Impossible de se connecter à la base de données"
 
         cursor = conn.cursor()
         total_points = 0
+        total_employees = 0
+        inserted = updated = skipped = 0
+        saved_ids = []
+        moved_ids = []  # employés qui changent de département : tous leurs faits sont à recalculer
+        moved_from = set()  # leurs anciens départements (agrégats par département à recalculer)
+        touched = set()  # (employe_id, date) dont les semaines et mois sont à réagréger
+        months = set()  # 'YYYY-MM' importés, pour le catalogue des périodes
         try:
-            for emp in employees_data:
-                # 1. Sauvegarder/Mettre à jour l'employé
-                cursor.execute("SELECT id FROM employes WHERE person_id = %s", (str(emp['person_id']),))
-                result = cursor.fetchone()
-                
-                if result:
-                    emp_db_id = result[0]
-                    cursor.execute("""
-                        UPDATE employes SET nom=%s, departement=%s, poste=%s 
-                        WHERE id=%s
-                    """, (emp['name'], emp['department'], emp['position'], emp_db_id))
+            for chunk in self._batches(employees_data, self.EMPLOYEE_BATCH):
+                # 1. Employés du lot : un upsert multi-lignes, puis leurs id en une requête
+                emp_ids = self._upsert_employees(cursor, chunk, moved_ids, moved_from)
+
+                # 2. Pointages du lot, écrits par gros paquets (executemany ou LOAD DATA)
+                rows = []
+                emp_keys = {}  # employe_id -> (person_id, département) pour les faits du lot
+                for emp in chunk:
+                    total_employees += 1
+                    p_id = str(emp['person_id'])
+                    saved_ids.append(p_id)
+                    emp_db_id = emp_ids[p_id]
+                    context['emp_depts'][p_id] = emp['department']
+
+                    pointages_to_insert = self._prepare_pointages(emp, emp_db_id)
+                    if not pointages_to_insert:
+                        continue
+                    total_points += len(pointages_to_insert)
+                    months.update(str(row[1])[:7] for row in pointages_to_insert)
+                    rows.extend(pointages_to_insert)
+                    emp_keys[emp_db_id] = (p_id, emp['department'])
+                if not rows:
+                    continue
+                # Mode delta : comparaison avec les pointages existants des employés du lot
+                if delta:
+                    ins, upd, skip, rows = self._write_pointages_delta(cursor, rows, bulk)
+                    inserted, updated, skipped = inserted + ins, updated + upd, skipped + skip
                 else:
-                    cursor.execute("""
-                        INSERT INTO employes (person_id, nom, departement, poste, date_embauche)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (str(emp['person_id']), emp['name'], emp['department'], emp['position'], emp.get('joining_date', 'N/A')))
-                    emp_db_id = cursor.lastrowid
-
-                # 2. Préparation des pointages pour insertion en lot (executemany)
-                if 'dates' in emp and 'check_ins' in emp:
-                    pointages_to_insert = []
-                    for i in range(len(emp['dates'])):
-                        date_val_raw = emp['dates'][i]
-                        if not date_val_raw or date_val_raw in ('-', 'nan', 'None'):
-                            continue
-                            
-                        try:
-                            processed_date = None
-                            date_str = str(date_val_raw).strip()
-                            for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y', '%Y-%m-%d %H:%M:%S'):
-                                try:
-                                    processed_date = datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
-                                    break
-                                except: continue
-                            if not processed_date: processed_date = date_str.split(' ')[0]
-                            date_val = processed_date
-                        except: continue
-
-                        c_in = emp['check_ins'][i] if i < len(emp['check_ins']) else None
-                        c_out = emp['check_outs'][i] if i < len(emp['check_outs']) else None
-                        mins = emp['attended_minutes'][i] if 'attended_minutes' in emp and i < len(emp['attended_minutes']) else 0
-                        stat = emp['statuses'][i] if 'statuses' in emp and i < len(emp['statuses']) else None
-                        
-                        pointages_to_insert.append((emp_db_id, date_val, c_in, c_out, int(float(mins or 0)), stat))
-
-                    if pointages_to_insert:
-                        cursor.executemany("""
-                            INSERT INTO pointages (employe_id, date_pointage, check_in, check_out, minutes, statut)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE 
-                                check_in = VALUES(check_in), 
-                                check_out = VALUES(check_out),
-                                minutes = VALUES(minutes),
-                                statut = VALUES(statut)
-                        """, pointages_to_insert)
-                        total_points += len(pointages_to_insert)
+                    self._write_pointages(cursor, rows, bulk)
+                self._write_facts(cursor, [(row[0],) + emp_keys[row[0]] + (row[1], row[2], row[4]) for row in rows],
+                                  context, touched)
+
+            counts = {'employees': total_employees, 'pointages': total_points,
+                      'inserted': None, 'updated': None, 'skipped': None, 'load_method': None}
+            if delta:
+                counts['inserted'], counts['updated'], counts['skipped'] = inserted, updated, skipped
+            if moved_ids:
+                self._write_facts(cursor, self._select_fact_rows(cursor, moved_ids), context, touched)
+            self._write_rollups(cursor, touched, moved_from)
+            self._write_periods(cursor, months)
+            counts['load_method'] = self.last_load_method
+            generation = self._bump_generation(cursor)
 
             conn.commit()
-            print("[OK] Sauvegarde reussie : " + str(len(employees_data)) + " employes, " + str(total_points) + " pointages.")
+            DATA_VERSIONS.bump_persons(saved_ids, generation)  # Statistiques en cache de ces employés obsolètes
+            self.last_save_counts = counts
+            if delta:
+                print("[OK] Sauvegarde reussie : " + str(total_employees) + " employes, " + str(counts['inserted']) + " inseres, "
+                      + str(counts['updated']) + " mis a jour, " + str(counts['skipped']) + " inchanges.")
+                return True, (f"Succès : {counts['inserted']} pointages insérés, {counts['updated']} mis à jour, "
+                              f"{counts['skipped']} inchangés.")
+            print("[OK] Sauvegarde reussie : " + str(total_employees) + " employes, " + str(total_points) + " pointages.")
             return True, f"Succès : {total_points} pointages enregistrés."
         except mysql.connector.Error as err:
             conn.rollback()
@@ -188,6 +959,43 @@ class DBManager:
             cursor.close()
             conn.close()
 
+    @staticmethod
+    def _write_periods(cursor, months):
+        """Ajoute les mois 'YYYY-MM' au catalogue des périodes (déjà présents : ignorés)"""
+        rows = sorted({(int(m[:4]), int(m[5:7])) for m in months})
+        if rows:
+            cursor.executemany("INSERT IGNORE INTO periodes (annee, mois) VALUES (%s, %s)", rows)
+
+    @staticmethod
+    def _bump_generation(cursor):
+        """Incrémente la génération des données dans la transaction en cours ; retourne la nouvelle valeur
+        (None si la table n'existe pas encore)"""
+        try:
+            cursor.execute("UPDATE versions_donnees SET generation = generation + 1 WHERE id = 1")
+            cursor.execute("SELECT generation FROM versions_donnees WHERE id = 1")
+            row = cursor.fetchone()
+        except mysql.connector.Error:
+            return None
+        return int(row[0]) if row else None
+
+    def get_data_generation(self):
+        """Génération courante des données en base (None si la base est injoignable)"""
+        try:
+            conn = self.get_connection()
+        except Exception:
+            return None
+        if not conn: return None
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT generation FROM versions_donnees WHERE id = 1")
+            row = cursor.fetchone()
+            return int(row[0]) if row else None
+        except mysql.connector.Error:
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
     def update_employee_stats(self, person_id, stats):
         """Met à jour ou insère les statistiques d'un employé"""
         conn = self.get_connection()
@@ -205,7 +1013,9 @@ class DBManager:
                     moyenne_heures_jour = VALUES(moyenne_heures_jour)
             """, (str(person_id), stats['total_hours'], stats['total_days_worked'], 
                   stats['total_days_absent'], stats.get('total_weekends', 0), stats['average_hours_per_day']))
+            generation = self._bump_generation(cursor)
             conn.commit()
+            DATA_VERSIONS.bump_person(person_id, generation)
             return True
         except Exception as e:
             print(f"Erreur update_employee_stats: {e}")
@@ -257,7 +1067,7 @@ class DBManager:
             if not emp: return None
             
             cursor.execute("""
-                SELECT date_pointage, check_in, check_out, minutes, statut
+                SELECT date_pointage, check_in, check_out, minutes, statut, check_in_min, check_out_min
                 FROM pointages WHERE employe_id = %s ORDER BY date_pointage
             """, (emp['id'],))
             pointages = cursor.fetchall()
@@ -267,6 +1077,9 @@ class DBManager:
             emp['check_outs'] = [p['check_out'] for p in pointages]
             emp['attended_minutes'] = [p['minutes'] for p in pointages]
             emp['statuses'] = [p['statut'] for p in pointages]
+            # Heures déjà converties en minutes (None si absentes ou illisibles)
+            emp['check_in_minutes'] = [p['check_in_min'] for p in pointages]
+            emp['check_out_minutes'] = [p['check_out_min'] for p in pointages]
             
             return emp
         finally:
@@ -286,70 +1099,230 @@ class DBManager:
             conn.close()
 
     def get_all_employees_with_detailed_data_filtered(self, year=None, month=None, start_date=None, end_date=None):
-        """Récupère tous les employés avec leurs pointages filtrés par période ou plage de dates"""
+        """Récupère tous les employés avec leurs pointages filtrés par période ou plage de dates
+
+        Une seule requête (employés JOIN pointages, triée par employé puis date),
+        regroupée en un passage : seuls les employés ayant des pointages sur la
+        période sont retournés.
+        """
+        return list(self.iter_employees_with_detailed_data_filtered(year, month, start_date, end_date))
+
+    def iter_employees_with_detailed_data_filtered(self, year=None, month=None, start_date=None, end_date=None):
+        """Même résultat que get_all_employees_with_detailed_data_filtered, un employé à la fois
+
+        Les lignes sont lues au fil du curseur : l'appelant (PeriodAttendance)
+        peut encoder la période sans que toute la liste de dicts soit en mémoire.
+        La connexion est rendue quand le générateur est épuisé ou fermé.
+        """
+        conn = self.get_connection()
+        if not conn: return
+        cursor = conn.cursor(dictionary=True)
+        try:
+            where, params = self._period_filter('p.date_pointage', year, month, start_date, end_date)
+            if where is None:
+                return
+            cursor.execute("""
+                SELECT e.id, e.person_id, e.nom AS name, e.departement AS department, e.poste AS position,
+                       e.date_embauche AS joining_date,
+                       p.date_pointage, p.check_in, p.check_out, p.minutes, p.statut
+                FROM employes e JOIN pointages p ON p.employe_id = e.id
+            """ + where + """
+                ORDER BY e.id, p.date_pointage
+            """, params)
+
+            emp = None
+            for row in cursor:
+                if emp is None or emp['id'] != row['id']:
+                    if emp is not None:
+                        yield emp
+                    emp = {
+                        'id': row['id'], 'person_id': row['person_id'], 'name': row['name'],
+                        'department': row['department'], 'position': row['position'],
+                        'joining_date': row['joining_date'],
+                        'dates': [], 'check_ins': [], 'check_outs': [], 'attended_minutes': [], 'statuses': []
+                    }
+                emp['dates'].append(str(row['date_pointage']))
+                emp['check_ins'].append(row['check_in'])
+                emp['check_outs'].append(row['check_out'])
+                emp['attended_minutes'].append(row['minutes'])
+                emp['statuses'].append(row['statut'])
+            if emp is not None:
+                yield emp
+        finally:
+            cursor.close()
+            conn.close()
+
+    @staticmethod
+    def _period_filter(column, year=None, month=None, start_date=None, end_date=None):
+        """Clause WHERE (et paramètres) d'une période, mêmes règles que le chargement détaillé
+
+        Intervalle semi-ouvert [début, lendemain de la fin) sur la colonne elle-même,
+        pour que l'index (date_pointage, employe_id) soit utilisé. Période invalide
+        (mois 13, année ou date illisible...) : (None, []), l'appelant retourne un résultat vide.
+        """
+        try:
+            if start_date and end_date:
+                start = datetime.strptime(str(start_date), '%Y-%m-%d')
+                end = datetime.strptime(str(end_date), '%Y-%m-%d') + timedelta(days=1)
+                return f" WHERE {column} >= %s AND {column} < %s", [start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')]
+            if year and month:
+                return f" WHERE {column} >= %s AND {column} < %s", list(DBManager.month_range(year, month))
+        except (TypeError, ValueError, OverflowError):
+            return None, []
+        return "", []
+
+    @staticmethod
+    def _stats_from_sums(row):
+        """Dict au format de calculate_statistics à partir des sommes SQL (worked_minutes, days_worked...)"""
+        total_hours = int(row['worked_minutes'] or 0) / 60
+        days_worked = int(row['days_worked'] or 0)
+        return {
+            'total_days_worked': days_worked,
+            'total_days_absent': int(row['days_absent'] or 0),
+            'total_hours': round(total_hours, 2),
+            'total_weekends': int(row['weekends'] or 0),
+            'total_late_minutes': int(row['late_minutes'] or 0),
+            'count_lates': int(row['count_lates'] or 0),
+            'total_overtime_minutes': int(row['overtime_minutes'] or 0),
+            'total_undertime_minutes': int(row['undertime_minutes'] or 0),
+            'average_hours_per_day': round(total_hours / days_worked, 2) if days_worked > 0 else 0
+        }
+
+    def get_period_statistics(self, year=None, month=None, start_date=None, end_date=None):
+        """Statistiques par employé d'une période, agrégées en SQL sur pointage_facts
+
+        Mêmes filtres que get_all_employees_with_detailed_data_filtered, mais une seule
+        ligne par employé ayant des pointages sur la période (au lieu d'une par jour).
+        Chaque employé : person_id, name, department, position, joining_date,
+        first_date, last_date et 'stats' au format de calculate_statistics.
+        """
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor(dictionary=True)
         try:
-            # 1. Récupérer tous les employés
-            cursor.execute("SELECT id, person_id, nom as name, departement as department, poste as position, date_embauche as joining_date FROM employes")
-            employees = cursor.fetchall()
-            
-            # 2. Pour chaque employé, récupérer ses pointages filtrés
-            for emp in employees:
-                if start_date and end_date:
-                    query = """
-                        SELECT date_pointage, check_in, check_out, minutes, statut
-                        FROM pointages 
-                        WHERE employe_id = %s AND date_pointage BETWEEN %s AND %s 
-                        ORDER BY date_pointage
-                    """
-                    cursor.execute(query, (emp['id'], start_date, end_date))
-                elif year and month:
-                    query = """
-                        SELECT date_pointage, check_in, check_out, minutes, statut
-                        FROM pointages 
-                        WHERE employe_id = %s AND YEAR(date_pointage) = %s AND MONTH(date_pointage) = %s 
-                        ORDER BY date_pointage
-                    """
-                    cursor.execute(query, (emp['id'], int(year), int(month)))
-                else:
-                    cursor.execute("""
-                        SELECT date_pointage, check_in, check_out, minutes, statut
-                        FROM pointages WHERE employe_id = %s ORDER BY date_pointage
-                    """, (emp['id'],))
-                
-                pointages = cursor.fetchall()
-                
-                emp['dates'] = [str(p['date_pointage']) for p in pointages]
-                emp['check_ins'] = [p['check_in'] for p in pointages]
-                emp['check_outs'] = [p['check_out'] for p in pointages]
-                emp['attended_minutes'] = [p['minutes'] for p in pointages]
-                emp['statuses'] = [p['statut'] for p in pointages]
-            
-            return [e for e in employees if e['dates']] # On ne retourne que ceux qui ont des données pour la période
+            where, params = self._period_filter('f.date_pointage', year, month, start_date, end_date)
+            if where is None:
+                return []
+            cursor.execute("""
+                SELECT e.person_id, e.nom AS name, e.departement AS department, e.poste AS position,
+                       e.date_embauche AS joining_date,
+                       SUM(f.worked_minutes) AS worked_minutes,
+                       SUM(CASE WHEN f.day_class = 'worked' THEN 1 ELSE 0 END) AS days_worked,
+                       SUM(CASE WHEN f.day_class = 'absent' THEN 1 ELSE 0 END) AS days_absent,
+                       SUM(CASE WHEN f.day_class = 'weekend' THEN 1 ELSE 0 END) AS weekends,
+                       SUM(f.late_minutes) AS late_minutes,
+                       SUM(CASE WHEN f.late_minutes > 0 THEN 1 ELSE 0 END) AS count_lates,
+                       SUM(f.overtime_minutes) AS overtime_minutes,
+                       SUM(f.undertime_minutes) AS undertime_minutes,
+                       MIN(f.date_pointage) AS first_date, MAX(f.date_pointage) AS last_date
+                FROM pointage_facts f JOIN employes e ON e.id = f.employe_id
+            """ + where + """
+                GROUP BY e.id, e.person_id, e.nom, e.departement, e.poste, e.date_embauche
+                ORDER BY e.id
+            """, params)
+            employees = []
+            for row in cursor.fetchall():
+                employees.append({
+                    'person_id': row['person_id'], 'name': row['name'], 'department': row['department'],
+                    'position': row['position'], 'joining_date': row['joining_date'],
+                    'first_date': str(row['first_date']), 'last_date': str(row['last_date']),
+                    'stats': self._stats_from_sums(row)
+                })
+            return employees
         finally:
             cursor.close()
             conn.close()
 
+    def get_rollups(self, scope='employee', grain='week', keys=None, start_date=None, end_date=None):
+        """Agrégats par semaine ou par mois, lus dans les tables d'agrégats
+
+        scope : 'employee' (keys = person_id) ou 'department' (keys = noms de département).
+        grain : 'week' (période = lundi) ou 'month' (période = premier du mois).
+        start_date / end_date : périodes qui contiennent ces dates, bornes incluses.
+        Chaque ligne : 'person_id' ou 'department', 'period', 'days' (jours pointés),
+        'employees' (département seulement) et 'stats' au format de calculate_statistics.
+        """
+        table, key_col, period_col = self.ROLLUP_TABLES[(scope, grain)]
+        to_period = self.monday_of if grain == 'week' else self.month_of
+        conn = self.get_connection()
+        if not conn: return []
+        cursor = conn.cursor(dictionary=True)
+        try:
+            if scope == 'employee':
+                query = "SELECT e.person_id AS rollup_key, s.* FROM " + table + " s JOIN employes e ON e.id = s.employe_id"
+                key_filter = "e.person_id"
+            else:
+                query = "SELECT s.departement AS rollup_key, s.* FROM " + table + " s"
+                key_filter = "s.departement"
+            query += " WHERE s.jours > 0"
+            params = []
+            if keys is not None:
+                keys = [str(k) for k in keys]
+                if not keys:
+                    return []
+                query += " AND " + key_filter + " IN (" + ", ".join(["%s"] * len(keys)) + ")"
+                params.extend(keys)
+            if start_date:
+                query += " AND s." + period_col + " >= %s"
+                params.append(to_period(start_date))
+            if end_date:
+                query += " AND s." + period_col + " <= %s"
+                params.append(to_period(end_date))
+            cursor.execute(query + " ORDER BY rollup_key, s." + period_col, params)
+            rollups = []
+            for row in cursor.fetchall():
+                rollup = {'person_id' if scope == 'employee' else 'department': row['rollup_key'],
+                          'period': str(row[period_col]), 'days': int(row['jours'])}
+                if scope == 'department':
+                    rollup['employees'] = int(row['employes'])
+                rollup['stats'] = self._stats_from_sums(row)
+                rollups.append(rollup)
+            return rollups
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_weekly_statistics(self, person_ids=None, start_date=None, end_date=None):
+        """Alias : agrégats hebdomadaires par employé"""
+        return self.get_rollups('employee', 'week', person_ids, start_date, end_date)
+
     def get_available_periods(self):
-        """Récupère la liste des mois/années disponibles dans la base de données"""
+        """Récupère la liste des mois/années disponibles dans la base de données (catalogue periodes)
+
+        Chaque mois du catalogue est vérifié par une recherche dans l'index
+        (date_pointage, employe_id) : un mois dont les pointages ont été supprimés
+        (employés supprimés, purge...) est retiré du catalogue.
+        """
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor(dictionary=True)
         try:
             cursor.execute("""
-                SELECT DISTINCT YEAR(date_pointage) as year, MONTH(date_pointage) as month 
-                FROM pointages 
-                ORDER BY year DESC, month DESC
+                SELECT annee as year, mois as month
+                FROM periodes
+                ORDER BY annee DESC, mois DESC
             """)
-            return cursor.fetchall()
+            periods = cursor.fetchall()
+            available, stale = [], []
+            for period in periods:
+                cursor.execute("SELECT 1 FROM pointages WHERE date_pointage >= %s AND date_pointage < %s LIMIT 1",
+                               self.month_range(period['year'], period['month']))
+                if cursor.fetchone():
+                    available.append(period)
+                else:
+                    stale.append((period['year'], period['month']))
+            if stale:
+                cursor.executemany("DELETE FROM periodes WHERE annee = %s AND mois = %s", stale)
+                conn.commit()
+            return available
         finally:
             cursor.close()
             conn.close()
 
     # --- MÉTHODES POUR LE PLANNING ---
-    def save_weekly_planning(self, employee_id_str, monday_date, data):
+    def save_weekly_planning(self, employee_id_str, monday_date, data, refresh_facts=True):
+        """Enregistre le planning d'une semaine ; refresh_facts=False pour un import en lot
+        (l'appelant rafraîchit alors pointage_facts une seule fois à la fin)"""
         conn = self.get_connection()
         if not conn: return False
         cursor = conn.cursor()
@@ -359,14 +1332,51 @@ class DBManager:
                 VALUES (%s, %s, %s)
                 ON DUPLICATE KEY UPDATE data_json = VALUES(data_json)
             """, (str(employee_id_str), monday_date, json.dumps(data)))
+            generation = self._bump_generation(cursor)
             conn.commit()
-            return True
+            DATA_VERSIONS.bump_person(employee_id_str, generation)
         except Exception as e:
             print(f"Erreur save_weekly_planning: {e}")
             return False
         finally:
             cursor.close()
             conn.close()
+        # Connexion rendue au pool avant le recalcul (qui emprunte les siennes)
+        if refresh_facts:
+            start_date, end_date = self.week_bounds(monday_date)
+            self.refresh_pointage_facts([employee_id_str], start_date=start_date, end_date=end_date)
+        return True
+
+    @staticmethod
+    def week_bounds(monday_date):
+        """(lundi, dimanche) 'YYYY-MM-DD' de la semaine commençant à monday_date"""
+        monday = datetime.strptime(str(monday_date)[:10], '%Y-%m-%d')
+        return monday.strftime('%Y-%m-%d'), (monday + timedelta(days=6)).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def monday_of(day):
+        """Lundi 'YYYY-MM-DD' de la semaine de day (date ou 'YYYY-MM-DD')"""
+        day = datetime.strptime(str(day)[:10], '%Y-%m-%d')
+        return (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def month_of(day):
+        """Premier jour 'YYYY-MM-01' du mois de day (date ou 'YYYY-MM-DD')"""
+        return datetime.strptime(str(day)[:10], '%Y-%m-%d').strftime('%Y-%m-01')
+
+    @staticmethod
+    def month_bounds(month_date):
+        """(premier, dernier jour) 'YYYY-MM-DD' du mois de month_date"""
+        first = datetime.strptime(str(month_date)[:7] + '-01', '%Y-%m-%d')
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d')
+
+    @staticmethod
+    def month_range(year, month):
+        """(premier jour du mois, premier jour du mois suivant) 'YYYY-MM-DD' ; ValueError si invalide"""
+        first = date(int(year), int(month), 1)
+        following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        return first.isoformat(), following.isoformat()
 
     def save_employee_planning(self, employee_id_str, monday_date, data):
         """Alias pour save_weekly_planning"""
@@ -491,14 +1501,18 @@ class DBManager:
                 VALUES (%s, %s)
                 ON DUPLICATE KEY UPDATE data = VALUES(data)
             """, (dept_name, json.dumps(data)))
+            generation = self._bump_generation(cursor)
             conn.commit()
-            return True
+            DATA_VERSIONS.bump_department(dept_name, generation)
         except Exception as e:
             print(f"Erreur save_function_planning: {e}")
             return False
         finally:
             cursor.close()
             conn.close()
+        # Connexion rendue au pool avant le recalcul (qui emprunte les siennes)
+        self.refresh_pointage_facts(department=dept_name)
+        return True
 
     def get_function_planning(self, dept_name):
         conn = self.get_connection()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de connexions BDD partagé par tout le processus.
+
+Chaque méthode de DBManager ouvre une connexion puis la ferme : sans pool, c'est
+une poignée de main TCP (+ TLS sur Aiven) à chaque appel. Ici, get_connection()
+emprunte une connexion au pool et conn.close() l'y rend, sans rien changer au
+code appelant.
+
+  - taille maximale (DB_POOL_SIZE) : au-delà, l'emprunt attend qu'une connexion
+    soit rendue, au plus DB_POOL_TIMEOUT secondes, puis lève PoolError ;
+  - vérification à l'emprunt : une connexion morte (coupée par le serveur,
+    wait_timeout...) est jetée et remplacée ;
+  - en rendant une connexion, la transaction éventuellement ouverte est annulée ;
+    si c'est impossible (résultat non lu...), la connexion est jetée ;
+  - statistiques (stats()) : connexions ouvertes, empruntées, attentes, temps d'attente.
+
+Après un fork, le processus enfant repart d'un pool vide (les sockets du parent
+ne sont jamais partagées).
+"""
+import os
+import queue
+import threading
+import time
+
+from mysql.connector.errors import PoolError
+
+
+class PooledConnection:
+    """Connexion empruntée : tout est délégué à la vraie connexion, sauf close()"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        """Rend la connexion au pool (plusieurs appels sans effet)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._release(conn)
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise PoolError(msg="Connexion déjà rendue au pool")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        if name in ('_pool', '_conn'):
+            object.__setattr__(self, name, value)
+            return
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise PoolError(msg="Connexion déjà rendue au pool")
+        setattr(conn, name, value)  # ex. conn.autocommit = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # Connexion oubliée sans close() : on libère sa place (sans la réutiliser)
+        conn = self.__dict__.get('_conn')
+        if conn is not None:
+            self._conn = None
+            self._pool._discard(conn)
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=5, timeout=10.0, is_alive=None):
+        """connect() ouvre une nouvelle connexion ; is_alive(conn) la vérifie à l'emprunt"""
+        self.connect = connect
+        self.size = max(1, int(size))
+        self.timeout = float(timeout)
+        self.is_alive = is_alive or (lambda conn: conn.is_connected())
+        self._idle = queue.LifoQueue()  # la plus récemment rendue d'abord (la plus sûrement vivante)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self.pid = os.getpid()
+        # Statistiques
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.discarded = 0
+
+    def get_connection(self):
+        """Emprunte une connexion vivante (PooledConnection), en attendant au besoin"""
+        while True:
+            conn = self._take()
+            if conn is None:
+                # Place libre : nouvelle connexion
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                try:
+                    alive = self.is_alive(conn)
+                except Exception:
+                    alive = False
+                if not alive:
+                    self._discard(conn)
+                    continue
+            with self._lock:
+                self.checkouts += 1
+            return PooledConnection(self, conn)
+
+    def _take(self):
+        """Connexion libre, ou None si une place est réservée pour en ouvrir une nouvelle"""
+        start = None
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+                break
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    conn = None
+                    break
+                if start is None:
+                    self.waits += 1
+                    start = time.perf_counter()
+            remaining = self.timeout - (time.perf_counter() - start)
+            if remaining <= 0:
+                with self._lock:
+                    self.timeouts += 1
+                    self.wait_time += time.perf_counter() - start
+                raise PoolError(msg=f"Aucune connexion libre après {self.timeout:g} s (pool de {self.size})")
+            try:
+                # Attente par tranches : une place libérée par _discard doit aussi être vue
+                conn = self._idle.get(timeout=min(remaining, 0.05))
+                break
+            except queue.Empty:
+                continue
+        if start is not None:
+            with self._lock:
+                self.wait_time += time.perf_counter() - start
+        return conn
+
+    def _release(self, conn):
+        try:
+            if getattr(conn, 'in_transaction', False):
+                conn.rollback()  # transaction non validée par l'appelant
+        except Exception:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._opened -= 1
+            self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._lock:
+            idle = self._idle.qsize()
+            return {
+                'size': self.size,
+                'timeout': self.timeout,
+                'open': self._opened,
+                'idle': idle,
+                'in_use': self._opened - idle,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time_total': round(self.wait_time, 4),
+                'wait_time_avg': round(self.wait_time / self.waits, 4) if self.waits else 0,
+                'timeouts': self.timeouts,
+                'discarded': self.discarded,
+            }
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(key, connect, size, timeout, is_alive=None):
+    """Pool du processus pour key = (hôte, port, utilisateur, base), créé au premier appel"""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None or pool.pid != os.getpid():
+            pool = _POOLS[key] = ConnectionPool(connect, size, timeout, is_alive)
+        return pool
+
+
+def pool_stats():
+    """Statistiques de tous les pools du processus"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.items())
+    return [dict(pool.stats(), host=key[0], database=key[3]) for key, pool in pools if pool.pid == os.getpid()]
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Générateur d'exports pointeuse synthétiques (tests de charge / benchmarks)
+
+Construit sur create_employee_block (generate_test_report_complex.py) : même
+disposition que les vrais exports, mais avec des employés, départements,
+horaires de nuit et pointages manquants tirés au hasard. La graine est fixe :
+une même commande produit toujours le même fichier.
+
+Formats :
+  xlsx  - classeur Excel 2007+ (openpyxl, écriture en flux)
+  xls   - vrai classeur Excel 97 (xlwt, limité à 65536 lignes)
+  html  - faux .xls (tableau HTML), comme certaines pointeuses
+
+Exemple :
+  python generate_attendance_export.py --employees 10000 --days 31 --format html -o uploads/charge.xls
+"""
+import argparse
+import html
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from generate_test_report_complex import create_employee_block
+
+MAX_EMPLOYEES = 20000
+MAX_DAYS = 31
+XLS_MAX_ROWS = 65536
+
+FORMATS = ('xlsx', 'xls', 'html')
+
+DEFAULT_DEPARTMENTS = [
+    "RES KABANA/MENAGE", "RES KABANA/RECEPTION", "RES KABANA/CUISINE", "RES KABANA/SECURITE",
+    "RES KABANA/TECHNIQUE", "RES KABANA/RESTAURANT", "RES KABANA/SPA", "RES KABANA/ADMINISTRATION",
+]
+FIRST_NAMES = [
+    "HANANE", "FATIMA", "MBARK", "YOUSSEF", "KHADIJA", "MOHAMED", "SAID", "NADIA", "RACHID", "AICHA",
+    "OMAR", "ZINEB", "HASSAN", "LAILA", "ABDELLAH", "SANAA", "KARIM", "IMANE", "BRAHIM", "SOUKAINA",
+]
+LAST_NAMES = [
+    "LAGALAOUI", "LALAOUI EL ISMAILI", "EL ASRI", "BENALI", "AIT MALK", "EL IDRISSI", "OUHAMMOU",
+    "BOUZID", "CHAKIR", "EL AMRANI", "ZAHIRI", "TAZI", "AMZIL", "BENNANI", "OUBELLA", "HADDAD",
+]
+
+# Horaires de jour possibles (début, fin) en minutes ; la nuit : 22:00 -> 06:00
+DAY_SHIFTS = [(8 * 60, 16 * 60), (9 * 60, 17 * 60), (7 * 60, 15 * 60), (14 * 60, 22 * 60)]
+NIGHT_SHIFT = (22 * 60, 6 * 60)
+
+
+def _hhmm(minutes):
+    minutes %= 1440
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _departments(value):
+    """'5' -> 5 départements ; 'A,B' -> liste explicite"""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    value = str(value).strip()
+    if value.isdigit():
+        n = int(value)
+        if n < 1:
+            raise ValueError("Il faut au moins un département")
+        return [DEFAULT_DEPARTMENTS[i] if i < len(DEFAULT_DEPARTMENTS) else f"RES KABANA/SERVICE {i + 1:02d}"
+                for i in range(n)]
+    names = [d.strip() for d in value.split(',') if d.strip()]
+    if not names:
+        raise ValueError("Liste de départements vide")
+    return names
+
+
+def employee_schedule(rng, days, night, missing_rate, absence_rate=0.03):
+    """Un tuple (check_in, check_out, attended, status) par jour pour un employé"""
+    start, end = NIGHT_SHIFT if night else rng.choice(DAY_SHIFTS)
+    rest_day = rng.randrange(7)  # Jour de repos hebdomadaire
+    schedule = []
+    for i in range(days):
+        if i % 7 == rest_day:
+            schedule.append((None, None, 0, "Weekend"))
+            continue
+        if rng.random() < absence_rate:
+            schedule.append((None, None, 0, "Absent"))
+            continue
+
+        arrival = start + int(rng.gauss(0, 8))
+        departure = end + int(rng.gauss(5, 10))
+        check_in, check_out = _hhmm(arrival), _hhmm(departure)
+        attended = (departure - arrival) % 1440
+
+        if rng.random() < missing_rate:
+            # Pointage manquant : l'entrée ou la sortie n'a pas été badgée
+            if rng.random() < 0.5:
+                check_in = None
+            else:
+                check_out = None
+            schedule.append((check_in, check_out, 0, "Missing"))
+        else:
+            schedule.append((check_in, check_out, attended, "Normal"))
+    return schedule
+
+
+def iter_export_rows(employees=100, days=31, departments=5, missing_rate=0.02, night_rate=0.1,
+                     seed=42, start_date=None):
+    """Lignes de l'export (listes de même largeur), employé par employé"""
+    if not 1 <= employees <= MAX_EMPLOYEES:
+        raise ValueError(f"Nombre d'employés entre 1 et {MAX_EMPLOYEES}")
+    if not 1 <= days <= MAX_DAYS:
+        raise ValueError(f"Nombre de jours entre 1 et {MAX_DAYS}")
+    for name, rate in (('missing_rate', missing_rate), ('night_rate', night_rate)):
+        if not 0 <= rate <= 1:
+            raise ValueError(f"{name} doit être entre 0 et 1")
+
+    depts = _departments(departments)
+    start_date = start_date or datetime(2025, 12, 1)
+    end_date = start_date + timedelta(days=days - 1)
+    rng = random.Random(seed)
+
+    # Même largeur pour toutes les lignes (comme un DataFrame)
+    width = max(18, days + 5)
+
+    def pad(row):
+        return list(row) + [None] * (width - len(row))
+
+    yield pad([f"From: {start_date:%Y-%m-%d} To: {end_date:%Y-%m-%d}"])
+    yield pad([None])
+
+    for n in range(employees):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        department = rng.choice(depts)
+        schedule = employee_schedule(rng, days, rng.random() < night_rate, missing_rate)
+        for row in create_employee_block(str(1000 + n), name, department, start_date, days=days, schedule=schedule):
+            yield pad(row)
+
+
+def rows_per_export(employees, days=31):
+    """Nombre de lignes produites (en-tête compris)"""
+    block = create_employee_block("0", "X", "X", datetime(2025, 12, 1), days=days, schedule=[(None, None, 0, None)] * days)
+    return 2 + employees * len(block)
+
+
+def _write_xlsx(path, rows):
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def _write_xls(path, rows):
+    try:
+        import xlwt  # Uniquement pour les vrais .xls (requirements.txt)
+    except ImportError:
+        raise RuntimeError("Le format xls nécessite le paquet xlwt (pip install xlwt) ; utilisez html pour un faux .xls")
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet("Sheet1")
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row):
+            if value is not None:
+                ws.write(r, c, value)
+    wb.save(path)
+
+
+def _write_html(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<html><head><meta charset="utf-8"></head><body><table border="1">\n')
+        for row in rows:
+            cells = ''.join(f"<td>{'' if v is None else html.escape(str(v))}</td>" for v in row)
+            f.write(f"<tr>{cells}</tr>\n")
+        f.write('</table></body></html>\n')
+
+
+_WRITERS = {'xlsx': _write_xlsx, 'xls': _write_xls, 'html': _write_html}
+
+
+def generate_export(path, fmt='xlsx', **params):
+    """Écrit un export synthétique ; retourne le nombre de lignes écrites"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Format inconnu : {fmt} (choix : {', '.join(FORMATS)})")
+    total = rows_per_export(params.get('employees', 100), params.get('days', 31))
+    if fmt == 'xls' and total > XLS_MAX_ROWS:
+        raise ValueError(f"{total} lignes : le format xls est limité à {XLS_MAX_ROWS} lignes (utilisez xlsx ou html)")
+    _WRITERS[fmt](path, iter_export_rows(**params))
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un export pointeuse synthétique reproductible")
+    parser.add_argument('--employees', type=int, default=100, help=f"nombre d'employés (max {MAX_EMPLOYEES})")
+    parser.add_argument('--days', type=int, default=31, help=f"nombre de jours (max {MAX_DAYS})")
+    parser.add_argument('--departments', default='5', help="nombre de départements ou liste séparée par des virgules")
+    parser.add_argument('--missing-rate', type=float, default=0.02, help="part des jours travaillés avec un pointage manquant")
+    parser.add_argument('--night-rate', type=float, default=0.1, help="part des employés en horaire de nuit")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start', default='2025-12-01', help="premier jour (YYYY-MM-DD)")
+    parser.add_argument('--format', choices=FORMATS, default='xlsx')
+    parser.add_argument('-o', '--output', help="fichier de sortie (par défaut synthetic_<employés>x<jours>.<ext>)")
+    args = parser.parse_args(argv)
+
+    output = args.output or f"synthetic_{args.employees}x{args.days}.{'xlsx' if args.format == 'xlsx' else 'xls'}"
+    try:
+        total = generate_export(
+            output, args.format,
+            employees=args.employees, days=args.days, departments=args.departments,
+            missing_rate=args.missing_rate, night_rate=args.night_rate, seed=args.seed,
+            start_date=datetime.strptime(args.start, '%Y-%m-%d'),
+        )
+    except (ValueError, RuntimeError) as e:
+        print(f"[ERREUR] {e}")
+        return 1
+    print(f"[OK] {output} : {args.employees} employes, {args.days} jours, {total} lignes ({os.path.getsize(output) // 1024} Ko)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
 import pandas as pd
 from datetime import datetime, timedelta
 
-def create_employee_block(person_id, name, department, start_date, days=7):
+def create_employee_block(person_id, name, department, start_date, days=7, schedule=None):
     # Création des lignes pour un employé
+    # schedule : optionnel, un tuple (check_in, check_out, attended, status) par jour.
+    # Sans schedule : scénario fixe (weekend vide, anomalies selon le nom).
     block = []
     
     # Ligne 1 : Les Infos Employé
@@ -50,6 +52,7 @@ def create_employee_block(person_id, name, department, start_date, days=7):
         
         # Weekend vide pour certains
         if wd >= 5: val = None # Samedi Dimanche
+        if schedule is not None: val = schedule[i][0]
             
         row_cin.append(val if val else None)
     block.append(row_cin)
@@ -69,6 +72,7 @@ def create_employee_block(person_id, name, department, start_date, days=7):
 
         # Weekend vide
         if wd >= 5: val = None
+        if schedule is not None: val = schedule[i][1]
             
         row_cout.append(val if val else None)
     block.append(row_cout)
@@ -104,8 +108,10 @@ def create_employee_block(person_id, name, department, start_date, days=7):
         for i in range(days):
             if lbl == "Attended":
                 val = 480 if date_objs[i].weekday() < 5 else 0
+                if schedule is not None: val = schedule[i][2]
             elif lbl == "Status":
                 val = "Normal" if date_objs[i].weekday() < 5 else "Weekend"
+                if schedule is not None: val = schedule[i][3]
             else:
                 val = None
             row.append(val)
@@ -117,23 +123,24 @@ def create_employee_block(person_id, name, department, start_date, days=7):
     return block
 
 # --- MAIN ---
-start_date = datetime(2025, 12, 22) # Lundi 22 Déc 2025
+if __name__ == "__main__":
+    start_date = datetime(2025, 12, 22) # Lundi 22 Déc 2025
 
-all_rows = []
-# Header global faux
-all_rows.append(["From: 2025-12-22 To: 2025-12-28"]) 
-all_rows.append([None])
+    all_rows = []
+    # Header global faux
+    all_rows.append(["From: 2025-12-22 To: 2025-12-28"]) 
+    all_rows.append([None])
 
-# 1. HANANE LAGALAOUI (Nom CORRECT pour le pointage => Mismatch avec HANANAE du planning)
-all_rows.extend(create_employee_block("101", "HANANE LAGALAOUI", "RES KABANA/MENAGE", start_date))
+    # 1. HANANE LAGALAOUI (Nom CORRECT pour le pointage => Mismatch avec HANANAE du planning)
+    all_rows.extend(create_employee_block("101", "HANANE LAGALAOUI", "RES KABANA/MENAGE", start_date))
 
-# 2. FATIMA LALAOUI EL ISMAILI (Nom CORRECT => Match parfait)
-all_rows.extend(create_employee_block("102", "FATIMA LALAOUI EL ISMAILI", "RES KABANA/MENAGE", start_date))
+    # 2. FATIMA LALAOUI EL ISMAILI (Nom CORRECT => Match parfait)
+    all_rows.extend(create_employee_block("102", "FATIMA LALAOUI EL ISMAILI", "RES KABANA/MENAGE", start_date))
 
-# 3. MBARK EL ASRI (Anomalie de sortie le Mercredi)
-all_rows.extend(create_employee_block("103", "MBARK EL ASRI", "RES KABANA/MENAGE", start_date))
+    # 3. MBARK EL ASRI (Anomalie de sortie le Mercredi)
+    all_rows.extend(create_employee_block("103", "MBARK EL ASRI", "RES KABANA/MENAGE", start_date))
 
-# Création du DF et sauvegarde
-df = pd.DataFrame(all_rows)
-df.to_excel("test_report_22_28_Dec.xlsx", index=False, header=False)
-print("Fichier 'test_report_22_28_Dec.xlsx' généré avec succès sur votre Bureau !")
+    # Création du DF et sauvegarde
+    df = pd.DataFrame(all_rows)
+    df.to_excel("test_report_22_28_Dec.xlsx", index=False, header=False)
+    print("Fichier 'test_report_22_28_Dec.xlsx' généré avec succès sur votre Bureau !")
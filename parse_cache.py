@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Cache disque des exports déjà parsés, indexé par le SHA-256 du contenu du fichier.
+
+Un même fichier ré-uploadé (ou relu pour le PDF) n'est plus décodé : on relit
+directement la liste d'employés sérialisée (pickle compressé zlib).
+La taille totale du cache est bornée : les entrées les moins récemment utilisées
+sont supprimées en premier.
+"""
+import hashlib
+import os
+import pickle
+import zlib
+
+# A incrémenter si la structure des employés produite par le parser change
+CACHE_FORMAT_VERSION = 1
+
+
+class ParseCache:
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def file_digest(filepath):
+        """SHA-256 du contenu du fichier (lecture par blocs de 1 Mo)"""
+        h = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def key_for(self, filepath, *variant):
+        """Clé de cache : contenu du fichier + options de parsing (moteur, mode...)"""
+        parts = [self.file_digest(filepath)] + [str(v) for v in variant] + [f"v{CACHE_FORMAT_VERSION}"]
+        return '-'.join(parts)
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + '.pkl.z')
+
+    def get(self, key):
+        """Employés en cache pour cette clé, ou None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            employees = pickle.loads(zlib.decompress(data))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Entrée corrompue (écriture interrompue...) : on l'ignore
+            print(f"[CACHE] Entree illisible {key}: {e}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # Marque l'entrée comme récemment utilisée
+        except OSError:
+            pass
+        return employees
+
+    def put(self, key, employees):
+        """Enregistre les employés parsés puis applique la limite de taille"""
+        payload = zlib.compress(pickle.dumps(employees, protocol=pickle.HIGHEST_PROTOCOL), 6)
+        if len(payload) > self.max_bytes:
+            return False
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)  # Écriture atomique (plusieurs processus de parsing)
+        self.evict()
+        return True
+
+    def evict(self):
+        """Supprime les entrées les plus anciennes tant que le cache dépasse max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.folder):
+            if not name.endswith('.pkl.z'):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        return total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
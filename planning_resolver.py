@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Résolution des plannings prévus par (employé, jour), compilée une fois par contexte.
+
+Le contexte de DBManager.get_calculation_context() contient les plannings sous
+forme de JSON ('debut'/'fin' en chaînes 'HH:MM'). PlanningResolver les parcourt
+une seule fois et ramène chaque planning distinct à un code entier, avec ses
+heures déjà converties en minutes. Une recherche ne fait plus que deux accès
+dict (planning individuel de la semaine, sinon planning de la fonction) et
+aucune conversion de chaîne.
+
+Les règles sont celles de calculate_statistics (voir lookup_plan) :
+planning individuel de la semaine d'abord, sinon planning de la fonction ;
+un planning individuel mal formé (clé manquante) n'a pas de repli.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DAYS_FR = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+
+# Planning d'un jour. start/end/planned_minutes valent -1 si l'heure est absente ou illisible
+PlannedShift = namedtuple('PlannedShift', 'is_repos debut fin start end planned_minutes')
+
+NO_PLAN = 0      # code du "pas de planning"
+_FALLBACK = -1   # jour absent du planning individuel : on passe au planning de la fonction
+
+
+def lookup_plan(context, p_id, department, monday_str, day_name):
+    """Recherche d'origine de calculate_statistics, telle quelle (planning ou None)"""
+    planned = None
+    try:
+        # Tentative Individuelle
+        indiv_plans = context['individual'].get(p_id, {})
+        if monday_str in indiv_plans:
+            plan_data = indiv_plans[monday_str]
+            if day_name in plan_data:
+                planned = {
+                    'heure_debut': plan_data[day_name]['debut'],
+                    'heure_fin': plan_data[day_name]['fin'],
+                    'est_repos': plan_data[day_name]['repos']
+                }
+
+        # Tentative Fonction (fallback)
+        if not planned:
+            dept = context['emp_depts'].get(p_id) or department
+            if dept and dept in context['functions']:
+                dept_plan = context['functions'][dept]
+                if day_name in dept_plan:
+                    planned = {
+                        'heure_debut': dept_plan[day_name]['debut'],
+                        'heure_fin': dept_plan[day_name]['fin'],
+                        'est_repos': dept_plan[day_name]['repos']
+                    }
+    except Exception:
+        pass
+    return planned
+
+
+def hm_to_minutes(value):
+    """Minutes depuis minuit selon datetime.strptime(value, '%H:%M'), -1 si illisible"""
+    try:
+        t = datetime.strptime(value, "%H:%M")
+    except Exception:
+        return -1
+    return t.hour * 60 + t.minute
+
+
+def _hashable(value):
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ('unhashable', repr(value))
+
+
+class _NotCompilable(Exception):
+    pass
+
+
+class PlanningResolver:
+    def __init__(self, context):
+        self.context = context
+        self.shifts = [None]  # code -> PlannedShift (0 = pas de planning)
+        self._codes = {}
+        try:
+            self._compile(context)
+            self.generic = False
+        except _NotCompilable:
+            # Contexte de forme inattendue : recherche d'origine à chaque appel
+            self.generic = True
+        self._arrays = None
+
+    @classmethod
+    def for_context(cls, context):
+        """Résolveur du contexte, compilé au premier appel puis gardé dans le contexte"""
+        resolver = context.get('_resolver') if isinstance(context, dict) else None
+        if resolver is None:
+            resolver = cls(context)
+            if isinstance(context, dict):
+                context['_resolver'] = resolver
+        return resolver
+
+    # --- Compilation ---
+    def code_for(self, planned):
+        """Code entier d'un planning {'heure_debut', 'heure_fin', 'est_repos'} (0 si None)"""
+        if not planned:
+            return NO_PLAN
+        is_repos = bool(planned['est_repos'])
+        debut, fin = planned['heure_debut'], planned['heure_fin']
+        key = (is_repos, _hashable(debut), _hashable(fin))
+        code = self._codes.get(key)
+        if code is None:
+            start = hm_to_minutes(debut) if (debut and not is_repos) else -1
+            end = hm_to_minutes(fin) if (fin and not is_repos) else -1
+            planned_minutes = -1
+            if start >= 0 and end >= 0:
+                planned_minutes = end - start
+                if planned_minutes < 0:
+                    planned_minutes += 1440
+            code = len(self.shifts)
+            self.shifts.append(PlannedShift(is_repos, debut, fin, start, end, planned_minutes))
+            self._codes[key] = code
+            self._arrays = None
+        return code
+
+    def _day_code(self, plan_data, day_name):
+        """Code d'un jour d'un planning ; _FALLBACK si le jour n'y figure pas"""
+        if day_name not in plan_data:
+            return _FALLBACK
+        try:
+            planned = {
+                'heure_debut': plan_data[day_name]['debut'],
+                'heure_fin': plan_data[day_name]['fin'],
+                'est_repos': plan_data[day_name]['repos']
+            }
+        except Exception:
+            return NO_PLAN  # planning mal formé : ni planning ni repli
+        return self.code_for(planned)
+
+    def _compile(self, context):
+        try:
+            individual = context['individual']
+            emp_depts = context['emp_depts']
+            functions = context['functions']
+        except Exception:
+            raise _NotCompilable()
+        if not all(isinstance(x, dict) for x in (individual, emp_depts, functions)):
+            raise _NotCompilable()
+
+        self._functions = {}
+        for dept, dept_plan in functions.items():
+            if not isinstance(dept_plan, dict):
+                raise _NotCompilable()
+            codes = [self._day_code(dept_plan, day) for day in DAYS_FR]
+            self._functions[dept] = [NO_PLAN if c == _FALLBACK else c for c in codes]
+
+        self._individual = {}
+        for p_id, weeks in individual.items():
+            if not isinstance(weeks, dict):
+                raise _NotCompilable()
+            compiled = {}
+            for monday_str, plan_data in weeks.items():
+                if not isinstance(plan_data, dict):
+                    raise _NotCompilable()
+                compiled[monday_str] = [self._day_code(plan_data, day) for day in DAYS_FR]
+            self._individual[p_id] = compiled
+        self._emp_depts = emp_depts
+
+    # --- Recherche ---
+    def code(self, p_id, monday_str, weekday, department=None):
+        """Code du planning de p_id (str) pour le jour 'weekday' de la semaine du lundi monday_str"""
+        if self.generic:
+            return self.code_for(lookup_plan(self.context, p_id, department, monday_str, DAYS_FR[weekday]))
+
+        weeks = self._individual.get(p_id)
+        if weeks:
+            week = weeks.get(monday_str)
+            if week is not None and week[weekday] != _FALLBACK:
+                return week[weekday]
+        return self._function_code(p_id, weekday, department)
+
+    def _function_code(self, p_id, weekday, department):
+        try:
+            dept = self._emp_depts.get(p_id) or department
+            if not dept:
+                return NO_PLAN
+            table = self._functions.get(dept)
+        except TypeError:
+            return NO_PLAN  # département non hachable
+        return table[weekday] if table else NO_PLAN
+
+    def week_codes(self, p_id, department=None):
+        """Les 7 codes (lundi..dimanche) valables toutes les semaines, ou None si l'employé
+        a des plannings individuels (il faut alors passer par code() jour par jour)"""
+        if self.generic or self._individual.get(p_id):
+            return None
+        return [self._function_code(p_id, wd, department) for wd in range(7)]
+
+    def planned(self, p_id, day, department=None):
+        """PlannedShift de p_id pour le jour day (date, datetime ou 'YYYY-MM-DD'), ou None"""
+        if isinstance(day, str):
+            day = datetime.strptime(day[:10], '%Y-%m-%d')
+        monday_str = (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+        return self.shifts[self.code(str(p_id), monday_str, day.weekday(), department)]
+
+    def resolve_range(self, p_id, start, end, department=None):
+        """Plannings de p_id pour chaque jour de start à end inclus, sous forme de tableaux
+
+        Retourne {'dates': [...], 'codes', 'is_repos', 'start', 'end', 'planned_minutes'}
+        (tableaux NumPy alignés sur 'dates' ; -1 = pas d'heure prévue).
+        """
+        if isinstance(start, str):
+            start = datetime.strptime(start[:10], '%Y-%m-%d').date()
+        if isinstance(end, str):
+            end = datetime.strptime(end[:10], '%Y-%m-%d').date()
+        if isinstance(start, datetime):
+            start = start.date()
+        if isinstance(end, datetime):
+            end = end.date()
+
+        p_id = str(p_id)
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        week = self.week_codes(p_id, department)
+        if week is not None:
+            codes = np.array([week[d.weekday()] for d in days], dtype=np.int64)
+        else:
+            codes = np.array([self.code(p_id, (d - timedelta(days=d.weekday())).isoformat(), d.weekday(), department)
+                              for d in days], dtype=np.int64)
+        is_repos, starts, ends, planned_minutes = self.arrays()
+        return {
+            'dates': [d.isoformat() for d in days],
+            'codes': codes,
+            'is_repos': is_repos[codes],
+            'start': starts[codes],
+            'end': ends[codes],
+            'planned_minutes': planned_minutes[codes],
+        }
+
+    def arrays(self):
+        """(is_repos, start, end, planned_minutes) indexés par code"""
+        if self._arrays is None or len(self._arrays[0]) != len(self.shifts):
+            rows = [(False, -1, -1, -1)] + [(s.is_repos, s.start, s.end, s.planned_minutes) for s in self.shifts[1:]]
+            table = np.array(rows, dtype=np.int64)
+            self._arrays = (table[:, 0].astype(bool), table[:, 1], table[:, 2], table[:, 3])
+        return self._arrays
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+DBManager embarqué sur SQLite (benchmarks et tests sans serveur MySQL)
+
+Les requêtes MySQL de db_manager.py sont traduites à la volée :
+  %s -> ?, ON DUPLICATE KEY UPDATE -> ON CONFLICT DO UPDATE, VALUES(col) -> excluded.col,
+  AUTO_INCREMENT / ENGINE / UNIQUE KEY nom (...) dans les CREATE [TEMPORARY] TABLE, INSERT IGNORE,
+  YEAR() / MONTH() / WEEKDAY() enregistrées comme fonctions SQL.
+LOAD DATA LOCAL INFILE est rejoué en Python (fichier TSV lu puis inséré ligne à ligne) ;
+SQLiteDBManager(local_infile=False) simule un serveur où local_infile est désactivé.
+Les erreurs SQLite remontent en mysql.connector.Error, comme avec le vrai serveur.
+
+Toutes les instances qui ciblent le même chemin partagent la même connexion
+(une base ':memory:' reste donc visible d'un DBManager à l'autre).
+"""
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import mysql.connector
+
+from db_manager import DBManager
+
+_CONNECTIONS = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def _convert_date(value):
+    # Les colonnes DATE reviennent en datetime.date comme avec mysql-connector
+    text = value.decode()
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _convert_datetime(value):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("TIMESTAMP", _convert_datetime)
+sqlite3.register_converter("DATETIME", _convert_datetime)
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=' '))
+
+_RE_VALUES = re.compile(r"VALUES\((\w+)\)", re.I)
+_RE_UNIQUE_KEY = re.compile(r"UNIQUE\s+KEY\s+\w+\s*\(", re.I)
+_RE_INLINE_INDEX = re.compile(r",\s*(?:INDEX|KEY)\s+(\w+)\s*\(([^)]*)\)", re.I)
+_RE_ENGINE = re.compile(r"\)\s*ENGINE\s*=.*$", re.I | re.S)
+
+
+def to_sqlite(sql):
+    """Traduit une requête MySQL du projet en SQL SQLite ; retourne (requête, index à créer)"""
+    q = sql.replace('%s', '?')
+    indexes = []
+    if re.match(r"\s*CREATE\s+(?:TEMPORARY\s+)?TABLE", q, re.I):
+        table = re.search(r"TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", q, re.I).group(1)
+        q = re.sub(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", q, flags=re.I)
+        q = re.sub(r"\bBIGINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", q, flags=re.I)
+        q = re.sub(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP", "", q, flags=re.I)
+        q = _RE_UNIQUE_KEY.sub("UNIQUE (", q)
+        for name, cols in _RE_INLINE_INDEX.findall(q):
+            indexes.append(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+        q = _RE_INLINE_INDEX.sub("", q)
+        q = _RE_ENGINE.sub(")", q.rstrip().rstrip(';'))
+    q = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", q, flags=re.I)
+    if re.search(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", q, re.I):
+        head, tail = re.split(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", q, maxsplit=1, flags=re.I)
+        # "WHERE true" lève l'ambiguïté de syntaxe entre INSERT ... SELECT et ON CONFLICT
+        if re.search(r"\bSELECT\b", head, re.I) and not re.search(r"\bWHERE\b", head.rsplit('FROM', 1)[-1], re.I):
+            order = re.search(r"\s+ORDER\s+BY\b", head, re.I)
+            if order:
+                head = head[:order.start()] + " WHERE true" + head[order.start():]
+            else:
+                head = head.rstrip() + " WHERE true "
+        q = head + "ON CONFLICT DO UPDATE SET" + _RE_VALUES.sub(r"excluded.\1", tail)
+    return q, indexes
+
+
+_RE_LOAD_DATA = re.compile(r"\s*LOAD\s+DATA\s+LOCAL\s+INFILE\s+%s\s+INTO\s+TABLE\s+(\w+).*\(([^()]*)\)\s*$", re.I | re.S)
+_TSV_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+
+def _tsv_value(field):
+    """Champ TSV au format LOAD DATA par défaut (\\N = NULL, échappement par antislash)"""
+    if field == '\\N':
+        return None
+    return re.sub(r"\\(.)", lambda m: _TSV_ESCAPES.get(m.group(1), m.group(1)), field, flags=re.S)
+
+
+class _Cursor:
+    def __init__(self, conn, dictionary=False, local_infile=True):
+        self._local_infile = local_infile
+        self._cursor = conn.cursor()
+        if dictionary:
+            self._cursor.row_factory = lambda c, row: {d[0]: v for d, v in zip(c.description, row)}
+
+    def _run(self, method, sql, params):
+        query, indexes = to_sqlite(sql)
+        try:
+            getattr(self._cursor, method)(query, params)
+            for index in indexes:
+                self._cursor.execute(index)
+        except sqlite3.Error as e:
+            raise mysql.connector.Error(msg=f"{e} [{query.strip()[:120]}]")
+
+    def execute(self, sql, params=()):
+        load = _RE_LOAD_DATA.match(sql)
+        if load:
+            return self._load_data(params[0], load.group(1), load.group(2))
+        self._run('execute', sql, tuple(params) if params else ())
+
+    def _load_data(self, path, table, columns):
+        if not self._local_infile:
+            raise mysql.connector.Error(msg="Loading local data is disabled; this must be enabled on both the "
+                                            "client and server sides", errno=3948)
+        columns = [c.strip() for c in columns.split(',')]
+        with open(path, encoding='utf-8', newline='') as f:
+            lines = f.read().split('\n')
+        rows = [[_tsv_value(field) for field in line.split('\t')] for line in lines if line]
+        self._run('executemany', f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                  rows)
+
+    def executemany(self, sql, seq_params):
+        self._run('executemany', sql, [tuple(p) for p in seq_params])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class _Connection:
+    def __init__(self, conn, local_infile=True):
+        self._conn = conn
+        self._local_infile = local_infile
+
+    def cursor(self, dictionary=False, **kwargs):
+        return _Cursor(self._conn, dictionary, self._local_infile)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        pass  # La connexion SQLite est partagée
+
+    def is_connected(self):
+        return True
+
+
+class SQLiteDBManager(DBManager):
+    def __init__(self, path=':memory:', local_infile=True):
+        super().__init__()
+        self.path = path
+        self.local_infile = local_infile
+        with _CONNECTIONS_LOCK:
+            if path not in _CONNECTIONS:
+                conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+                conn.create_function('YEAR', 1, lambda d: int(str(d)[:4]) if d else None)
+                conn.create_function('MONTH', 1, lambda d: int(str(d)[5:7]) if d else None)
+                conn.create_function('WEEKDAY', 1, lambda d: date.fromisoformat(str(d)[:10]).weekday() if d else None)
+                conn.execute("PRAGMA foreign_keys = ON")
+                _CONNECTIONS[path] = conn
+            self._sqlite = _CONNECTIONS[path]
+
+    def get_connection(self):
+        return _Connection(self._sqlite, self.local_infile)
+
+    @classmethod
+    def reset(cls, path=':memory:'):
+        """Oublie la base partagée (nouvelle base vide au prochain SQLiteDBManager(path))"""
+        with _CONNECTIONS_LOCK:
+            conn = _CONNECTIONS.pop(path, None)
+        if conn is not None:
+            conn.close()
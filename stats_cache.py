@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Cache mémoire des statistiques par employé, indexé par (person_id, période, version).
+
+Les versions sont des compteurs en mémoire du processus, incrémentés par les
+écritures de DBManager :
+  - save_data, save_weekly_planning, update_employee_stats : version de l'employé
+  - save_function_planning : version du département
+
+La version d'un employé combine les deux compteurs (employé + département dont
+dépend son planning). Une modification ne rend donc obsolètes que les entrées
+des employés concernés ; les autres continuent d'être servies depuis le cache.
+Les entrées obsolètes ne sont plus jamais lues et sortent par l'éviction LRU.
+
+Écritures des autres processus (backfill_exports.py, adjust_plannings.py, autres
+workers) : chaque écriture de DBManager incrémente aussi la génération stockée en
+base (table versions_donnees). sync() compare la génération lue en base à la
+dernière connue ; un écart que les écritures du processus n'expliquent pas change
+l'époque, qui fait partie de toutes les versions : tout le cache devient obsolète.
+"""
+import threading
+from collections import OrderedDict
+
+
+class DataVersions:
+    """Compteurs de version des données (par employé et par département)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._persons = {}
+        self._departments = {}
+        self.generation = 0  # incrémenté à chaque écriture, quelle qu'elle soit
+        self.epoch = 0  # incrémenté quand un autre processus a écrit en base
+        self.db_generation = None  # dernière génération de la base connue
+
+    def bump_person(self, person_id, db_generation=None):
+        self.bump_persons([person_id], db_generation)
+
+    def bump_persons(self, person_ids, db_generation=None):
+        """db_generation : génération de la base après l'écriture (voir DBManager._bump_generation)"""
+        with self._lock:
+            for person_id in person_ids:
+                key = str(person_id)
+                self._persons[key] = self._persons.get(key, 0) + 1
+            self.generation += 1
+            self._follow(db_generation)
+
+    def bump_department(self, department, db_generation=None):
+        with self._lock:
+            self._departments[department] = self._departments.get(department, 0) + 1
+            self.generation += 1
+            self._follow(db_generation)
+
+    def _follow(self, db_generation):
+        """Génération produite par une écriture du processus : autre écriture intercalée -> nouvelle époque"""
+        if db_generation is None:
+            return
+        if self.db_generation is not None:
+            if db_generation <= self.db_generation:
+                return  # déjà prise en compte
+            if db_generation != self.db_generation + 1:
+                self.epoch += 1
+                self.generation += 1
+        self.db_generation = db_generation
+
+    def sync(self, db_generation):
+        """Génération lue en base avant de lire des données : écart inexpliqué -> nouvelle époque"""
+        if db_generation is None:
+            return
+        with self._lock:
+            if self.db_generation is not None and db_generation != self.db_generation:
+                self.epoch += 1
+                self.generation += 1
+            self.db_generation = db_generation
+
+    def version(self, person_id, department):
+        """Version courante des données d'un employé rattaché à department"""
+        try:
+            dept_version = self._departments.get(department, 0)
+        except TypeError:
+            dept_version = 0  # département non hachable
+        return (self._persons.get(str(person_id), 0), dept_version, self.epoch)
+
+
+class StatsCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Statistiques en cache pour cette clé, ou None"""
+        with self._lock:
+            stats = self._entries.get(key)
+            if stats is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(stats)  # copie : l'appelant peut modifier son dict
+
+    def put(self, key, stats):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = dict(stats)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Partagés par tout le processus (DBManager incrémente, app.py lit)
+DATA_VERSIONS = DataVersions()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de statistiques par lot : tous les employés d'une période en une passe NumPy.
+
+calculate_statistics (app.py) reste l'implémentation de référence : ce moteur
+doit donner exactement les mêmes résultats, y compris ses particularités :
+
+- les valeurs (dates, heures, minutes) sont converties une seule fois par valeur
+  distincte, avec les mêmes règles (strptime '%Y-%m-%d' / '%H:%M', int(float(...))) ;
+- une date illisible n'a pas de planning et reprend le jour de semaine de la
+  dernière date lisible de l'employé (si aucune et jour non travaillé, la
+  référence lève une erreur : l'employé lui est alors délégué) ;
+- un jour de repos planifié non travaillé n'est compté ni absent ni weekend,
+  sauf le dimanche (weekend) ;
+- un planning individuel mal formé (clé manquante) n'a pas de repli sur le
+  planning de la fonction.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from planning_resolver import PlanningResolver, hm_to_minutes as _hm
+
+# Au-delà, les minutes ne sont plus représentables exactement : employé délégué à la référence
+_MAX_MINUTES = 2 ** 40
+
+
+def _parse_date(value):
+    """(jour de semaine, lundi 'YYYY-MM-DD') ou (-1, None) si la date est illisible"""
+    try:
+        date_obj = datetime.strptime(value[:10], '%Y-%m-%d')
+    except Exception:
+        return -1, None
+    return date_obj.weekday(), (date_obj - timedelta(days=date_obj.weekday())).strftime('%Y-%m-%d')
+
+
+def _parse_minutes(val):
+    minutes = 0
+    try:
+        if val != '-' and val != 'nan':
+            minutes = int(float(val))
+    except:
+        minutes = 0
+    return minutes
+
+
+def _check_in_facts(value):
+    """(a pointé, heure d'arrivée en minutes ou -1)"""
+    has_clocked_in = (value != '-' and value != 'nan' and value != 'None' and value.strip() != '')
+    return has_clocked_in, _hm(value.strip()[:5])
+
+
+def _object_array(values):
+    # np.fromiter : jamais de tableau 2D, même si les valeurs sont des listes
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+def _factorize_strings(values):
+    codes, uniques = pd.factorize(_object_array(values), use_na_sentinel=False)
+    return codes, list(uniques)
+
+
+def _minutes_column(values):
+    """Minutes travaillées par jour (int64) et indicateur de valeur hors limites"""
+    try:
+        codes, uniques = pd.factorize(_object_array(values), use_na_sentinel=False)
+    except TypeError:
+        # Valeurs non hachables : conversion une par une
+        parsed = [_parse_minutes(v) for v in values]
+        exotic = np.array([abs(m) >= _MAX_MINUTES for m in parsed], dtype=bool)
+        return np.array([0 if e else m for m, e in zip(parsed, exotic)], dtype=np.int64), exotic
+    parsed = [_parse_minutes(v) for v in uniques]
+    exotic_u = np.array([abs(m) >= _MAX_MINUTES for m in parsed], dtype=bool)
+    minutes_u = np.array([0 if e else m for m, e in zip(parsed, exotic_u)], dtype=np.int64)
+    return minutes_u[codes], exotic_u[codes]
+
+
+def compute_statistics_batch(employees, context, fallback):
+    """Statistiques de chaque employé (liste dans le même ordre que employees)
+
+    fallback(employee, context=...) est l'implémentation de référence, utilisée
+    pour les rares employés que le calcul par lot ne reproduit pas à l'identique.
+    """
+    employees = list(employees)
+    n_emp = len(employees)
+    delegated = set()
+
+    # 1. Aplatissement : un jour = une position, avec l'index de son employé
+    lengths = np.zeros(n_emp, dtype=np.int64)
+    flat_dates, flat_check_ins, flat_minutes = [], [], []
+    person_ids, departments = [], []
+    for k, emp in enumerate(employees):
+        try:
+            p_id = str(emp['person_id'])
+            dates = emp['dates']
+            check_ins = emp['check_ins']
+            attended = emp['attended_minutes']
+            if 'statuses' not in emp or 'check_outs' not in emp:
+                raise KeyError('statuses')
+            n = len(dates)
+            dates = list(map(str, dates))
+            check_ins = list(map(str, check_ins[:n])) + ['-'] * (n - len(check_ins))
+            attended = list(attended[:n]) + [0] * (n - len(attended))
+        except Exception:
+            delegated.add(k)
+            person_ids.append(None)
+            departments.append(None)
+            continue
+        lengths[k] = n
+        flat_dates.extend(dates)
+        flat_check_ins.extend(check_ins)
+        flat_minutes.extend(attended)
+        person_ids.append(p_id)
+        departments.append(emp.get('department'))
+
+    starts = np.concatenate(([0], np.cumsum(lengths)))
+    emp_idx = np.repeat(np.arange(n_emp), lengths)
+    n_days = len(flat_dates)
+
+    # 2. Dates : jour de semaine et lundi de la semaine, une fois par valeur distincte
+    date_codes, date_uniques = _factorize_strings(flat_dates)
+    parsed = [_parse_date(d) for d in date_uniques]
+    weekday_u = np.array([p[0] for p in parsed] or [0], dtype=np.int64)
+    monday_u = [p[1] for p in parsed]
+    weekday = weekday_u[date_codes] if n_days else np.empty(0, dtype=np.int64)
+    valid = weekday >= 0
+
+    # Date illisible : jour de semaine de la dernière date lisible du même employé
+    positions = np.arange(n_days)
+    last_valid = np.maximum.accumulate(np.where(valid, positions, -1)) if n_days else positions
+    has_previous = last_valid >= starts[emp_idx]
+    effective_weekday = np.where(has_previous, weekday[np.maximum(last_valid, 0)] if n_days else weekday, -1)
+
+    # 3. Pointages et minutes
+    ci_codes, ci_uniques = _factorize_strings(flat_check_ins)
+    ci_facts = [_check_in_facts(v) for v in ci_uniques]
+    clocked = np.array([f[0] for f in ci_facts] or [False], dtype=bool)[ci_codes] if n_days else np.empty(0, dtype=bool)
+    actual = np.array([f[1] for f in ci_facts] or [-1], dtype=np.int64)[ci_codes] if n_days else np.empty(0, dtype=np.int64)
+    minutes, exotic = _minutes_column(flat_minutes) if n_days else (np.empty(0, dtype=np.int64), np.empty(0, dtype=bool))
+
+    # 4. Plannings : par fonction (7 jours) pour la plupart, jour par jour si planning individuel
+    resolver = PlanningResolver.for_context(context)
+    plan_code = np.zeros(n_days, dtype=np.int64)
+    week_tables = np.zeros((n_emp, 7), dtype=np.int64)
+    slow = []
+    for k in range(n_emp):
+        if k in delegated:
+            continue
+        table = resolver.week_codes(person_ids[k], departments[k])
+        if table is None:
+            slow.append(k)
+        else:
+            week_tables[k] = table
+
+    if n_days:
+        plan_code = np.where(valid, week_tables[emp_idx, np.maximum(weekday, 0)], 0)
+    for k in slow:
+        memo = {}
+        p_id, department = person_ids[k], departments[k]
+        for pos in range(starts[k], starts[k + 1]):
+            if not valid[pos]:
+                continue
+            key = (date_codes[pos], weekday[pos])
+            if key not in memo:
+                memo[key] = resolver.code(p_id, monday_u[date_codes[pos]], int(weekday[pos]), department)
+            plan_code[pos] = memo[key]
+
+    is_repos_r, start_r, _, planned_min_r = resolver.arrays()
+    is_repos = is_repos_r[plan_code]
+    late_start = start_r[plan_code]
+    planned_min = planned_min_r[plan_code]
+
+    # 5. Règles de calcul (mêmes branches que calculate_statistics)
+    worked = (minutes > 0) | clocked
+    late_mask = worked & clocked & (late_start >= 0) & (actual >= 0) & (actual > late_start)
+    late_minutes = np.where(late_mask, actual - late_start, 0)
+    ot_mask = worked & (planned_min >= 0) & (minutes > 0)
+    diff_work = np.where(ot_mask, minutes - planned_min, 0)
+    absent = ~worked & ~is_repos & (effective_weekday >= 0) & (effective_weekday < 6)
+    weekend = ~worked & (effective_weekday == 6)
+
+    # Cas que seule la référence sait traiter (erreur ou minutes hors limites)
+    unbound = ~worked & (effective_weekday < 0)
+    for k in np.unique(emp_idx[unbound | exotic]):
+        delegated.add(int(k))
+
+    def per_employee(values):
+        return np.bincount(emp_idx, weights=values, minlength=n_emp)
+
+    total_minutes = per_employee(np.where(worked, minutes, 0))
+    days_worked = per_employee(worked)
+    days_absent = per_employee(absent)
+    weekends = per_employee(weekend)
+    late_total = per_employee(late_minutes)
+    late_count = per_employee(late_mask)
+    overtime = per_employee(np.maximum(diff_work, 0))
+    undertime = per_employee(np.maximum(-diff_work, 0))
+
+    results = []
+    for k, emp in enumerate(employees):
+        if k in delegated:
+            results.append(fallback(emp, context=context))
+            continue
+        total_hours = int(total_minutes[k]) / 60
+        total_days_worked = int(days_worked[k])
+        results.append({
+            'total_days_worked': total_days_worked,
+            'total_days_absent': int(days_absent[k]),
+            'total_hours': round(total_hours, 2),
+            'total_weekends': int(weekends[k]),
+            'total_late_minutes': int(late_total[k]),
+            'count_lates': int(late_count[k]),
+            'total_overtime_minutes': int(overtime[k]),
+            'total_undertime_minutes': int(undertime[k]),
+            'average_hours_per_day': round(total_hours / total_days_worked, 2) if total_days_worked > 0 else 0
+        })
+    return results
+
+
+DAY_CLASSES = ('worked', 'absent', 'rest', 'weekend')
+
+
+def day_facts(rows, context):
+    """Faits d'assiduité jour par jour (table pointage_facts), règles de calculate_statistics
+
+    rows : (person_id, département, date 'YYYY-MM-DD', check_in, minutes) par jour.
+    Retourne dans le même ordre (minutes travaillées, début prévu, fin prévue, retard,
+    heures supp., heures manquantes, classe du jour), ou None si la date est illisible.
+    Début/fin prévus valent None sans horaire planifié. Sommer ces colonnes redonne
+    les statistiques de calculate_statistics sur les mêmes jours.
+    """
+    resolver = PlanningResolver.for_context(context)
+    parsed_dates = {}
+    parsed_check_ins = {}
+    facts = []
+    for p_id, department, day, check_in, minutes in rows:
+        day = str(day)[:10]
+        parsed = parsed_dates.get(day)
+        if parsed is None:
+            parsed = parsed_dates[day] = _parse_date(day)
+        weekday, monday_str = parsed
+        if weekday < 0:
+            facts.append(None)
+            continue
+        check_in = str(check_in)
+        clocked = parsed_check_ins.get(check_in)
+        if clocked is None:
+            clocked = parsed_check_ins[check_in] = _check_in_facts(check_in)
+        has_clocked_in, actual = clocked
+        minutes = _parse_minutes(minutes)
+
+        shift = resolver.shifts[resolver.code(str(p_id), monday_str, weekday, department)]
+        planned_start = shift.start if shift and shift.start >= 0 else None
+        planned_end = shift.end if shift and shift.end >= 0 else None
+
+        late = overtime = undertime = 0
+        if minutes > 0 or has_clocked_in:
+            day_class = 'worked'
+            if planned_start is not None and has_clocked_in and actual > planned_start:
+                late = actual - planned_start
+            if shift and shift.planned_minutes >= 0 and minutes > 0:
+                diff_work = minutes - shift.planned_minutes
+                overtime, undertime = max(diff_work, 0), max(-diff_work, 0)
+            worked_minutes = minutes
+        else:
+            worked_minutes = 0
+            if weekday == 6:
+                day_class = 'weekend'
+            elif shift and shift.is_repos:
+                day_class = 'rest'  # repos planifié en semaine : ni absent ni weekend
+            else:
+                day_class = 'absent'
+        facts.append((worked_minutes, planned_start, planned_end, late, overtime, undertime, day_class))
+    return facts
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test du stockage compact : relecture à l'identique et mêmes statistiques
+"""
+import gc
+import pickle
+import tracemalloc
+
+from app import calculate_statistics, calculate_statistics_batch
+from attendance_store import DAY_FIELDS, PeriodAttendance
+from sqlite_db_manager import SQLiteDBManager
+
+CONTEXT = {
+    'functions': {'MENAGE': {'Lundi': {'debut': '09:00', 'fin': '17:00', 'repos': False}}},
+    'individual': {},
+    'emp_depts': {},
+}
+
+
+def sample_employees():
+    return [
+        {
+            'person_id': 101, 'name': 'HANANE LAGALAOUI', 'department': 'MENAGE',
+            'joining_date': 'N/A', 'position': 'Staff', 'summary': '',
+            'dates': ['2025-12-22', '2025-12-23', '-', '22/12/2025'],
+            'check_ins': ['09:10', '9:05', '-', '09:00:00'],
+            'check_outs': ['17:00', '-', None, '17:00'],
+            'attended_minutes': [470, '480', 0, 480.0],
+            'statuses': ['Normal', 'Normal', '-', 'Absent'],
+        },
+        {
+            'id': 7, 'person_id': '102', 'name': 'MBARK EL ASRI', 'department': 'MENAGE',
+            'joining_date': None, 'position': 'Staff',
+            'dates': ['2025-12-22'], 'check_ins': ['22:00'], 'check_outs': ['06:00'],
+            'attended_minutes': [480], 'statuses': [None],
+        },
+    ]
+
+
+def test_roundtrip():
+    employees = sample_employees()
+    records = PeriodAttendance.from_employees(employees).records()
+    for emp, rec in zip(employees, records):
+        for key in ('dates', 'check_ins', 'check_outs', 'statuses', 'person_id', 'name'):
+            assert rec[key] == emp[key]
+        # Minutes travaillées normalisées en entiers
+        assert rec['attended_minutes'] == [int(float(m)) for m in emp['attended_minutes']]
+        assert calculate_statistics(rec, context=CONTEXT) == calculate_statistics(emp, context=CONTEXT)
+
+    # Les vues se comportent comme des dicts
+    rec = records[0].copy()
+    rec['stats'] = {'total_hours': 1}
+    assert 'stats' in rec and 'stats' not in records[0]
+    assert 'summary' in records[0] and 'summary' not in records[1]
+    assert pickle.loads(pickle.dumps(records[1]))['check_outs'] == ['06:00']
+
+
+def test_days_decoded_once():
+    # Un générateur suffit (lecture en flux depuis la BDD)
+    store = PeriodAttendance.from_employees(emp for emp in sample_employees())
+    calls = []
+    day_values = store.day_values
+    store.day_values = lambda field, index: calls.append(field) or day_values(field, index)
+    rec = store.records()[0]
+
+    # Pendant un traitement, une liste n'est décodée qu'une fois
+    with store.decoded():
+        dates = [rec['dates'][i] for i in range(len(rec['dates']))]
+        assert dates == sample_employees()[0]['dates']
+        assert rec['dates'] is rec['dates'] and calls == ['dates']
+    # Ensuite la vue ne garde rien
+    assert store._decoded is None
+    assert rec['dates'] == dates and calls == ['dates', 'dates']
+
+    # Une valeur affectée remplace la liste décodée
+    rec['dates'] = ['2025-12-24']
+    assert rec['dates'] == ['2025-12-24'] and rec.to_dict()['dates'] == ['2025-12-24']
+
+    try:
+        hash(rec)
+        assert False, "une vue mutable ne doit pas être hashable"
+    except TypeError:
+        pass
+
+
+def _traced():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def test_no_lists_kept_after_stats_and_save():
+    """Après statistiques et sauvegarde (comme à l'upload), les vues restent compactes"""
+    days = [f"2025-12-{d:02d}" for d in range(1, 32)]
+    employees = [{'person_id': 1000 + k, 'name': f"EMP {k}", 'department': 'MENAGE', 'position': 'N/A',
+                  'dates': days, 'check_ins': ['08:10', '-'] * 15 + ['09:30'], 'check_outs': ['16:00'] * 31,
+                  'attended_minutes': [480, 0] * 15 + [450], 'statuses': ['Normal'] * 31}
+                 for k in range(200)]
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    context = db.get_calculation_context()
+    store = PeriodAttendance.from_employees(employees)
+    records = store.records()
+    del employees
+
+    tracemalloc.start()
+    try:
+        start = _traced()
+        lists = [[rec[f] for f in DAY_FIELDS] for rec in records]
+        decoded_size = _traced() - start
+        del lists
+
+        start = _traced()
+        with store.decoded():
+            for rec, stats in zip(records, calculate_statistics_batch(records, context)):
+                rec['stats'] = stats
+            success, _ = db.save_data(records)
+        kept = _traced() - start
+    finally:
+        tracemalloc.stop()
+
+    assert success
+    # Seules les statistiques restent (les cinq listes par employé sont libérées)
+    assert kept < decoded_size / 4, (kept, decoded_size, store.nbytes())
+    assert store._decoded is None
+
+
+if __name__ == "__main__":
+    test_roundtrip()
+    test_days_decoded_once()
+    test_no_lists_kept_after_stats_and_save()
+    print("[OK] Stockage compact")
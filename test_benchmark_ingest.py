@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test des benchmarks : mesure de toutes les étapes sur un petit export (base SQLite embarquée)
+"""
+from attendance_reader import engine_for_file
+from benchmark_ingest import STAGES, compare_reports, run_size
+from generate_attendance_export import generate_export
+
+
+def test_run_size_and_compare(tmp_path):
+    path = tmp_path / "bench.xls"
+    generate_export(str(path), 'html', employees=5, days=7, seed=1)
+    results = run_size(str(path), engine_for_file(str(path)), 5, 'sqlite', with_memory=True)
+    assert [r['stage'] for r in results] == list(STAGES)
+    assert all(r['employees'] == 5 and r['seconds'] > 0 and r['peak_mb'] is not None for r in results)
+
+    baseline = {'results': results}
+    slower = {'results': [dict(r, seconds=r['seconds'] * 2) for r in results]}
+    assert compare_reports(baseline, baseline) == []
+    assert {r[1] for r in compare_reports(baseline, slower)} == set(STAGES)
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_run_size_and_compare(Path(d))
+    print("[OK] Benchmarks")
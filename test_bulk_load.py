@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test du chargement en masse (LOAD DATA LOCAL INFILE rejoué sur la base SQLite embarquée)
+"""
+import copy
+import os
+import random
+
+from backfill_exports import backfill
+from db_manager import DBManager
+from generate_attendance_export import generate_export
+from sqlite_db_manager import SQLiteDBManager
+from test_pointage_facts import check_rollups, facts_totals, python_totals, random_employees, random_week
+
+
+def dump(db):
+    cursor = db.get_connection().cursor()
+    cursor.execute("""
+        SELECT e.person_id, p.date_pointage, p.check_in, p.check_out, p.minutes, p.statut,
+               p.check_in_min, p.check_out_min, p.night_shift
+        FROM pointages p JOIN employes e ON e.id = p.employe_id
+        ORDER BY e.person_id, p.date_pointage
+    """)
+    return cursor.fetchall()
+
+
+def saved(employees, bulk, local_infile=True, delta=False):
+    SQLiteDBManager.reset()
+    DBManager._local_infile_refused.clear()
+    db = SQLiteDBManager(local_infile=local_infile)
+    db.init_planning_table()
+    db.save_function_planning('MENAGE', random_week(random.Random(1)))
+    db.save_data(employees, bulk=bulk)
+    return db
+
+
+def scenario(employees, bulk):
+    """Import complet puis ré-import delta ; retourne les pointages et compteurs de chaque étape"""
+    employees = copy.deepcopy(employees)
+    db = saved(employees, bulk)
+    steps = [(dump(db), db.last_save_counts['load_method'])]
+    assert facts_totals(db) == python_totals(db)
+    check_rollups(db)
+
+    for emp in employees[:5]:
+        emp['attended_minutes'] = [600] * len(emp['dates'])
+    db.save_data(employees, delta=True, bulk=bulk)
+    steps.append((dump(db), db.last_save_counts['updated']))
+    assert facts_totals(db) == python_totals(db)
+    return steps
+
+
+def test_bulk_matches_executemany():
+    employees = random_employees(random.Random(9), 25)
+    # Valeurs à échapper dans le TSV, et une même date deux fois (la dernière l'emporte)
+    employees[0]['check_outs'][0] = 'a\tb\\N\nc'
+    employees[0]['statuses'][1] = None
+    employees[1]['statuses'][0] = 'Congé \\ é'
+    employees[2]['dates'].append(employees[2]['dates'][0])
+    for key, value in (('check_ins', '07:45'), ('check_outs', '15:00'), ('attended_minutes', 435), ('statuses', 'Normal')):
+        employees[2][key].append(value)
+
+    reference = scenario(employees, bulk=False)
+    bulk = scenario(employees, bulk=True)
+    assert [step[0] for step in bulk] == [step[0] for step in reference]
+    assert reference[0][1] == 'executemany' and bulk[0][1] == 'load_data'
+    assert bulk[1][1] == reference[1][1] > 0
+    assert ('a\tb\\N\nc',) in {(row[3],) for row in bulk[0][0]}
+    assert not [f for f in os.listdir(DBManager.BULK_DIR) if f.endswith('.tsv')]
+
+
+def test_fallback_when_local_infile_disabled():
+    employees = random_employees(random.Random(4), 10)
+    expected = dump(saved(employees, bulk=False))
+    db = saved(employees, bulk=True, local_infile=False)
+    assert db.last_load_method == 'executemany'
+    assert dump(db) == expected
+    assert len(DBManager._local_infile_refused) == 1  # plus de tentative pour ce serveur
+    DBManager._local_infile_refused.clear()
+
+
+def test_backfill_cli(tmp_path):
+    paths = []
+    for seed in (1, 2):
+        path = tmp_path / f"export_{seed}.xls"
+        generate_export(str(path), 'html', employees=8, days=7, seed=seed)
+        paths.append(str(path))
+    paths.append(str(tmp_path / "absent.xls"))
+    SQLiteDBManager.reset()
+    DBManager._local_infile_refused.clear()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    results = backfill(paths, db)
+    assert [success for _, success, _ in results] == [True, True, False]
+    assert db.last_save_counts['load_method'] == 'load_data' and dump(db)
+    assert facts_totals(db) == python_totals(db)
+
+
+def test_bulk_dir_created_lazily(tmp_path):
+    saved_dir = DBManager.BULK_DIR
+    DBManager.BULK_DIR = str(tmp_path / "bulk")
+    try:
+        db = saved(random_employees(random.Random(6), 3), bulk=False)
+        assert not os.path.exists(DBManager.BULK_DIR)  # pas de dossier créé à chaque DBManager()
+        db.save_data(random_employees(random.Random(6), 3), bulk=True)
+        assert db.last_load_method == 'load_data' and os.listdir(DBManager.BULK_DIR) == []
+    finally:
+        DBManager.BULK_DIR = saved_dir
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_bulk_matches_executemany()
+    test_fallback_when_local_infile_disabled()
+    with tempfile.TemporaryDirectory() as d:
+        test_backfill_cli(Path(d))
+        test_bulk_dir_created_lazily(Path(d))
+    print("[OK] Chargement en masse identique à executemany")
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test du pool de connexions (connexions factices, sans serveur MySQL)
+"""
+import threading
+import time
+
+from mysql.connector.errors import PoolError
+
+import db_pool
+from db_pool import ConnectionPool, get_pool
+from sqlite_db_manager import SQLiteDBManager, _Connection
+
+
+class FakeConnection:
+    opened = 0
+
+    def __init__(self):
+        FakeConnection.opened += 1
+        self.alive = True
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.fail_rollback = False
+
+    def is_connected(self):
+        return self.alive
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise RuntimeError("Unread result found")
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_reuse_and_liveness():
+    FakeConnection.opened = 0
+    pool = ConnectionPool(FakeConnection, size=2, timeout=0.2)
+    conn = pool.get_connection()
+    raw = conn._conn
+    conn.close()
+    conn.close()  # sans effet
+    for _ in range(5):
+        conn = pool.get_connection()
+        assert conn._conn is raw and conn.is_connected()
+        conn.close()
+    assert FakeConnection.opened == 1 and pool.stats()['checkouts'] == 6
+
+    # Connexion coupée par le serveur : remplacée à l'emprunt
+    raw.alive = False
+    conn = pool.get_connection()
+    assert conn._conn is not raw and raw.closed
+    conn.close()
+    assert pool.stats()['discarded'] == 1 and pool.stats()['open'] == 1
+
+    # Transaction non validée : annulée au retour ; annulation impossible : connexion jetée
+    conn = pool.get_connection()
+    conn._conn.in_transaction = True
+    conn.close()
+    assert pool.stats()['idle'] == 1
+    conn = pool.get_connection()
+    assert conn.rollbacks == 1
+    conn.in_transaction = True
+    conn.fail_rollback = True
+    conn.close()
+    assert pool.stats()['open'] == 0
+
+    try:
+        conn.cursor()
+        assert False, "connexion rendue encore utilisable"
+    except PoolError:
+        pass
+
+
+def test_size_limit_and_wait():
+    pool = ConnectionPool(FakeConnection, size=2, timeout=0.2)
+    first, second = pool.get_connection(), pool.get_connection()
+    assert pool.stats()['in_use'] == 2
+    try:
+        pool.get_connection()
+        assert False, "le pool aurait dû être épuisé"
+    except PoolError:
+        pass
+    assert pool.stats()['timeouts'] == 1
+
+    # Un emprunt en attente reçoit la connexion rendue par un autre thread
+    pool.timeout = 5
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.get_connection()))
+    waiter.start()
+    time.sleep(0.05)
+    first.close()
+    waiter.join(2)
+    assert got and got[0]._conn is not None
+    stats = pool.stats()
+    assert stats['waits'] == 2 and stats['wait_time_total'] > 0 and stats['in_use'] == 2
+
+    # Connexion oubliée sans close() : sa place est libérée
+    del got[:]
+    assert pool.get_connection() is not None
+    second.close()
+
+
+def test_pool_per_process():
+    db_pool._POOLS.clear()
+    key = ('host', 3306, 'user', 'base')
+    pool = get_pool(key, FakeConnection, 3, 1)
+    assert get_pool(key, FakeConnection, 3, 1) is pool
+    pool.pid = -1  # comme après un fork
+    assert get_pool(key, FakeConnection, 3, 1) is not pool
+    assert [s['database'] for s in db_pool.pool_stats()] == ['base']
+    db_pool._POOLS.clear()
+
+
+class PooledSQLiteDBManager(SQLiteDBManager):
+    """Base SQLite derrière un pool de taille 1 : une connexion gardée pendant un emprunt imbriqué bloque"""
+    def __init__(self, pool):
+        super().__init__()
+        self.pool = pool
+
+    def get_connection(self):
+        return self.pool.get_connection()
+
+
+def test_planning_save_with_single_connection():
+    SQLiteDBManager.reset()
+    pool = ConnectionPool(None, size=1, timeout=0.2)
+    db = PooledSQLiteDBManager(pool)
+    pool.connect = lambda: _Connection(db._sqlite)
+    db.init_planning_table()
+    db.save_data([{'person_id': 1, 'name': 'A', 'department': 'SPA', 'position': 'N/A', 'dates': ['2025-12-01'],
+                   'check_ins': ['09:20'], 'check_outs': ['17:00'], 'attended_minutes': [460], 'statuses': ['Normal']}])
+    week = {d: {'debut': '09:00', 'fin': '17:00', 'repos': False}
+            for d in ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']}
+    assert db.save_function_planning('SPA', week)
+    assert db.last_refreshed_weeks == 1
+    assert db.save_weekly_planning('1', '2025-12-01', dict(week, Lundi={'debut': '08:00', 'fin': '16:00', 'repos': False}))
+    assert db.last_refreshed_weeks == 1
+    assert pool.stats()['timeouts'] == 0 and pool.stats()['in_use'] == 0
+    SQLiteDBManager.reset()
+
+
+if __name__ == "__main__":
+    test_reuse_and_liveness()
+    test_size_limit_and_wait()
+    test_pool_per_process()
+    test_planning_save_with_single_connection()
+    print("[OK] Pool de connexions")
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test du générateur d'exports synthétiques (reproductible et lisible par le parser)
+"""
+import sys
+
+from app import app, parse_attendance_data
+from attendance_reader import detect_format
+from generate_attendance_export import generate_export
+
+
+def test_generated_export_is_reproducible(tmp_path):
+    params = dict(employees=30, days=14, departments=3, missing_rate=0.1, night_rate=0.5, seed=7)
+    first, second = tmp_path / "a.xls", tmp_path / "b.xls"
+    generate_export(str(first), 'html', **params)
+    generate_export(str(second), 'html', **params)
+    assert first.read_bytes() == second.read_bytes()
+
+    saved_folder = app.config['PARSE_CACHE_FOLDER']
+    app.config['PARSE_CACHE_FOLDER'] = str(tmp_path / "parse_cache")  # pas de cache écrit dans le dépôt
+    try:
+        employees = parse_attendance_data(str(first), 'xlrd')
+    finally:
+        app.config['PARSE_CACHE_FOLDER'] = saved_folder
+    assert len(employees) == 30
+    assert len({e['department'] for e in employees}) <= 3
+    assert all(len(e['dates']) >= 14 for e in employees)
+    assert any(c.startswith('2') for e in employees for c in e['check_ins'])  # horaires de nuit (22:xx)
+
+
+def test_real_xls_is_read_by_xlrd(tmp_path):
+    import xlrd
+    path = tmp_path / "vrai.xls"
+    total = generate_export(str(path), 'xls', employees=5, days=7, departments=2, seed=3)
+    assert detect_format(str(path)) == 'xls'
+    assert 0 < xlrd.open_workbook(str(path)).sheet_by_index(0).nrows <= total  # lignes vides finales non écrites
+
+    saved_folder = app.config['PARSE_CACHE_FOLDER']
+    app.config['PARSE_CACHE_FOLDER'] = str(tmp_path / "parse_cache")
+    try:
+        employees = parse_attendance_data(str(path), 'xlrd')
+    finally:
+        app.config['PARSE_CACHE_FOLDER'] = saved_folder
+    assert len(employees) == 5
+    assert all(len(e['dates']) >= 7 for e in employees)
+
+
+def test_xls_without_xlwt_is_an_error(tmp_path):
+    path = tmp_path / "sans_xlwt.xls"
+    saved = sys.modules.get('xlwt')
+    sys.modules['xlwt'] = None  # import xlwt -> ImportError
+    try:
+        generate_export(str(path), 'xls', employees=3, days=7)
+        assert False, "un .xls ne doit pas être écrit sans xlwt"
+    except RuntimeError as e:
+        assert 'xlwt' in str(e)
+    finally:
+        if saved is None:
+            sys.modules.pop('xlwt', None)
+        else:
+            sys.modules['xlwt'] = saved
+    assert not path.exists()
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_generated_export_is_reproducible(Path(d))
+        test_real_xls_is_read_by_xlrd(Path(d))
+        test_xls_without_xlwt_is_an_error(Path(d))
+    print("[OK] Générateur d'exports")
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test du cache de parsing (clé SHA-256, relecture, éviction par taille)
+"""
+import os
+import time
+
+from parse_cache import ParseCache
+
+
+def test_roundtrip_and_eviction(tmp_path):
+    export = tmp_path / "export.xls"
+    export.write_bytes(b"<table><tr><td>Person ID</td></tr></table>")
+    cache = ParseCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+
+    key = cache.key_for(str(export), 'xlrd', 'vectorized')
+    assert cache.get(key) is None
+    employees = [{'person_id': 101, 'dates': ['2025-12-22'] * 31, 'check_ins': ['09:00'] * 31}]
+    cache.put(key, employees)
+    assert cache.get(key) == employees
+
+    # Même contenu sous un autre nom -> même clé
+    copy = tmp_path / "copie.xls"
+    copy.write_bytes(export.read_bytes())
+    assert cache.key_for(str(copy), 'xlrd', 'vectorized') == key
+
+    # Éviction : la plus ancienne entrée part en premier
+    old_path = os.path.join(cache.folder, key + '.pkl.z')
+    os.utime(old_path, (time.time() - 100, time.time() - 100))
+    cache.max_bytes = os.path.getsize(old_path) + 1
+    cache.put('autre', employees)
+    assert cache.get(key) is None
+    assert cache.get('autre') == employees
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_roundtrip_and_eviction(Path(d))
+    print("[OK] Cache de parsing")
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test : le parser vectorisé et la lecture en flux doivent produire exactement la même chose que l'ancien parser
+"""
+import io
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+
+import app as app_module
+from app import _extract_employees_legacy, _extract_employees_vectorized, app, parse_attendance_data
+from attendance_reader import detect_format, iter_attendance_records
+from generate_attendance_export import generate_export
+from sqlite_db_manager import SQLiteDBManager
+
+
+def build_sheet():
+    """Petit export pointeuse avec les cas limites connus (libellés répétés, cellules vides, '-')"""
+    rows = [
+        ["From: 2025-12-22 To: 2025-12-28", None, None, None, None, None, None, None],
+        [None] * 8,
+        ["Date", "ignoré avant le premier employé", None, None, None, None, None, None],
+        ["Person ID", 101, "Employee Name", None, None, "HANANE LAGALAOUI", None, None],
+        ["Date", "2025-12-22", "2025-12-23", "-", None, "2025-12-26", None, None],
+        ["Check-in1", "08:55", None, "-", "09:00", "09:10", None, None],
+        ["Check-out1", "17:05", "17:00", None, "-", "17:00", None, None],
+        ["Attended", 485, "-", None, 480.0, "470", None, None],
+        ["Status", "Normal", "Absent", None, "Normal", "Normal", None, None],
+        ["Summary", "Résumé", None, None, None, None, None, None],
+        ["Person ID", None, "Department", None, None, "MENAGE", "Position", None],
+        ["  date ", "x", "y", None, None, None, None, None],
+        ["Attended Time", 1, 2, 3, None, None, None, None],
+        ["Attended", 4, None, "-", None, None, None, None],
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_vectorized_matches_legacy():
+    df = build_sheet()
+    legacy = _extract_employees_legacy(df)
+    vectorized = _extract_employees_vectorized(df)
+    assert len(legacy) == 2
+    assert vectorized == legacy
+
+
+def test_vectorized_without_employee():
+    df = pd.DataFrame([["From: 2025-12-22 To: 2025-12-28"], ["Date"]])
+    assert _extract_employees_vectorized(df) == _extract_employees_legacy(df) == []
+
+
+def test_streaming_matches_dataframe(tmp_path):
+    """La lecture en flux (openpyxl et faux .xls HTML) donne les mêmes employés"""
+    saved_folder = app.config['PARSE_CACHE_FOLDER']
+    app.config['PARSE_CACHE_FOLDER'] = str(tmp_path / "parse_cache")  # pas de cache écrit dans le dépôt
+    try:
+        df = build_sheet()
+        xlsx = tmp_path / "export.xlsx"
+        df.to_excel(xlsx, index=False, header=False)
+        assert list(iter_attendance_records(str(xlsx), 'openpyxl')) == parse_attendance_data(str(xlsx), 'openpyxl')
+
+        # Faux .xls HTML : référence indépendante du lecteur en flux (arbre complet pd.read_html)
+        fake_xls = tmp_path / "export.xls"
+        fake_xls.write_text(pd.read_excel(xlsx, header=None).to_html(header=False, index=False, na_rep=''), encoding='utf-8')
+        expected = _extract_employees_vectorized(pd.read_html(str(fake_xls), header=None)[0])
+        assert expected and list(iter_attendance_records(str(fake_xls), 'xlrd')) == expected
+        assert parse_attendance_data(str(fake_xls), 'xlrd') == expected
+    finally:
+        app.config['PARSE_CACHE_FOLDER'] = saved_folder
+
+
+def test_detect_format(tmp_path):
+    """Le format est reconnu sur les premiers octets, quelle que soit l'extension"""
+    df = build_sheet()
+    xlsx = tmp_path / "export.xls"  # vrai xlsx avec une mauvaise extension
+    df.to_excel(xlsx, index=False, header=False, engine='openpyxl')
+    html = tmp_path / "html.xls"
+    html.write_bytes(b"\xef\xbb\xbf  <html><body><table><tr><td>Person ID</td></tr></table></body></html>")
+    ole2 = tmp_path / "vrai.xls"
+    ole2.write_bytes(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\x00" * 504)
+    text = tmp_path / "export.txt"
+    text.write_text("Person ID;101\nDate;2025-12-22\n", encoding='utf-8')
+    notes = tmp_path / "notes.xls"
+    notes.write_text("Compte rendu de réunion, sans rapport avec la pointeuse\n", encoding='utf-8')
+
+    assert detect_format(str(xlsx)) == 'xlsx'
+    assert detect_format(str(html)) == 'html'
+    assert detect_format(str(ole2)) == 'xls'
+    assert detect_format(str(text)) == 'csv'
+    assert detect_format(str(notes)) is None
+
+
+def test_load_sources_shared_pool(tmp_path):
+    """Plusieurs imports multi-fichiers réutilisent le même pool de processus de parsing"""
+    saved = app.config['PARSE_WORKERS'], app.config['PARSE_CACHE_MAX_BYTES']
+    app.config['PARSE_WORKERS'], app.config['PARSE_CACHE_MAX_BYTES'] = 2, 0
+    try:
+        sources = []
+        for seed in (1, 2):
+            path = tmp_path / f"export_{seed}.xls"
+            generate_export(str(path), 'html', employees=5, days=7, seed=seed)
+            sources.append((str(path), 'xlrd'))
+        expected = app_module.merge_employees([parse_attendance_data(*source) for source in sources])
+        assert app_module.load_sources(sources) == expected
+        pool = app_module.PARSE_EXECUTOR
+        assert pool is not None and app_module.load_sources(sources) == expected
+        assert app_module.PARSE_EXECUTOR is pool
+    finally:
+        app.config['PARSE_WORKERS'], app.config['PARSE_CACHE_MAX_BYTES'] = saved
+        if app_module.PARSE_EXECUTOR is not None:
+            app_module.PARSE_EXECUTOR.shutdown()
+            app_module.PARSE_EXECUTOR = None
+
+
+def test_zip_limits(tmp_path):
+    """Une archive trop grosse une fois décompressée (ou avec trop d'exports) est refusée sans rien laisser"""
+    export = tmp_path / "export.xls"
+    generate_export(str(export), 'html', employees=3, days=7)
+    size = export.stat().st_size
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for k in range(3):
+            zf.write(export, f"site_{k}.xls")
+    upload_folder = tmp_path / "uploads"
+    upload_folder.mkdir()
+
+    saved = {k: app.config[k] for k in ('UPLOAD_FOLDER', 'ZIP_MAX_MEMBERS', 'ZIP_MAX_BYTES')}
+    try:
+        app.config['UPLOAD_FOLDER'] = str(upload_folder)
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['logged_in'] = True
+        for members, max_bytes in ((2, 10 * size), (10, 2 * size + size // 2)):
+            app.config['ZIP_MAX_MEMBERS'], app.config['ZIP_MAX_BYTES'] = members, max_bytes
+            response = client.post('/upload', data={'file': (io.BytesIO(archive.getvalue()), 'sites.zip')},
+                                   content_type='multipart/form-data')
+            assert response.status_code == 413, response.data
+            assert list(upload_folder.iterdir()) == []  # ni l'archive ni les exports déjà extraits
+
+        app.config['ZIP_MAX_MEMBERS'], app.config['ZIP_MAX_BYTES'] = 3, 3 * size
+        zip_path = upload_folder / "sites.zip"
+        zip_path.write_bytes(archive.getvalue())
+        assert len(app_module._extract_zip(str(zip_path), 'ok')) == 3
+    finally:
+        app.config.update(saved)
+
+
+def test_streaming_upload_shows_imported_period(tmp_path):
+    """Après un import en flux, le dashboard s'ouvre sur les dates du fichier, pas sur la période la plus récente"""
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    recent = tmp_path / "recent.xls"
+    generate_export(str(recent), 'html', employees=2, days=5, seed=1, start_date=datetime(2026, 3, 2))
+    db.save_data(parse_attendance_data(str(recent), 'xlrd'))
+
+    export = tmp_path / "novembre.xls"
+    generate_export(str(export), 'html', employees=3, days=7, seed=2, start_date=datetime(2025, 11, 3))
+    upload_folder = tmp_path / "uploads"
+    upload_folder.mkdir()
+    saved = {k: app.config[k] for k in ('UPLOAD_FOLDER', 'INGEST_MODE', 'PARSE_CACHE_FOLDER')}
+    saved_manager = app_module.DBManager
+    try:
+        app_module.DBManager = SQLiteDBManager
+        app.config.update(UPLOAD_FOLDER=str(upload_folder), INGEST_MODE='streaming',
+                          PARSE_CACHE_FOLDER=str(tmp_path / "parse_cache"))
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['logged_in'] = True
+        response = client.post('/upload', data={'file': (io.BytesIO(export.read_bytes()), 'novembre.xls')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 302
+        assert response.headers['Location'] == '/dashboard?start_date=2025-11-03&end_date=2025-11-09'
+        assert client.get(response.headers['Location']).status_code == 200
+    finally:
+        app_module.DBManager = saved_manager
+        app.config.update(saved)
+
+
+if __name__ == "__main__":
+    test_vectorized_matches_legacy()
+    test_vectorized_without_employee()
+    print("[OK] Parser vectorisé identique au parser historique")
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test : le résolveur de plannings doit trouver exactement le planning de la recherche d'origine
+"""
+import random
+from datetime import date, timedelta
+
+from planning_resolver import DAYS_FR, PlanningResolver, lookup_plan
+from test_stats_engine import random_period
+
+
+def test_resolver_matches_lookup():
+    for seed in range(3):
+        employees, context = random_period(random.Random(seed))
+        # Plus un contexte de forme inattendue (recherche d'origine à chaque appel)
+        for ctx in (context, dict(context, individual={'1': ['pas un dict']})):
+            resolver = PlanningResolver(ctx)
+            for emp in employees:
+                p_id = str(emp['person_id'])
+                for monday in ('2025-12-01', '2025-12-08', '2025-12-29'):
+                    for weekday, day_name in enumerate(DAYS_FR):
+                        expected = resolver.code_for(lookup_plan(ctx, p_id, emp['department'], monday, day_name))
+                        assert resolver.code(p_id, monday, weekday, emp['department']) == expected
+
+
+def test_resolve_range():
+    context = {
+        'functions': {'MENAGE': {d: {'debut': '08:00', 'fin': '16:30', 'repos': d == 'Dimanche'} for d in DAYS_FR}},
+        'individual': {'7': {'2025-12-08': {'Mardi': {'debut': '22:00', 'fin': '06:00', 'repos': False}}}},
+        'emp_depts': {},
+    }
+    resolver = PlanningResolver.for_context(context)
+    assert PlanningResolver.for_context(context) is resolver
+
+    shift = resolver.planned(7, '2025-12-09', 'MENAGE')
+    assert (shift.start, shift.end, shift.planned_minutes, shift.debut) == (1320, 360, 480, '22:00')
+    assert resolver.planned(7, date(2025, 12, 2), 'MENAGE').start == 480
+    assert resolver.planned(7, '2025-12-14', 'MENAGE').is_repos
+    assert resolver.planned(7, '2025-12-09', None).start == 1320
+    assert resolver.planned(8, '2025-12-09', None) is None
+
+    days = resolver.resolve_range('7', '2025-12-01', '2025-12-14', 'MENAGE')
+    assert len(days['dates']) == 14
+    for i, day in enumerate(days['dates']):
+        shift = resolver.planned('7', day, 'MENAGE')
+        assert days['start'][i] == shift.start and days['planned_minutes'][i] == shift.planned_minutes
+        assert bool(days['is_repos'][i]) == shift.is_repos
+    assert date.fromisoformat(days['dates'][-1]) - date.fromisoformat(days['dates'][0]) == timedelta(days=13)
+
+
+if __name__ == "__main__":
+    test_resolver_matches_lookup()
+    test_resolve_range()
+    print("[OK] Résolveur de plannings identique à la recherche d'origine")
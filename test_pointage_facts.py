@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test de pointage_facts et des tables d'agrégats : les faits journaliers sommés redonnent calculate_statistics (base SQLite embarquée)
+"""
+import random
+
+import mysql.connector
+
+from app import calculate_statistics
+from sqlite_db_manager import SQLiteDBManager
+
+DAYS = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+
+
+def random_week(rng):
+    return {d: {'debut': rng.choice(['08:00', '09:00', '22:00']), 'fin': rng.choice(['16:00', '17:30', '06:00']),
+                'repos': rng.random() < 0.2} for d in DAYS}
+
+
+def random_employees(rng, n=30):
+    employees = []
+    for k in range(n):
+        days = [f"2025-12-{d:02d}" for d in range(1, 32) if rng.random() < 0.8]
+        employees.append({
+            'person_id': 100 + k, 'name': f"EMP {k}", 'department': rng.choice(['MENAGE', 'CUISINE', 'SPA']),
+            'position': 'N/A', 'dates': days,
+            'check_ins': [rng.choice(['08:10', '09:30', '-', '22:15', '']) for _ in days],
+            'check_outs': [rng.choice(['16:00', '-']) for _ in days],
+            'attended_minutes': [rng.choice([0, 0, 450, 480, 520]) for _ in days],
+            'statuses': ['Normal'] * len(days),
+        })
+    return employees
+
+
+def facts_totals(db):
+    """Totaux par employé calculés en SQL sur pointage_facts"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT e.person_id, SUM(f.worked_minutes), SUM(f.day_class = 'worked'), SUM(f.day_class = 'absent'),
+               SUM(f.day_class = 'weekend'), SUM(f.late_minutes), SUM(f.late_minutes > 0),
+               SUM(f.overtime_minutes), SUM(f.undertime_minutes)
+        FROM pointage_facts f JOIN employes e ON e.id = f.employe_id
+        GROUP BY e.person_id
+    """)
+    return {pid: tuple(int(v) for v in values) for pid, *values in cursor.fetchall()}
+
+
+def python_totals(db):
+    context = db.get_calculation_context()
+    totals = {}
+    for emp in db.get_all_employees_with_detailed_data_filtered():
+        s = calculate_statistics(emp, context=context)
+        totals[str(emp['person_id'])] = (round(s['total_hours'] * 60), s['total_days_worked'], s['total_days_absent'],
+                                         s['total_weekends'], s['total_late_minutes'], s['count_lates'],
+                                         s['total_overtime_minutes'], s['total_undertime_minutes'])
+    return totals
+
+
+def test_facts_match_statistics():
+    rng = random.Random(3)
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    db.save_function_planning('MENAGE', random_week(rng))
+    employees = random_employees(rng)
+    db.save_data(employees)
+    assert facts_totals(db) == python_totals(db)
+
+    # Changements de planning : faits rafraîchis
+    db.save_function_planning('CUISINE', random_week(rng))
+    db.save_weekly_planning('101', '2025-12-08', random_week(rng))
+    assert facts_totals(db) == python_totals(db)
+
+    # Ré-import en mode delta (une partie des jours modifiés, un changement de département)
+    for emp in employees[:10]:
+        emp['attended_minutes'] = [rng.choice([0, 480, 600]) for _ in emp['dates']]
+    employees[0]['department'] = 'CUISINE'
+    db.save_data(employees, delta=True)
+    assert facts_totals(db) == python_totals(db)
+
+    # Remplissage initial (table vidée, comme avant la migration)
+    conn = db.get_connection()
+    conn.cursor().execute("DELETE FROM pointage_facts")
+    conn.commit()
+    db.init_planning_table()
+    assert facts_totals(db) == python_totals(db)
+
+
+def test_period_statistics_match():
+    rng = random.Random(5)
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    db.save_function_planning('SPA', random_week(rng))
+    db.save_data(random_employees(rng))
+    context = db.get_calculation_context()
+    for filters in ({'year': 2025, 'month': 12}, {'start_date': '2025-12-08', 'end_date': '2025-12-14'}, {}):
+        expected = [(str(e['person_id']), calculate_statistics(e, context=context))
+                    for e in db.get_all_employees_with_detailed_data_filtered(**filters)]
+        rows = db.get_period_statistics(**filters)
+        assert [(str(r['person_id']), r['stats']) for r in rows] == expected
+    assert db.get_period_statistics(year=2024, month=1) == []
+
+
+PERIODS = {
+    'week': ['2025-11-24', '2025-12-01', '2025-12-08', '2025-12-15', '2025-12-22', '2025-12-29',
+             '2026-01-05', '2026-01-12', '2026-01-19', '2026-01-26'],
+    'month': ['2025-11-01', '2025-12-01', '2026-01-01'],
+}
+
+
+def totals_of(stats):
+    return (round(stats['total_hours'] * 60), stats['total_days_worked'], stats['total_days_absent'],
+            stats['total_weekends'], stats['total_late_minutes'], stats['count_lates'],
+            stats['total_overtime_minutes'], stats['total_undertime_minutes'])
+
+
+def rollups_expected(db, grain):
+    """calculate_statistics période par période : par employé, puis sommé par département"""
+    context = db.get_calculation_context()
+    bounds = db.week_bounds if grain == 'week' else db.month_bounds
+    employees, departments = {}, {}
+    for period in PERIODS[grain]:
+        start_date, end_date = bounds(period)
+        for emp in db.get_all_employees_with_detailed_data_filtered(start_date=start_date, end_date=end_date):
+            stats = calculate_statistics(emp, context=context)
+            employees[(str(emp['person_id']), period)] = stats
+            dept = departments.setdefault((emp['department'], period), [0] * 9)
+            for k, value in enumerate((1,) + totals_of(stats)):
+                dept[k] += value
+    return employees, {key: tuple(values) for key, values in departments.items()}
+
+
+def rollups_store(db, grain):
+    employees = {(str(r['person_id']), r['period']): r['stats'] for r in db.get_rollups('employee', grain)}
+    departments = {(r['department'], r['period']): (r['employees'],) + totals_of(r['stats'])
+                   for r in db.get_rollups('department', grain)}
+    return employees, departments
+
+
+def check_rollups(db):
+    for grain in PERIODS:
+        assert rollups_store(db, grain) == rollups_expected(db, grain)
+
+
+def test_rollups_match():
+    rng = random.Random(7)
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    db.save_function_planning('CUISINE', random_week(rng))
+    employees = random_employees(rng)
+    for emp in employees[20:]:  # à cheval sur deux mois
+        emp['dates'] = sorted(d.replace('2025-12-1', '2026-01-1') for d in emp['dates'])
+    db.save_data(employees)
+    check_rollups(db)
+    assert rollups_store(db, 'month')[1][('CUISINE', '2026-01-01')]
+
+    # Planning individuel : une seule semaine d'un seul employé recalculée
+    before = rollups_store(db, 'week')[0]
+    db.save_weekly_planning('104', '2025-12-15', random_week(rng))
+    assert db.last_refreshed_weeks == 1
+    after = rollups_store(db, 'week')[0]
+    assert {k: v for k, v in after.items() if k != ('104', '2025-12-15')} == \
+        {k: v for k, v in before.items() if k != ('104', '2025-12-15')}
+    check_rollups(db)
+
+    # Planning de fonction, ré-import delta avec changements de département
+    db.save_function_planning('SPA', random_week(rng))
+    for emp in employees[5:15]:
+        emp['attended_minutes'] = [rng.choice([0, 300, 480]) for _ in emp['dates']]
+    employees[6]['department'] = 'SPA'
+    for emp in employees:  # un département entièrement vidé
+        if emp['department'] == 'MENAGE':
+            emp['department'] = 'CUISINE'
+    db.save_data(employees, delta=True)
+    check_rollups(db)
+    assert not [r for r in db.get_rollups('department', 'month') if r['department'] == 'MENAGE']
+    assert db.get_weekly_statistics(['104'], '2025-12-15', '2025-12-21')[0]['stats'] == after[('104', '2025-12-15')]
+    assert [r['period'] for r in db.get_rollups('employee', 'month', ['120'], '2025-12-31', '2026-01-01')] == \
+        [r['period'] for r in db.get_rollups('employee', 'month', ['120'])]
+
+    # Remplissage initial des tables (faits déjà présents)
+    conn = db.get_connection()
+    for table in ('stats_semaine_employe', 'stats_mois_employe', 'stats_semaine_departement', 'stats_mois_departement'):
+        conn.cursor().execute("DELETE FROM " + table)
+    conn.commit()
+    db.init_planning_table()
+    check_rollups(db)
+
+
+def test_batched_employee_upsert():
+    rng = random.Random(11)
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    db.EMPLOYEE_BATCH = 7  # plusieurs lots, dont un incomplet
+    db.save_function_planning('SPA', random_week(rng))
+    employees = random_employees(rng, 20)
+    moved = dict(employees[3], department='SPA' if employees[3]['department'] != 'SPA' else 'MENAGE', name='EMP 3 bis')
+    db.save_data(iter(employees + [moved]))  # générateur, même person_id deux fois dans un lot
+
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT person_id, nom, departement FROM employes ORDER BY id")
+    rows = cursor.fetchall()
+    assert len(rows) == 20 and rows[3] == ('103', 'EMP 3 bis', moved['department'])
+    assert facts_totals(db) == python_totals(db)
+
+    # Ré-import : date d'embauche conservée, départements mis à jour
+    employees[5]['department'] = 'SPA' if employees[5]['department'] != 'SPA' else 'CUISINE'
+    employees[5]['joining_date'] = '2020-01-01'
+    db.save_data(employees[:10])
+    cursor.execute("SELECT departement, date_embauche FROM employes WHERE person_id = '105'")
+    assert cursor.fetchone() == (employees[5]['department'], 'N/A')
+    assert facts_totals(db) == python_totals(db)
+    check_rollups(db)
+
+
+def detailed_per_employee(db, year=None, month=None, start_date=None, end_date=None):
+    """Ancien chargement (une requête de pointages par employé), pour comparaison"""
+    cursor = db.get_connection().cursor(dictionary=True)
+    cursor.execute("SELECT id, person_id, nom as name, departement as department, poste as position, date_embauche as joining_date FROM employes ORDER BY id")
+    employees = cursor.fetchall()
+    for emp in employees:
+        # Anciens prédicats (BETWEEN, YEAR()/MONTH()) : référence indépendante de _period_filter
+        where, params = " WHERE employe_id = %s", [emp['id']]
+        if start_date and end_date:
+            where, params = where + " AND date_pointage BETWEEN %s AND %s", params + [start_date, end_date]
+        elif year and month:
+            where, params = where + " AND YEAR(date_pointage) = %s AND MONTH(date_pointage) = %s", params + [int(year), int(month)]
+        cursor.execute("SELECT date_pointage, check_in, check_out, minutes, statut FROM pointages"
+                       + where + " ORDER BY date_pointage", params)
+        pointages = cursor.fetchall()
+        emp['dates'] = [str(p['date_pointage']) for p in pointages]
+        emp['check_ins'] = [p['check_in'] for p in pointages]
+        emp['check_outs'] = [p['check_out'] for p in pointages]
+        emp['attended_minutes'] = [p['minutes'] for p in pointages]
+        emp['statuses'] = [p['statut'] for p in pointages]
+    return [e for e in employees if e['dates']]
+
+
+def test_detailed_loader_single_query():
+    rng = random.Random(13)
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    employees = random_employees(rng, 15)
+    for emp in employees[::4]:  # quelques pointages en janvier
+        for key, value in (('dates', '2026-01-02'), ('check_ins', '08:00'), ('check_outs', '16:00'),
+                           ('attended_minutes', 480), ('statuses', None)):
+            emp[key].append(value)
+    employees[7]['dates'] = employees[7]['dates'][:1]
+    db.save_data(employees)
+    # Employé sans aucun pointage : absent du résultat
+    cursor = db.get_connection().cursor()
+    cursor.execute("INSERT INTO employes (person_id, nom, departement, poste) VALUES ('999', 'SANS POINTAGE', 'SPA', 'N/A')")
+
+    for filters in ({}, {'year': 2025, 'month': 12}, {'year': '2026', 'month': '1'},
+                    {'start_date': '2025-12-30', 'end_date': '2026-01-02'}, {'year': 2024, 'month': 1}):
+        expected = detailed_per_employee(db, **filters)
+        assert db.get_all_employees_with_detailed_data_filtered(**filters) == expected
+    assert len(detailed_per_employee(db, year=2026, month=1)) == 4
+
+
+def test_periods_catalog():
+    rng = random.Random(17)
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    assert db.get_available_periods() == []
+    employees = random_employees(rng, 5)
+    db.save_data(employees)
+    assert db.get_available_periods() == [{'year': 2025, 'month': 12}]
+
+    # Nouveaux mois (dont un ré-import delta) : ajoutés au catalogue, sans doublon
+    emp = dict(employees[0], dates=['2026-01-01', '2026-02-28'], check_ins=['08:00'] * 2,
+               check_outs=['16:00'] * 2, attended_minutes=[480] * 2, statuses=['Normal'] * 2)
+    db.save_data([emp])
+    db.save_data([dict(emp, dates=['2025-11-30', '2026-01-01'])], delta=True)
+    assert db.get_available_periods() == [{'year': 2026, 'month': 2}, {'year': 2026, 'month': 1},
+                                          {'year': 2025, 'month': 12}, {'year': 2025, 'month': 11}]
+
+    # Bornes des périodes : mois complet et fin de plage incluse
+    for filters, dates in (({'year': 2026, 'month': 1}, ['2026-01-01']),
+                           ({'year': '2025', 'month': '11'}, ['2025-11-30']),
+                           ({'start_date': '2026-01-01', 'end_date': '2026-02-28'}, ['2026-01-01', '2026-02-28'])):
+        rows = db.get_all_employees_with_detailed_data_filtered(**filters)
+        assert [(r['person_id'], r['dates']) for r in rows] == [('100', dates)]
+
+    # Période invalide : résultat vide (pas d'exception)
+    for filters in ({'year': 2025, 'month': 13}, {'year': 'abc', 'month': 1},
+                    {'start_date': '2026-01-01', 'end_date': '2026-02-30'}, {'start_date': 'x', 'end_date': '2026-01-31'}):
+        assert db.get_all_employees_with_detailed_data_filtered(**filters) == []
+        assert db.get_period_statistics(**filters) == []
+
+    # Base existante sans catalogue : rempli au démarrage à partir des pointages
+    expected = db.get_available_periods()
+    cursor = db.get_connection().cursor()
+    cursor.execute("DELETE FROM periodes")
+    db.init_planning_table()
+    assert db.get_available_periods() == expected
+
+    # Pointages supprimés hors save_data : le mois disparaît du catalogue
+    cursor.execute("DELETE FROM pointages WHERE date_pointage = '2026-02-28'")
+    assert db.get_available_periods() == expected[1:]
+    cursor.execute("SELECT COUNT(*) FROM periodes")
+    assert cursor.fetchone()[0] == len(expected) - 1
+
+
+def test_delta_per_batch():
+    rng = random.Random(19)
+    employees = random_employees(rng, 12)
+    changed = [dict(emp, attended_minutes=[600] * len(emp['dates'])) if k % 3 == 0 else emp
+               for k, emp in enumerate(employees)]
+
+    def pointages(db):
+        cursor = db.get_connection().cursor()
+        cursor.execute("SELECT e.person_id, p.date_pointage, p.minutes FROM pointages p "
+                       "JOIN employes e ON e.id = p.employe_id ORDER BY e.person_id, p.date_pointage")
+        return cursor.fetchall()
+
+    results = []
+    for batch in (1000, 4):
+        SQLiteDBManager.reset()
+        db = SQLiteDBManager()
+        db.init_planning_table()
+        db.EMPLOYEE_BATCH = batch
+        db.save_data(employees[:8])
+        seen = []
+
+        def stream():
+            for k, emp in enumerate(changed):
+                if batch == 4 and k == 8:
+                    # Lot précédent (employés 4 à 7) déjà écrit avant la lecture du suivant
+                    seen.extend(row for row in pointages(db) if row[0] == '106')
+                yield emp
+        db.save_data(stream(), delta=True)
+        results.append((pointages(db), db.last_save_counts))
+        assert facts_totals(db) == python_totals(db)
+        check_rollups(db)
+    assert results[0] == results[1]
+    assert results[1][1]['inserted'] == sum(len(e['dates']) for e in employees[8:])
+    assert results[1][1]['updated'] == sum(len(employees[k]['dates']) for k in (0, 3, 6))
+    assert seen and all(minutes == 600 for _, _, minutes in seen)  # employé 6 modifié
+
+
+def test_department_refresh_by_month():
+    rng = random.Random(23)
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    employees = random_employees(rng, 10)
+    for emp in employees[:3]:  # historique sur trois mois
+        for day in ('2025-11-28', '2026-01-02', '2026-01-05'):
+            for key, value in (('dates', day), ('check_ins', '08:20'), ('check_outs', '16:00'),
+                               ('attended_minutes', 450), ('statuses', 'Normal')):
+                emp[key].append(value)
+        emp['department'] = 'SPA'
+    db.save_data(employees)
+
+    reads = []
+    select = db._select_fact_rows
+
+    def spy(cursor, person_ids=None, department=None, start_date=None, end_date=None):
+        rows = select(cursor, person_ids, department, start_date, end_date)
+        reads.append((start_date, end_date, len(rows)))
+        return rows
+    db._select_fact_rows = spy
+    assert db.save_function_planning('SPA', random_week(rng))
+    # Une lecture par mois, dans les bornes des pointages du département
+    assert [r[:2] for r in reads] == [('2025-11-28', '2025-11-30'), ('2025-12-01', '2025-12-31'),
+                                      ('2026-01-01', '2026-01-05')]
+    spa = [e for e in employees if e['department'] == 'SPA']
+    assert sum(r[2] for r in reads) == sum(len(e['dates']) for e in spa)
+    assert db.last_refreshed_weeks == len({(e['person_id'], db.monday_of(d)) for e in spa for d in e['dates']})
+    assert facts_totals(db) == python_totals(db)
+    check_rollups(db)
+
+
+def test_rollup_backfill_by_month():
+    rng = random.Random(19)
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    db.save_function_planning('CUISINE', random_week(rng))
+    employees = random_employees(rng)
+    for emp in employees[10:]:  # décembre et janvier
+        emp['dates'] = sorted(d.replace('2025-12-1', '2026-01-1') for d in emp['dates'])
+    db.save_data(employees)
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    for table in ('stats_semaine_employe', 'stats_mois_employe', 'stats_semaine_departement', 'stats_mois_departement'):
+        cursor.execute("DELETE FROM " + table)
+    conn.commit()
+
+    months = []
+    write_rollups = db._write_rollups
+
+    def failing(cursor, touched, *args, **kwargs):
+        months.append({db.month_of(day) for _, day in touched})
+        if len(months) == 2:  # panne sur le deuxième mois
+            raise mysql.connector.Error(msg="Lost connection to MySQL server during query")
+        return write_rollups(cursor, touched, *args, **kwargs)
+    db._write_rollups = failing
+    db.init_planning_table()
+    assert months == [{'2025-12-01'}, {'2026-01-01'}]  # un mois lu et écrit à la fois
+    cursor.execute("SELECT dernier_id, termine FROM migrations WHERE nom = 'rollups'")
+    assert cursor.fetchone() == (202512, 0)
+
+    # Reprise : seul janvier reste à calculer
+    months.clear()
+    db.init_planning_table()
+    assert months == [{'2026-01-01'}]
+    cursor.execute("SELECT dernier_id, termine FROM migrations WHERE nom = 'rollups'")
+    assert cursor.fetchone() == (202601, 1)
+    del db._write_rollups
+    check_rollups(db)
+
+
+if __name__ == "__main__":
+    test_facts_match_statistics()
+    test_period_statistics_match()
+    test_rollups_match()
+    test_batched_employee_upsert()
+    test_detailed_loader_single_query()
+    test_periods_catalog()
+    test_delta_per_batch()
+    test_department_refresh_by_month()
+    test_rollup_backfill_by_month()
+    print("[OK] Faits journaliers cohérents avec calculate_statistics")
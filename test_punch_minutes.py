@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test des heures de pointage stockées en minutes (check_in_min, check_out_min, night_shift)
+"""
+import mysql.connector
+
+from db_manager import DBManager
+from sqlite_db_manager import SQLiteDBManager
+
+
+def test_punch_minutes():
+    assert DBManager.punch_minutes('08:05', '17:30') == (485, 1050, 0)
+    assert DBManager.punch_minutes(' 22:00:00', '06:15') == (1320, 375, 1)
+    assert DBManager.punch_minutes('-', None) == (None, None, 0)
+    assert DBManager.punch_minutes('9:5', 'nan') == (545, None, 0)
+
+
+def test_columns_filled_at_ingest():
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    db.save_data([{'person_id': 1, 'name': 'EMP 1', 'department': 'SPA', 'position': 'N/A',
+                   'dates': ['2025-12-22', '2025-12-23', '2025-12-24'],
+                   'check_ins': ['08:00', '22:00', '-'], 'check_outs': ['16:30', '06:00', '-'],
+                   'attended_minutes': [510, 480, 0], 'statuses': ['Normal'] * 3}])
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT check_in_min, check_out_min, night_shift FROM pointages ORDER BY date_pointage")
+    assert cursor.fetchall() == [(480, 990, 0), (1320, 360, 1), (None, None, 0)]
+    # Requête horaire directement en SQL
+    cursor.execute("SELECT COUNT(*) FROM pointages WHERE check_in_min > 9 * 60")
+    assert cursor.fetchone()[0] == 1
+    assert db.get_employee_detailed_data(1)['check_in_minutes'] == [480, 1320, None]
+
+
+def test_backfill_resumes_after_failure():
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    cursor = db.get_connection().cursor()
+    # Base d'avant la migration : heures en texte seulement, conversion jamais terminée
+    cursor.execute("INSERT INTO employes (person_id, nom, departement, poste) VALUES ('1', 'EMP 1', 'SPA', 'N/A')")
+    for day, c_in in enumerate(['08:00', '22:00', '-', '09:30', '07:15'], start=1):
+        cursor.execute("INSERT INTO pointages (employe_id, date_pointage, check_in, check_out) VALUES (1, %s, %s, '06:00')",
+                       (f"2025-12-{day:02d}", c_in))
+    cursor.execute("UPDATE migrations SET dernier_id = 0, termine = 0 WHERE nom = 'punch_minutes'")
+    db.PUNCH_BACKFILL_BATCH = 2
+
+    calls = []
+    punch_minutes = DBManager.punch_minutes
+
+    def failing(c_in, c_out):
+        calls.append(c_in)
+        if len(calls) == 3:  # panne pendant le deuxième paquet
+            raise mysql.connector.Error(msg="Lost connection to MySQL server during query")
+        return punch_minutes(c_in, c_out)
+    db.punch_minutes = failing
+    db.init_planning_table()
+    cursor.execute("SELECT dernier_id, termine FROM migrations WHERE nom = 'punch_minutes'")
+    assert cursor.fetchone() == (2, 0)  # premier paquet validé, le reste à reprendre
+
+    del db.punch_minutes
+    calls.clear()
+    db.init_planning_table()
+    cursor.execute("SELECT check_in_min, check_out_min, night_shift FROM pointages ORDER BY id")
+    assert cursor.fetchall() == [(480, 360, 1), (1320, 360, 1), (None, 360, 0), (570, 360, 1), (435, 360, 1)]
+    cursor.execute("SELECT dernier_id, termine FROM migrations WHERE nom = 'punch_minutes'")
+    assert cursor.fetchone() == (5, 1)
+    assert db._backfill_punch_minutes(db.get_connection(), cursor) == 0  # plus rien à faire
+
+
+if __name__ == "__main__":
+    test_punch_minutes()
+    test_columns_filled_at_ingest()
+    test_backfill_resumes_after_failure()
+    print("[OK] Heures de pointage en minutes")
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Script de test du cache de statistiques : invalidation par les écritures BDD et ETag de /api/data (base SQLite embarquée)
+"""
+import app as app_module
+import db_manager
+from app import STATS_CACHE, calculate_statistics_batch
+from sqlite_db_manager import SQLiteDBManager
+from stats_cache import DataVersions
+
+WEEK = {d: {'debut': '08:00', 'fin': '16:00', 'repos': False}
+        for d in ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']}
+
+
+def employee(person_id, department, check_in):
+    return {'person_id': person_id, 'name': f"EMP {person_id}", 'department': department, 'position': 'N/A',
+            'dates': ['2025-12-22', '2025-12-23'], 'check_ins': [check_in, '08:00'], 'check_outs': ['16:00', '16:00'],
+            'attended_minutes': [480, 480], 'statuses': ['Normal', 'Normal']}
+
+
+def test_cache_invalidation():
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    employees = [employee(1, 'MENAGE', '08:30'), employee(2, 'CUISINE', '08:30'), employee(3, 'CUISINE', '08:30')]
+    db.save_data(employees)
+    db.save_function_planning('CUISINE', WEEK)
+    STATS_CACHE.clear()
+
+    def stats(period='test:period'):
+        return calculate_statistics_batch(employees, db.get_calculation_context(), period=period)
+
+    first = stats()
+    assert [s['total_late_minutes'] for s in first] == [0, 30, 30]
+    misses = STATS_CACHE.misses
+    assert stats() == first and STATS_CACHE.misses == misses  # tout vient du cache
+
+    # Planning de fonction : seuls les employés du département sont recalculés
+    db.save_function_planning('MENAGE', WEEK)
+    assert [s['total_late_minutes'] for s in stats()] == [30, 30, 30]
+    assert STATS_CACHE.misses == misses + 1
+
+    # Planning individuel : seul l'employé concerné
+    db.save_weekly_planning('2', '2025-12-22', {'Lundi': {'debut': '08:30', 'fin': '16:30', 'repos': False}})
+    assert [s['total_late_minutes'] for s in stats()] == [30, 0, 30]
+    assert STATS_CACHE.misses == misses + 2
+
+    # Ré-import : les employés sauvegardés sont recalculés
+    employees[2] = employee(3, 'CUISINE', '09:00')
+    db.save_data([employees[2]])
+    assert [s['total_late_minutes'] for s in stats()] == [30, 0, 60]
+    assert STATS_CACHE.misses == misses + 3
+
+    # Autre période : entrées distinctes
+    stats('autre')
+    assert STATS_CACHE.misses == misses + 6
+
+
+def external_save(db, employees):
+    """Import par un autre processus (backfill_exports.py...) : ses propres compteurs DATA_VERSIONS"""
+    saved_versions = db_manager.DATA_VERSIONS
+    db_manager.DATA_VERSIONS = DataVersions()
+    try:
+        db.save_data(employees)
+    finally:
+        db_manager.DATA_VERSIONS = saved_versions
+
+
+def test_external_writes():
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    employees = [employee(1, 'MENAGE', '08:30'), employee(2, 'CUISINE', '08:30'), employee(3, 'CUISINE', '08:30')]
+    db.save_data(employees)
+    db.save_function_planning('CUISINE', WEEK)
+    STATS_CACHE.clear()
+    saved_manager = app_module.DBManager
+    app_module.DBManager = SQLiteDBManager
+    try:
+        def stats():
+            return calculate_statistics_batch(employees, db.get_calculation_context(), period='db:all')
+
+        stats()
+        misses = STATS_CACHE.misses
+        # Écriture du processus : seul l'employé concerné est recalculé
+        db.save_weekly_planning('1', '2025-12-22', {'Lundi': {'debut': '08:30', 'fin': '16:30', 'repos': False}})
+        stats()
+        assert STATS_CACHE.misses == misses + 1
+
+        # Écriture d'un autre processus : tout est recalculé, avec les nouvelles données
+        employees[1] = employee(2, 'CUISINE', '09:30')
+        external_save(db, [employees[1]])
+        assert [s['total_late_minutes'] for s in stats()] == [0, 90, 30]
+        assert STATS_CACHE.misses == misses + 4
+        stats()
+        assert STATS_CACHE.misses == misses + 4
+    finally:
+        app_module.DBManager = saved_manager
+
+
+def test_api_data_etag():
+    SQLiteDBManager.reset()
+    db = SQLiteDBManager()
+    db.init_planning_table()
+    db.save_data([employee(1, 'MENAGE', '08:30'), employee(2, 'CUISINE', '08:30'), employee(3, 'CUISINE', '09:00')])
+    saved_manager = app_module.DBManager
+    app_module.DBManager = SQLiteDBManager
+    try:
+        client = app_module.app.test_client()
+        with client.session_transaction() as sess:
+            sess['logged_in'] = True
+        assert client.get('/dashboard?year=2025&month=12').status_code == 200
+
+        first = client.get('/api/data')
+        data = first.get_json()
+        assert first.status_code == 200 and first.headers['ETag']
+        assert data['person_ids'] == ['1', '2', '3'] and data['hours'] == [16.0, 16.0, 16.0]
+        assert [data['departments']['names'][i] for i in data['employee_departments']] == ['MENAGE', 'CUISINE', 'CUISINE']
+        assert data['departments']['employee_count'] == [1, 2]
+
+        # Rechargement sans changement : 304, aucun calcul
+        hits, misses = STATS_CACHE.hits, STATS_CACHE.misses
+        second = client.get('/api/data', headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 304 and not second.data
+        assert (STATS_CACHE.hits, STATS_CACHE.misses) == (hits, misses)
+
+        # Une écriture en base change l'ETag
+        db.save_function_planning('CUISINE', WEEK)
+        third = client.get('/api/data', headers={'If-None-Match': first.headers['ETag']})
+        assert third.status_code == 200 and third.headers['ETag'] != first.headers['ETag']
+
+        # Import par un autre processus : plus de 304
+        external_save(db, [employee(1, 'MENAGE', '09:00')])
+        fourth = client.get('/api/data', headers={'If-None-Match': third.headers['ETag']})
+        assert fourth.status_code == 200 and fourth.headers['ETag'] != third.headers['ETag']
+
+        # Période invalide dans l'URL : retour à l'accueil, pas d'erreur 500
+        assert client.get('/dashboard?year=2025&month=13').status_code == 302
+        assert client.get('/dashboard?year=abc&month=1').status_code == 302
+    finally:
+        app_module.DBManager = saved_manager
+
+
+if __name__ == "__main__":
+    test_cache_invalidation()
+    test_external_writes()
+    test_api_data_etag()
+    print("[OK] Cache de statistiques invalidé par les écritures")